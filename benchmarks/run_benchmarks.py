@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Benchmarks of the analysis, simulation and ingestion hot paths on synthetic candles.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --profile quick --output bench.json
+    python -m benchmarks.run_benchmarks --profile quick --baseline bench.json
+
+Every scenario records wall time (best of --repeat runs), peak traced
+memory and rows per second. With --baseline the results are compared to
+a stored run and the exit code is 1 when a scenario got slower than the
+tolerance allows.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from bte.utils.synthetic_candle_data import generate_candles
+
+
+PROFILES = {
+    "quick": [10_000, 100_000],
+    "full": [10_000, 100_000, 1_000_000, 5_000_000],
+}
+INTERVALS = ["1m", "15m", "1h"]
+HP = datetime.timedelta(hours=1)
+COLUMN_TO_TRACK = "Close__to__Rolling_Max_High__Relative_Difference"
+
+
+def _rolling_forward_max_min(candles):
+    from bte.conducted_analysis_and_backtesting.price_volatility_calculation import rolling_forward_max_min
+    df = candles.set_index("Timestamp")
+    return lambda: rolling_forward_max_min(df, HP)
+
+
+def _get_data_for_analysis(candles):
+    from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_data_for_analysis
+    return lambda: _get_data_for_analysis(candles, HP)
+
+
+def _get_number_of_positive_events(candles):
+    from bte.conducted_analysis_and_backtesting import price_volatility_calculation
+
+    def run():
+        # Cold cache, i.e. the first call of a notebook session
+        price_volatility_calculation.clear_feature_cache()
+        return price_volatility_calculation._get_number_of_positive_events(candles, HP, 0.005, COLUMN_TO_TRACK)
+    return run
+
+
+def _get_simulation_data(candles):
+    from bte.conducted_analysis_and_backtesting.price_volatility_simulation import get_simulation_data
+    # The per-iteration implementation is benchmarked on a few iterations only
+    return lambda: get_simulation_data(candles, hp=1, iterations=10, iteration_size=15)
+
+
+def _get_simulation_data_batched(candles):
+    from bte.conducted_analysis_and_backtesting.price_volatility_simulation import get_simulation_data_batched
+    return lambda: get_simulation_data_batched(candles, hp=1, iterations=100_000, iteration_size=15, seed=0)
+
+
+def _extract_data(candles, interval):
+    from bte.utils import binance_candle_data
+    from bte.utils.page_fetcher import ClientPool
+    from bte.utils.replay_data_source import ReplaySpotClient
+
+    fake_client = ReplaySpotClient.from_candles({("BTCUSDT", interval): candles})
+    step = pd.Timestamp(candles["Timestamp"].iloc[1]) - pd.Timestamp(candles["Timestamp"].iloc[0])
+    from_date = (pd.Timestamp(candles["Timestamp"].iloc[0]) - step).strftime('%Y-%m-%d %H:%M:%S')
+    to_date = (pd.Timestamp(candles["Timestamp"].iloc[-1]) + step).strftime('%Y-%m-%d %H:%M:%S')
+
+    def run():
+        # The paging path is measured without the exchange rate limit
+        limiter = binance_candle_data.request_weight_limiter
+        binance_candle_data.request_weight_limiter = None
+        try:
+            return binance_candle_data.extract_data(symbol="BTCUSDT",
+                                                    from_date=from_date,
+                                                    to_date=to_date,
+                                                    c_size=interval,
+                                                    client_pool=ClientPool(lambda: fake_client))
+        finally:
+            binance_candle_data.request_weight_limiter = limiter
+    return run
+
+
+# name -> (setup, largest amount of rows the scenario is run with)
+SCENARIOS = {
+    "rolling_forward_max_min": (lambda candles, interval: _rolling_forward_max_min(candles), None),
+    "_get_data_for_analysis": (lambda candles, interval: _get_data_for_analysis(candles), None),
+    "_get_number_of_positive_events": (lambda candles, interval: _get_number_of_positive_events(candles), None),
+    "get_simulation_data": (lambda candles, interval: _get_simulation_data(candles), 100_000),
+    "get_simulation_data_batched": (lambda candles, interval: _get_simulation_data_batched(candles), None),
+    "extract_data": (_extract_data, 1_000_000),
+}
+
+
+def _measure(run, repeat, trace_memory):
+    wall_times = []
+    with redirect_stdout(StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            wall_times.append(time.perf_counter() - start)
+        peak_memory = None
+        if trace_memory:
+            tracemalloc.start()
+            try:
+                run()
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    return min(wall_times), peak_memory
+
+
+def run_benchmarks(sizes, intervals=INTERVALS, scenarios=None, repeat=3, trace_memory=True):
+    """
+    Runs the scenarios on synthetic candles of every size and interval
+
+    Returns
+    -------
+    list of dict
+        One record per (scenario, interval, rows) with wall_time_s,
+        peak_memory_mb and rows_per_s
+    """
+    results = []
+    for interval in intervals:
+        for n_rows in sizes:
+            candles = generate_candles(n_rows, interval=interval, seed=0)
+            for name, (setup, max_rows) in SCENARIOS.items():
+                if scenarios and name not in scenarios:
+                    continue
+                if max_rows is not None and n_rows > max_rows:
+                    continue
+                wall_time, peak_memory = _measure(setup(candles, interval), repeat, trace_memory)
+                record = {"scenario": name,
+                          "interval": interval,
+                          "rows": n_rows,
+                          "wall_time_s": wall_time,
+                          "peak_memory_mb": None if peak_memory is None else peak_memory / 2**20,
+                          "rows_per_s": n_rows / wall_time if wall_time else None}
+                print(f"{datetime.datetime.now()}: {name} {interval} {n_rows} rows: "
+                      f"{wall_time:.4f}s, {record['rows_per_s']:.0f} rows/s", file=sys.stderr)
+                results.append(record)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=1.2):
+    """
+    Returns the scenarios of `results` slower than `tolerance` times their baseline wall time
+    """
+    baseline_times = {(r["scenario"], r["interval"], r["rows"]): r["wall_time_s"] for r in baseline["results"]}
+    regressions = []
+    for record in results:
+        key = (record["scenario"], record["interval"], record["rows"])
+        if key not in baseline_times:
+            continue
+        ratio = record["wall_time_s"] / baseline_times[key]
+        print(f"{key[0]:32} {key[1]:>4} {key[2]:>9} rows: {ratio:6.2f}x baseline")
+        if ratio > tolerance:
+            regressions.append(dict(record, baseline_wall_time_s=baseline_times[key], ratio=ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--rows", type=int, nargs="*", help="Amounts of rows, overrides --profile")
+    parser.add_argument("--interval", nargs="*", default=INTERVALS)
+    parser.add_argument("--scenario", nargs="*", choices=sorted(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak memory run")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(sizes=args.rows or PROFILES[args.profile],
+                             intervals=args.interval,
+                             scenarios=args.scenario,
+                             repeat=args.repeat,
+                             trace_memory=not args.no_memory)
+    report = {"created": datetime.datetime.now().isoformat(),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "pandas": pd.__version__,
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(results, json.load(f), tolerance=args.tolerance)
+        for record in regressions:
+            print(f"REGRESSION {record['scenario']} {record['interval']} {record['rows']} rows: "
+                  f"{record['wall_time_s']:.4f}s vs {record['baseline_wall_time_s']:.4f}s")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
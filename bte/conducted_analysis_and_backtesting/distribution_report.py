@@ -0,0 +1,202 @@
+import numpy as np
+
+
+class DistributionAccumulator:
+    """
+    Histogram and moments of a distribution accumulated batch by batch.
+
+    Every `add` reads the NumPy values once: they are counted into fixed
+    histogram bins and merged into the count, mean and central moments
+    (pairwise update, stable for long runs). Accumulators with the same
+    bins can be merged, so simulation workers can reduce their batches
+    locally and send only the accumulator back. Missing values are
+    counted apart and values outside of the bins in underflow/overflow.
+
+    Parameters
+    ----------
+    bins : array-like
+        Increasing histogram bin edges
+    """
+
+    def __init__(self, bins):
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.counts = np.zeros(self.bins.shape[0] - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.missing = 0
+        self.count = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        # Central moments sum((x - mean) ** k) for k = 2, 3, 4
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._m4 = 0.0
+
+    @classmethod
+    def from_values(cls, *values, bins=100):
+        """
+        Returns an accumulator of one or more arrays, with `bins` equal bins over their range
+        """
+        values = [np.asarray(v, dtype=np.float64) for v in values]
+        if np.ndim(bins) == 0:
+            finite = [v[np.isfinite(v)] for v in values]
+            lows = [v.min() for v in finite if v.shape[0]]
+            highs = [v.max() for v in finite if v.shape[0]]
+            low, high = (min(lows), max(highs)) if lows else (0.0, 1.0)
+            bins = np.linspace(low, high, int(bins) + 1) if high > low else np.linspace(low - 0.5, high + 0.5, int(bins) + 1)
+        accumulator = cls(bins)
+        for v in values:
+            accumulator.add(v)
+        return accumulator
+
+    def add(self, values):
+        """
+        Adds a batch of values
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        valid = ~np.isnan(values)
+        self.missing += int(values.shape[0] - np.count_nonzero(valid))
+        values = values[valid]
+        if values.shape[0] == 0:
+            return self
+        self.counts += np.histogram(values, bins=self.bins)[0]
+        self.underflow += int(np.count_nonzero(values < self.bins[0]))
+        self.overflow += int(np.count_nonzero(values > self.bins[-1]))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        mean = float(values.mean())
+        deviations = values - mean
+        squares = deviations * deviations
+        self._combine(values.shape[0], mean, float(squares.sum()),
+                      float((squares * deviations).sum()), float((squares * squares).sum()))
+        return self
+
+    def merge(self, other):
+        """
+        Adds the values of an accumulator with the same bins
+        """
+        if not np.array_equal(self.bins, other.bins):
+            raise ValueError("Only accumulators with the same bins can be merged")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.missing += other.missing
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        if other.count:
+            self._combine(other.count, other._mean, other._m2, other._m3, other._m4)
+        return self
+
+    def _combine(self, n_b, mean_b, m2_b, m3_b, m4_b):
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self._mean
+        m2_a, m3_a = self._m2, self._m3
+        self._mean += delta * n_b / n
+        self._m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / n
+        self._m3 = (m3_a + m3_b + delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2
+                    + 3 * delta * (n_a * m2_b - n_b * m2_a) / n)
+        self._m4 = (self._m4 + m4_b + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2) / n ** 3
+                    + 6 * delta ** 2 * (n_a ** 2 * m2_b + n_b ** 2 * m2_a) / n ** 2
+                    + 4 * delta * (n_a * m3_b - n_b * m3_a) / n)
+        self.count = n
+
+    @property
+    def mean(self):
+        return self._mean if self.count else np.nan
+
+    @property
+    def std(self):
+        """
+        Sample standard deviation (ddof=1), as pandas computes it
+        """
+        return np.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    @property
+    def skewness(self):
+        return np.sqrt(self.count) * self._m3 / self._m2 ** 1.5 if self._m2 > 0 else np.nan
+
+    @property
+    def kurtosis(self):
+        """
+        Excess kurtosis, 0 for a normal distribution
+        """
+        return self.count * self._m4 / self._m2 ** 2 - 3 if self._m2 > 0 else np.nan
+
+    def normal_fit(self):
+        """
+        Returns mean and standard deviation of the fitted normal distribution
+        """
+        return self.mean, self.std
+
+    def density(self):
+        """
+        Returns the histogram normalized to a density over the values in the bins
+        """
+        total = self.counts.sum()
+        if total == 0:
+            return np.zeros(self.counts.shape[0])
+        return self.counts / (total * np.diff(self.bins))
+
+    def summary(self):
+        """
+        Returns count, missing, min, max, mean, std, skewness, kurtosis, underflow and overflow
+        """
+        return {"count": self.count,
+                "missing": self.missing,
+                "min": self.minimum if self.count else np.nan,
+                "max": self.maximum if self.count else np.nan,
+                "mean": self.mean,
+                "std": self.std,
+                "skewness": self.skewness,
+                "kurtosis": self.kurtosis,
+                "underflow": self.underflow,
+                "overflow": self.overflow}
+
+
+def _normal_pdf(x, mean, std):
+    return np.exp(-0.5 * ((x - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi))
+
+
+def plot_distribution(accumulator, output=None, title="Histogram with Normal Distribution"):
+    """
+    Plots the histogram of an accumulator with its fitted normal distribution.
+
+    With an output path the figure is rendered off-screen (Agg) and saved,
+    so batch runs never wait on a window; without it the plot is shown.
+
+    Parameters
+    ----------
+    accumulator : DistributionAccumulator
+        Distribution to plot
+    output : str, optional
+        File to save the figure to, e.g. 'low.png'
+    title : str
+        First line of the title
+    """
+    if output is None:
+        import matplotlib.pyplot as plt
+        figure = plt.figure()
+    else:
+        from matplotlib.figure import Figure
+        figure = Figure()
+    ax = figure.add_subplot()
+
+    mean, std = accumulator.normal_fit()
+    # One outlined bar per bin, as plt.hist draws them
+    ax.bar(accumulator.bins[:-1], accumulator.density(), width=np.diff(accumulator.bins), align='edge',
+           alpha=0.6, color='b', edgecolor='black', linewidth=1.0)
+    if std > 0:
+        x = np.linspace(accumulator.bins[0], accumulator.bins[-1], 100)
+        ax.plot(x, _normal_pdf(x, mean, std), 'k', linewidth=2)
+
+    ax.set_title(f'{title}\nMean = {mean:.4f}, Std = {std:.4f}')
+    ax.set_xlabel('Value')
+    ax.set_ylabel('Density')
+    ax.grid(True)
+
+    if output is None:
+        plt.show()
+    else:
+        figure.savefig(output)
@@ -1,71 +1,266 @@
 import datetime
 import pandas as pd
+import numpy as np
 import copy
+import hashlib
+from collections import OrderedDict
+
+from bte.conducted_analysis_and_backtesting.window_statistics import forward_window_statistics
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.instrumentation import stage
+
+
+START_PRICE_COLUMNS = ["Close", "Low", "High"]
+ROLLING_PRICE_COLUMNS = ["Rolling_Max_High",
+                         "Rolling_Min_Low",
+                         "Rolling_Max_Close",
+                         "Rolling_Min_Close",
+                         "Rolling_Mean_Close"]
+RELATIVE_DIFFERENCE_COLUMNS = [f"{start_price}__to__{change_price}__Relative_Difference"
+                               for start_price in START_PRICE_COLUMNS
+                               for change_price in ROLLING_PRICE_COLUMNS]
 
 
 def rolling_forward_max_min(df, window):
-    rolling_max_high = []
-    rolling_min_low = []
-    rolling_max_close = []
-    rolling_min_close = []
-    rolling_mean_close = []
-    
-    for _, current_time in enumerate(df.index):
-        # Define the time window: rows with Timestamp > current row and <= current row + window
-        window_end = current_time + window
-        df_window = df[(df.index > current_time) & (df.index <= window_end)]
-        
-        # Get max and min values of 'High' and 'Low' in this window
-        if not df_window.empty:
-            rolling_max_high.append(df_window['High'].max())
-            rolling_min_low.append(df_window['Low'].min())
-            rolling_max_close.append(df_window['Close'].max())
-            rolling_min_close.append(df_window['Close'].min())
-            rolling_mean_close.append(df_window['Close'].mean())
-        else:
-            rolling_max_high.append(None)
-            rolling_min_low.append(None)
-            rolling_max_close.append(None)
-            rolling_min_close.append(None)
-            rolling_mean_close.append(None)
-    
+    """
+    Adds forward-looking rolling statistics to the candles dataframe.
+
+    For every row the window covers the rows with Timestamp greater than the
+    current one and lower or equal to the current one plus `window`.
+    Rows with an empty window (e.g. the last one) get missing values.
+    The statistics are computed by the `window_statistics` kernels.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        OHLC dataframe indexed by Timestamp with columns [Open, High, Low, Close, Volume]
+        The index may be irregular and does not have to be sorted.
+    window : datetime.timedelta
+        Size of the forward window
+
+    Returns
+    -------
+    pd.DataFrame
+        The same dataframe with columns Rolling_Max_High, Rolling_Min_Low,
+        Rolling_Max_Close, Rolling_Min_Close and Rolling_Mean_Close
+    """
+    statistics = forward_window_statistics(df.index, window, {
+        'Rolling_Max_High': (df['High'], 'max'),
+        'Rolling_Min_Low': (df['Low'], 'min'),
+        'Rolling_Max_Close': (df['Close'], 'max'),
+        'Rolling_Min_Close': (df['Close'], 'min'),
+        'Rolling_Mean_Close': (df['Close'], 'mean'),
+    })
+
     # Add these values as new columns to the original dataframe
-    df['Rolling_Max_High'] = rolling_max_high
-    df['Rolling_Min_Low'] = rolling_min_low
-    df['Rolling_Max_Close'] = rolling_max_close
-    df['Rolling_Min_Close'] = rolling_min_close
-    df['Rolling_Mean_Close'] = rolling_mean_close
+    for column, values in statistics.items():
+        df[column] = values
 
     return df
 
 
 def _get_data_for_analysis(df_candles, hp):
-    df = copy.deepcopy(df_candles)
-    if isinstance(df['Timestamp'].iloc[0], int):
+    with stage("feature"):
+        if isinstance(df_candles, CandleArrays):
+            # to_frame already returns a new frame, it is not copied again
+            df = df_candles.to_frame()
+        else:
+            df = copy.deepcopy(df_candles)
+        if isinstance(df['Timestamp'].iloc[0], int):
+            df['Timestamp'] = pd.to_datetime(df['Timestamp'])
         df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    df.set_index('Timestamp', inplace=True)
-    df = rolling_forward_max_min(df, hp)
-
-    for start_price in ["Close", 
-                        "Low", 
-                        "High"]:
-        for change_price in ['Rolling_Max_High', 
-                            'Rolling_Min_Low', 
-                            'Rolling_Max_Close', 
-                            'Rolling_Min_Close',
-                            "Rolling_Mean_Close"]:
-            df[f"{start_price}__to__{change_price}__Relative_Difference"] = (df[change_price] - df[start_price]) / df[start_price]
+        df.set_index('Timestamp', inplace=True)
+        df = rolling_forward_max_min(df, hp)
+
+        for start_price in START_PRICE_COLUMNS:
+            for change_price in ROLLING_PRICE_COLUMNS:
+                df[f"{start_price}__to__{change_price}__Relative_Difference"] = (df[change_price] - df[start_price]) / df[start_price]
     return df
 
 
+def _fingerprint_candles(df_candles):
+    """
+    Returns a content hash of the candles dataframe used as a cache key
+    """
+    if isinstance(df_candles, CandleArrays):
+        return df_candles.fingerprint()
+    digest = hashlib.sha1()
+    digest.update(repr(list(df_candles.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df_candles, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _price_frame(df_candles):
+    """
+    Returns High, Low and Close of the candles indexed by Timestamp
+    """
+    if isinstance(df_candles, CandleArrays):
+        return pd.DataFrame({column: df_candles[column] for column in ["High", "Low", "Close"]},
+                            index=pd.DatetimeIndex(df_candles["Timestamp"], name="Timestamp"))
+    return df_candles[["High", "Low", "Close"]].set_axis(
+        pd.DatetimeIndex(pd.to_datetime(df_candles["Timestamp"]), name="Timestamp"))
+
+
+class ForwardFeatureCube:
+    """
+    Forward features of candle datasets, computed once per (dataset, hp, column).
+
+    Every relative-difference column is kept as a sorted array of its
+    non-missing values, so event counts for any number of thresholds are
+    answered with a single searchsorted call. Columns are computed and
+    sorted when first requested only. The least recently used columns are
+    evicted once the cached arrays take more than `max_bytes`.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget of the cached arrays, 0 disables the cache
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def clear(self):
+        """
+        Drops every cached column
+        """
+        self._entries.clear()
+        self.nbytes = 0
+
+    def resize(self, max_bytes):
+        """
+        Sets the memory budget, evicting the least recently used columns beyond it
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, values = self._entries.popitem(last=False)
+            self.nbytes -= values.nbytes
+
+    def sorted_features(self, df_candles, hp, columns_to_track=None, fingerprint=None):
+        """
+        Returns the sorted relative-difference values of a dataset for a hold period
+
+        Parameters
+        ----------
+        df_candles : pd.DataFrame or CandleArrays
+            OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+        hp : datetime.timedelta
+            hold period
+        columns_to_track : list of str, optional
+            Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+        fingerprint : str, optional
+            Precomputed `_fingerprint_candles` of df_candles
+
+        Returns
+        -------
+        tuple
+            dict of column name to sorted np.ndarray, population_size
+        """
+        if columns_to_track is None:
+            columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+        if fingerprint is None:
+            fingerprint = _fingerprint_candles(df_candles)
+        hp = pd.Timedelta(hp)
+        population_size = len(df_candles)
+
+        features = {}
+        for column in columns_to_track:
+            key = (fingerprint, hp, column)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                features[column] = self._entries[key]
+        missing = [column for column in columns_to_track if column not in features]
+        if missing:
+            with stage("feature"):
+                df = _relative_differences(_price_frame(df_candles), hp, missing, np.float64)
+            for column in missing:
+                values = df[column].to_numpy()
+                features[column] = np.sort(values[~np.isnan(values)])
+                self._entries[(fingerprint, hp, column)] = features[column]
+                self.nbytes += features[column].nbytes
+            self._evict()
+        return features, population_size
+
+    def count_events(self, df_candles, hps, thresholds, columns_to_track=None):
+        """
+        Returns amounts of positive and negative events for a grid of parameters
+
+        A positive event is a value greater or equal to the threshold,
+        a negative event is a value below it, the same as in
+        `_get_number_of_positive_events` and `_get_number_of_negative_events`.
+
+        Parameters
+        ----------
+        df_candles : pd.DataFrame or CandleArrays
+            OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+        hps : list of datetime.timedelta
+            hold periods
+        thresholds : list of float
+            thresholds to compare against
+        columns_to_track : list of str, optional
+            Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per (hp, column_to_track, threshold) with columns
+            [hp, column_to_track, threshold, number_of_positive_events,
+            number_of_negative_events, population_size]
+        """
+        if columns_to_track is None:
+            columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        fingerprint = _fingerprint_candles(df_candles)
+
+        frames = []
+        for hp in hps:
+            features, population_size = self.sorted_features(df_candles, hp, columns_to_track, fingerprint=fingerprint)
+            for column in columns_to_track:
+                values = features[column]
+                number_of_negative_events = np.searchsorted(values, thresholds, side="left")
+                frames.append(pd.DataFrame({"hp": hp,
+                                            "column_to_track": column,
+                                            "threshold": thresholds,
+                                            "number_of_positive_events": values.shape[0] - number_of_negative_events,
+                                            "number_of_negative_events": number_of_negative_events,
+                                            "population_size": population_size}))
+        return pd.concat(frames, ignore_index=True)
+
+
+_FORWARD_FEATURE_CUBE = ForwardFeatureCube()
+
+
+def set_feature_cache_size(max_bytes):
+    """
+    Sets the memory budget of the forward features cached by the event counts
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget in bytes, 0 disables the cache
+    """
+    _FORWARD_FEATURE_CUBE.resize(max_bytes)
+
+
+def clear_feature_cache():
+    """
+    Drops the forward features cached by the event counts
+    """
+    _FORWARD_FEATURE_CUBE.clear()
+
+
 def _get_number_of_positive_events(df_candles, hp, threshold, column_to_track):
     """
     Returns amount of events where the price exceeded some threshold
 
     Parameters
     ----------
-    df_candles : pd.DataFrame
+    df_candles : pd.DataFrame or CandleArrays
         OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
     hp : datetime.timedelta
         hold period
@@ -95,9 +290,12 @@ def _get_number_of_positive_events(df_candles, hp, threshold, column_to_track):
     tuple
         number_of_events, population_size
     """
-    df = _get_data_for_analysis(df_candles=df_candles, hp=hp)
-    number_of_events = df[df[column_to_track] >= threshold].shape[0]
-    population_size = df.shape[0]
+    events = _FORWARD_FEATURE_CUBE.count_events(df_candles=df_candles,
+                                                hps=[hp],
+                                                thresholds=[threshold],
+                                                columns_to_track=[column_to_track])
+    number_of_events = int(events["number_of_positive_events"].iloc[0])
+    population_size = int(events["population_size"].iloc[0])
     return number_of_events, population_size
 
 
@@ -107,7 +305,7 @@ def _get_number_of_negative_events(df_candles, hp, threshold, column_to_track):
 
     Parameters
     ----------
-    df_candles : pd.DataFrame
+    df_candles : pd.DataFrame or CandleArrays
         OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
     hp : datetime.timedelta
         hold period
@@ -138,7 +336,280 @@ def _get_number_of_negative_events(df_candles, hp, threshold, column_to_track):
     tuple
         number_of_events, population_size
     """
-    df = _get_data_for_analysis(df_candles=df_candles, hp=hp)
-    number_of_events = df[df[column_to_track] < threshold].shape[0]
-    population_size = df.shape[0]
+    events = _FORWARD_FEATURE_CUBE.count_events(df_candles=df_candles,
+                                                hps=[hp],
+                                                thresholds=[threshold],
+                                                columns_to_track=[column_to_track])
+    number_of_events = int(events["number_of_negative_events"].iloc[0])
+    population_size = int(events["population_size"].iloc[0])
     return number_of_events, population_size
+
+
+def _relative_differences(df, hp, columns_to_track, dtype):
+    """
+    Returns only the requested relative-difference columns of candles indexed by Timestamp
+    """
+    df = rolling_forward_max_min(df[["High", "Low", "Close"]].copy(), hp)
+    result = pd.DataFrame(index=df.index)
+    for column in columns_to_track:
+        start_price, change_price = column[:-len("__Relative_Difference")].split("__to__")
+        result[column] = ((df[change_price] - df[start_price]) / df[start_price]).astype(dtype)
+    return result
+
+
+def _iter_candle_chunks(df_candles, chunk_size):
+    if isinstance(df_candles, pd.DataFrame):
+        for start in range(0, df_candles.shape[0], chunk_size):
+            yield df_candles.iloc[start:start + chunk_size]
+    elif isinstance(df_candles, CandleArrays):
+        # Only the rows of one chunk are read from the mapped files at a time
+        for start in range(0, len(df_candles), chunk_size):
+            yield df_candles[start:start + chunk_size].to_frame()
+    else:
+        yield from df_candles
+
+
+def iter_forward_features(df_candles, hp, columns_to_track=None, chunk_size=1000000, dtype=np.float32):
+    """
+    Computes relative-difference columns chunk by chunk.
+
+    Rows are emitted once their forward window is complete, i.e. once a
+    candle later than Timestamp + hp has been read; the rows still waiting
+    for their window are carried over to the next chunk as a lookahead tail.
+    Memory is bounded by chunk_size plus the rows of one hold period.
+    The values are the same as the ones of `_get_data_for_analysis`.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame, CandleArrays or iterable of pd.DataFrame
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+        sorted by Timestamp, the same candles as CandleArrays, or consecutive
+        chunks of such a dataframe (e.g. read partition by partition from disk)
+    hp : datetime.timedelta
+        hold period
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+    chunk_size : int
+        Amount of rows per chunk when df_candles is a single dataframe or CandleArrays
+    dtype : numpy dtype
+        dtype of the emitted columns
+
+    Yields
+    ------
+    pd.DataFrame
+        Requested columns indexed by Timestamp, in Timestamp order
+    """
+    if columns_to_track is None:
+        columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+    hp = pd.Timedelta(hp)
+    tail = None
+    for chunk in _iter_candle_chunks(df_candles, chunk_size):
+        chunk = chunk[["Timestamp", "High", "Low", "Close"]].copy()
+        chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"])
+        chunk = chunk.set_index("Timestamp")
+        buffer = chunk if tail is None else pd.concat([tail, chunk])
+        if buffer.empty:
+            continue
+        features = _relative_differences(buffer, hp, columns_to_track, dtype)
+        # Later candles are not earlier than the last one read, so they cannot
+        # fall into the window of rows with Timestamp + hp before it
+        complete = int(buffer.index.searchsorted(buffer.index[-1] - hp, side="left"))
+        tail = buffer.iloc[complete:]
+        if complete:
+            yield features.iloc[:complete]
+    if tail is not None and not tail.empty:
+        yield _relative_differences(tail, hp, columns_to_track, dtype)
+
+
+def count_events_streaming(df_candles, hp, thresholds, columns_to_track=None, chunk_size=1000000):
+    """
+    Returns amounts of positive and negative events without holding the features in memory.
+
+    The relative differences of every chunk produced by
+    `iter_forward_features` are reduced to event counts right away.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame, CandleArrays or iterable of pd.DataFrame
+        See `iter_forward_features`
+    hp : datetime.timedelta
+        hold period
+    thresholds : list of float
+        thresholds to compare against
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+    chunk_size : int
+        Amount of rows per chunk when df_candles is a single dataframe
+
+    Returns
+    -------
+    pd.DataFrame
+        Same layout as `ForwardFeatureCube.count_events`
+    """
+    if columns_to_track is None:
+        columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    positive = {column: np.zeros(thresholds.shape[0], dtype=np.int64) for column in columns_to_track}
+    negative = {column: np.zeros(thresholds.shape[0], dtype=np.int64) for column in columns_to_track}
+    population_size = 0
+    for features in iter_forward_features(df_candles, hp, columns_to_track, chunk_size, dtype=np.float64):
+        population_size += features.shape[0]
+        for column in columns_to_track:
+            values = features[column].to_numpy()
+            values = np.sort(values[~np.isnan(values)])
+            below = np.searchsorted(values, thresholds, side="left")
+            negative[column] += below
+            positive[column] += values.shape[0] - below
+    return pd.concat([pd.DataFrame({"hp": hp,
+                                    "column_to_track": column,
+                                    "threshold": thresholds,
+                                    "number_of_positive_events": positive[column],
+                                    "number_of_negative_events": negative[column],
+                                    "population_size": population_size})
+                      for column in columns_to_track], ignore_index=True)
+
+
+class IncrementalForwardFeatures:
+    """
+    Forward features of a live candle series, updated as new candles arrive.
+
+    Every call of `update` finalizes the rows whose forward window has
+    closed, i.e. the rows with Timestamp + hp before the last candle read,
+    and adds their relative differences to the event counts and histograms
+    held by the engine. Only the rows still waiting for their window are
+    kept between calls, so the cost of an update depends on the amount of
+    new candles and on the rows of one hold period, not on the history.
+
+    Parameters
+    ----------
+    hp : datetime.timedelta
+        hold period
+    thresholds : list of float
+        thresholds to count events for
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+    bins : array-like, optional
+        Histogram bin edges of the relative differences, values outside of
+        them are not counted. No histograms are kept by default
+    """
+
+    def __init__(self, hp, thresholds, columns_to_track=None, bins=None):
+        self.hp = pd.Timedelta(hp)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.columns_to_track = list(columns_to_track if columns_to_track is not None else RELATIVE_DIFFERENCE_COLUMNS)
+        self.bins = None if bins is None else np.asarray(bins, dtype=np.float64)
+        self.population_size = 0
+        self.last_finalized = None
+        self._positive = {column: np.zeros(self.thresholds.shape[0], dtype=np.int64) for column in self.columns_to_track}
+        self._negative = {column: np.zeros(self.thresholds.shape[0], dtype=np.int64) for column in self.columns_to_track}
+        self._histograms = {column: np.zeros(0 if self.bins is None else self.bins.shape[0] - 1, dtype=np.int64)
+                            for column in self.columns_to_track}
+        self._tail = pd.DataFrame({column: np.empty(0) for column in ["High", "Low", "Close"]},
+                                  index=pd.DatetimeIndex([], dtype="datetime64[ns]", name="Timestamp"))
+
+    @property
+    def pending(self):
+        """
+        Amount of candles read whose forward window is still open
+        """
+        return self._tail.shape[0]
+
+    def update(self, df_candles):
+        """
+        Appends new candles and finalizes the rows whose forward window has closed
+
+        Candles with the Timestamp of a pending row replace it, e.g. a
+        candle that was still forming when it was first read. Candles
+        inside the forward window of a finalized row, i.e. not later than
+        the last finalized Timestamp + hp, raise a ValueError since the
+        features already returned for that row would go stale.
+
+        Parameters
+        ----------
+        df_candles : pd.DataFrame or CandleArrays
+            New OHLC candles with columns [Timestamp, Open, High, Low, Close, Volume]
+
+        Returns
+        -------
+        pd.DataFrame
+            Relative differences of the finalized rows indexed by Timestamp
+        """
+        candles = _price_frame(df_candles)
+        candles.index = candles.index.astype("datetime64[ns]")
+        if self.last_finalized is not None and candles.shape[0] and candles.index.min() <= self.last_finalized + self.hp:
+            raise ValueError(f"Candles up to {self.last_finalized + self.hp} are in the windows of finalized rows")
+
+        buffer = pd.concat([self._tail, candles.astype(np.float64)])
+        if not buffer.index.is_monotonic_increasing or buffer.index.has_duplicates:
+            buffer = buffer[~buffer.index.duplicated(keep="last")].sort_index()
+        if buffer.empty:
+            return _relative_differences(buffer, self.hp, self.columns_to_track, np.float64)
+
+        complete = int(buffer.index.searchsorted(buffer.index[-1] - self.hp, side="left"))
+        with stage("feature"):
+            # Rows after the complete ones only matter as window candles
+            window_end = int(buffer.index.searchsorted(buffer.index[complete - 1] + self.hp, side="right")) if complete else 0
+            features = _relative_differences(buffer.iloc[:window_end], self.hp, self.columns_to_track, np.float64).iloc[:complete]
+        self._tail = buffer.iloc[complete:]
+        if complete:
+            self._add(features)
+            self.last_finalized = features.index[-1]
+        return features
+
+    def _add(self, features):
+        self.population_size += features.shape[0]
+        for column in self.columns_to_track:
+            values = features[column].to_numpy()
+            values = np.sort(values[~np.isnan(values)])
+            below = np.searchsorted(values, self.thresholds, side="left")
+            self._negative[column] += below
+            self._positive[column] += values.shape[0] - below
+            if self.bins is not None:
+                self._histograms[column] += np.histogram(values, bins=self.bins)[0]
+
+    def pending_features(self):
+        """
+        Returns the relative differences of the pending rows over the candles read so far
+        """
+        return _relative_differences(self._tail, self.hp, self.columns_to_track, np.float64)
+
+    def count_events(self, include_pending=False):
+        """
+        Returns amounts of positive and negative events of the finalized rows
+
+        With include_pending the pending rows are counted too with their
+        windows cut at the last candle read, which gives the counts of
+        `count_events_streaming` over all the candles read.
+
+        Returns
+        -------
+        pd.DataFrame
+            Same layout as `ForwardFeatureCube.count_events`
+        """
+        positive = {column: counts.copy() for column, counts in self._positive.items()}
+        negative = {column: counts.copy() for column, counts in self._negative.items()}
+        population_size = self.population_size
+        if include_pending and self.pending:
+            features = self.pending_features()
+            population_size += features.shape[0]
+            for column in self.columns_to_track:
+                values = features[column].to_numpy()
+                values = np.sort(values[~np.isnan(values)])
+                below = np.searchsorted(values, self.thresholds, side="left")
+                negative[column] += below
+                positive[column] += values.shape[0] - below
+        return pd.concat([pd.DataFrame({"hp": self.hp,
+                                        "column_to_track": column,
+                                        "threshold": self.thresholds,
+                                        "number_of_positive_events": positive[column],
+                                        "number_of_negative_events": negative[column],
+                                        "population_size": population_size})
+                          for column in self.columns_to_track], ignore_index=True)
+
+    def histogram(self, column_to_track):
+        """
+        Returns the histogram counts of the finalized values of a column and the bin edges
+        """
+        if self.bins is None:
+            raise ValueError("IncrementalForwardFeatures was created without bins")
+        return self._histograms[column_to_track].copy(), self.bins
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import RELATIVE_DIFFERENCE_COLUMNS
+from bte.conducted_analysis_and_backtesting.window_statistics import forward_window_statistics
+from bte.utils.candle_arrays import CandlePanel
+from bte.utils.instrumentation import stage
+
+
+# Rolling column -> (price column, statistic), as in `rolling_forward_max_min`
+ROLLING_STATISTICS = {"Rolling_Max_High": ("High", "max"),
+                      "Rolling_Min_Low": ("Low", "min"),
+                      "Rolling_Max_Close": ("Close", "max"),
+                      "Rolling_Min_Close": ("Close", "min"),
+                      "Rolling_Mean_Close": ("Close", "mean")}
+
+
+def _split_column(column_to_track):
+    start_price, change_price = column_to_track[:-len("__Relative_Difference")].split("__to__")
+    return start_price, change_price
+
+
+def _as_panel(candles):
+    return candles if isinstance(candles, CandlePanel) else CandlePanel.from_candles(candles)
+
+
+def panel_forward_features(candles, hp, columns_to_track=None):
+    """
+    Computes relative-difference columns of all the symbols of a panel at once.
+
+    The forward windows (Timestamp, Timestamp + hp] are taken over the
+    shared timestamp grid, so every symbol gets the values
+    `_get_data_for_analysis` computes for it alone, and NaN at the
+    timestamps where it has no candle.
+
+    Parameters
+    ----------
+    candles : CandlePanel, dict or pd.DataFrame
+        Aligned candles, or candles of many symbols, see `CandlePanel.from_candles`
+    hp : datetime.timedelta
+        hold period
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+
+    Returns
+    -------
+    dict
+        column -> np.ndarray of shape (time, symbol)
+    """
+    panel = _as_panel(candles)
+    if columns_to_track is None:
+        columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+    rolling_columns = sorted({_split_column(column)[1] for column in columns_to_track})
+    with stage("feature"):
+        prices = {"Close": panel.close, "Low": panel.low, "High": panel.high}
+        prices.update(forward_window_statistics(panel.timestamp.view("datetime64[ns]"), hp, {
+            column: (panel.columns[ROLLING_STATISTICS[column][0]], ROLLING_STATISTICS[column][1])
+            for column in rolling_columns}))
+        features = {}
+        for column in columns_to_track:
+            start_price, change_price = _split_column(column)
+            features[column] = (prices[change_price] - prices[start_price]) / prices[start_price]
+    return features
+
+
+def count_panel_events(candles, hps, thresholds, columns_to_track=None):
+    """
+    Returns amounts of positive and negative events of every symbol for a grid of parameters
+
+    Event counts follow `ForwardFeatureCube.count_events`: a positive
+    event is a value greater or equal to the threshold, a negative event
+    a value below it, and population_size is the amount of candles of
+    the symbol.
+
+    Parameters
+    ----------
+    candles : CandlePanel, dict or pd.DataFrame
+        Aligned candles, or candles of many symbols, see `CandlePanel.from_candles`
+    hps : list of datetime.timedelta
+        hold periods
+    thresholds : list of float
+        thresholds to compare against
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (symbol, hp, column_to_track, threshold) with columns
+        [symbol, hp, column_to_track, threshold, number_of_positive_events,
+        number_of_negative_events, population_size]
+    """
+    panel = _as_panel(candles)
+    if columns_to_track is None:
+        columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    population_size = np.count_nonzero(~np.isnan(panel.close), axis=0)
+
+    # Counts of shape (hp, column, symbol, threshold)
+    negative = np.zeros((len(hps), len(columns_to_track), len(panel.symbols), thresholds.shape[0]), dtype=np.int64)
+    valid = np.zeros((len(hps), len(columns_to_track), len(panel.symbols), 1), dtype=np.int64)
+    for h, hp in enumerate(hps):
+        features = panel_forward_features(panel, hp, columns_to_track)
+        for c, column in enumerate(columns_to_track):
+            # Missing values are sorted last, below them every series is sorted
+            values = np.sort(features[column], axis=0)
+            valid[h, c, :, 0] = np.count_nonzero(~np.isnan(values), axis=0)
+            for j in range(len(panel.symbols)):
+                negative[h, c, j] = np.searchsorted(values[:valid[h, c, j, 0], j], thresholds, side="left")
+    positive = valid - negative
+
+    index = np.indices((len(panel.symbols), len(hps), len(columns_to_track), thresholds.shape[0])).reshape(4, -1)
+    return pd.DataFrame({"symbol": np.asarray(panel.symbols, dtype=object)[index[0]],
+                         "hp": [hps[h] for h in index[1]],
+                         "column_to_track": np.asarray(columns_to_track, dtype=object)[index[2]],
+                         "threshold": thresholds[index[3]],
+                         "number_of_positive_events": positive.transpose(2, 0, 1, 3).ravel(),
+                         "number_of_negative_events": negative.transpose(2, 0, 1, 3).ravel(),
+                         "population_size": population_size[index[0]]})
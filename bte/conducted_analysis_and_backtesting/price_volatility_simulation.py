@@ -1,58 +1,43 @@
-import datetime
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import norm
 
 
 from bte.utils.binance_candle_data import extract_data as extract_price_candles_data
+from bte.conducted_analysis_and_backtesting.distribution_report import DistributionAccumulator, plot_distribution
+from bte.conducted_analysis_and_backtesting.window_statistics import forward_window_statistics
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.instrumentation import PrintProgress, stage
 
 
-def plot_hist_with_normal(data, bins):
+def plot_hist_with_normal(data, bins, output=None):
     """
     Function to plot a histogram with a normal distribution line.
     
     Parameters:
     data (list or array): List of numerical values.
-    bins (int): Number of bins for the histogram.
+    bins (int or array): Number of bins for the histogram, or their edges.
+    output (str, optional): File to save the plot to without displaying it.
     """
-    # Calculate mean and standard deviation
-    df = pd.DataFrame()
-    df["c"] = data
-    mean = df["c"].mean()
-    std = df["c"].std()
-
-    # Create the histogram
-    plt.hist(data, bins=bins, density=True, alpha=0.6, color='b', edgecolor='black')
-
-    # Generate the x values for the normal distribution line plot
-    xmin, xmax = plt.xlim()  # Get the range of x from the histogram
-    x = np.linspace(xmin, xmax, 100)
-
-    # Plot the normal distribution using the calculated mean and std
-    p = norm.pdf(x, mean, std)
-    plt.plot(x, p, 'k', linewidth=2)
-
-    # Add title with mean and standard deviation
-    plt.title(f'Histogram with Normal Distribution\nMean = {mean:.4f}, Std = {std:.4f}')
-
-    # Add labels and grid
-    plt.xlabel('Value')
-    plt.ylabel('Density')
-    plt.grid(True)
-
-    # Display the plot
-    plt.show()
+    plot_distribution(DistributionAccumulator.from_values(data, bins=bins), output=output)
 
 
 def get_simulation_data(df_price, 
                         hp, 
                         iterations=100000, 
-                        iteration_size=15):
+                        iteration_size=15,
+                        progress=None):
+    if isinstance(df_price, CandleArrays):
+        df_price = df_price.to_frame()
+    if progress is None:
+        progress = PrintProgress()
     low_simulation_list = []
     high_simulation_list = []
     for i in range(iterations):
-        print(f"{datetime.datetime.now()}: {i}/{iterations} = {i/iterations*100}%")
+        progress(i, iterations)
         entries = df_price.sample(n=iteration_size)
         entry_points = entries["Timestamp"].values
         entry_prices = entries["Close"].values
@@ -66,66 +51,431 @@ def get_simulation_data(df_price,
             price_diff_high.append((max_price - entry_price) / entry_price)
         low_simulation_list.extend(price_diff_low)
         high_simulation_list.extend(price_diff_high)
+    progress(iterations, iterations)
     return low_simulation_list, high_simulation_list
 
 
-pair = "BTCUSDT"
-from_date="2024-05-20 00:00:00"
-to_date="2024-09-19 00:00:00"
-iterations = 100000
-iteration_size = 15
+def _get_forward_low_high(df_price, hp):
+    """
+    Returns forward min-Low and max-High of every candle for a hold period.
 
-df_price = extract_price_candles_data(symbol=pair,
-                                      from_date=from_date, 
-                                      to_date=to_date, 
-                                      c_size="1h")
+    The window of an entry candle covers the candles with Timestamp in
+    (entry Timestamp, entry Timestamp + hp hours], the same rows
+    `get_simulation_data` filters for every sampled entry.
+    """
+    statistics = forward_window_statistics(df_price["Timestamp"], pd.Timedelta(hours=hp), {
+        "low": (df_price["Low"], "min"),
+        "high": (df_price["High"], "max"),
+    })
+    return statistics["low"], statistics["high"]
 
-hp = 24
-low_simulation_list, high_simulation_list = get_simulation_data(df_price, 
-                                                                hp, 
-                                                                iterations, 
-                                                                iteration_size)
-print(f"""
-####################################################
-      Low Distribution; hp: {hp}h
-####################################################""")
-plot_hist_with_normal(data=low_simulation_list, bins=100)
 
-print(f"""
-####################################################
-      High Distribution; hp: {hp}h
-####################################################""")
-plot_hist_with_normal(data=high_simulation_list, bins=100)
+def _check_iteration_size(population_size, iteration_size):
+    if iteration_size > population_size:
+        raise ValueError(f"Cannot sample {iteration_size} distinct entries per iteration "
+                         f"from {population_size} candles")
 
-print(f"""
-####################################################
-      Joined Distribution; hp: {hp}h
-####################################################""")
-plot_hist_with_normal(data=low_simulation_list + high_simulation_list, bins=100)
-
-hp = 1
-low_simulation_list, high_simulation_list = get_simulation_data(df_price, 
-                                                                hp, 
-                                                                iterations, 
-                                                                iteration_size)
-print(f"""
+
+def _sample_entries(rng, population_size, iterations, iteration_size):
+    """
+    Draws `iteration_size` distinct row positions for each of `iterations` iterations.
+
+    Floyd's sampling algorithm vectorized over the iterations, so every
+    row of the result matches one `df.sample(n=iteration_size)` call.
+    """
+    _check_iteration_size(population_size, iteration_size)
+    entries = np.empty((iterations, iteration_size), dtype=np.int64)
+    for k, j in enumerate(range(population_size - iteration_size, population_size)):
+        candidate = rng.integers(0, j + 1, size=iterations)
+        taken = (entries[:, :k] == candidate[:, None]).any(axis=1)
+        entries[:, k] = np.where(taken, j, candidate)
+    return entries
+
+
+def get_simulation_data_batched(df_price,
+                                hp,
+                                iterations=100000,
+                                iteration_size=15,
+                                seed=None,
+                                batch_size=10000,
+                                progress_callback=None,
+                                histogram_bins=None):
+    """
+    Batched version of `get_simulation_data`.
+
+    Forward min-Low and max-High are computed once for every candle and
+    the entries of a whole batch of iterations are drawn at once, so the
+    cost no longer depends on filtering the dataframe per entry.
+
+    Parameters
+    ----------
+    df_price : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+    hp : int
+        hold period in hours
+    iterations : int
+        amount of simulated iterations
+    iteration_size : int
+        amount of distinct entries sampled per iteration
+    seed : int, np.random.SeedSequence or np.random.Generator, optional
+        Seed of the random generator, set it to reproduce a run
+    batch_size : int
+        amount of iterations drawn at once
+    progress_callback : callable, optional
+        Called as progress_callback(done_iterations, iterations) after every batch,
+        e.g. a reporter of `bte.utils.instrumentation`
+    histogram_bins : array-like, optional
+        Histogram bin edges; when given every batch is reduced right away
+        and no array of all the simulated values is kept
+
+    Returns
+    -------
+    tuple
+        np.ndarray of relative low differences, np.ndarray of relative high differences,
+        or their DistributionAccumulators when histogram_bins is given
+    """
+    _check_iteration_size(len(df_price), iteration_size)
+    with stage("feature"):
+        forward_low, forward_high = _get_forward_low_high(df_price, hp)
+    with stage("simulate"):
+        return _simulate_from_forward_low_high(entry_prices=np.asarray(df_price["Close"], dtype=float),
+                                               forward_low=forward_low,
+                                               forward_high=forward_high,
+                                               iterations=iterations,
+                                               iteration_size=iteration_size,
+                                               rng=np.random.default_rng(seed),
+                                               batch_size=batch_size,
+                                               progress_callback=progress_callback,
+                                               histogram_bins=histogram_bins)
+
+
+def _simulate_from_forward_low_high(entry_prices,
+                                    forward_low,
+                                    forward_high,
+                                    iterations,
+                                    iteration_size,
+                                    rng,
+                                    batch_size=10000,
+                                    progress_callback=None,
+                                    histogram_bins=None):
+    # With histogram_bins every batch is reduced right away and only the
+    # low/high DistributionAccumulators are returned
+    if histogram_bins is None:
+        low_simulation = np.empty(iterations * iteration_size)
+        high_simulation = np.empty(iterations * iteration_size)
+    else:
+        low_simulation = DistributionAccumulator(histogram_bins)
+        high_simulation = DistributionAccumulator(histogram_bins)
+    for batch_start in range(0, iterations, batch_size):
+        batch_iterations = min(batch_size, iterations - batch_start)
+        entries = _sample_entries(rng, entry_prices.shape[0], batch_iterations, iteration_size).ravel()
+        batch_low = (forward_low[entries] - entry_prices[entries]) / entry_prices[entries]
+        batch_high = (forward_high[entries] - entry_prices[entries]) / entry_prices[entries]
+        if histogram_bins is None:
+            out = slice(batch_start * iteration_size, (batch_start + batch_iterations) * iteration_size)
+            low_simulation[out] = batch_low
+            high_simulation[out] = batch_high
+        else:
+            low_simulation.add(batch_low)
+            high_simulation.add(batch_high)
+        if progress_callback is not None:
+            progress_callback(batch_start + batch_iterations, iterations)
+    return low_simulation, high_simulation
+
+
+def get_exact_simulation_data(df_price, hp):
+    """
+    Exhaustive alternative to `get_simulation_data`: the forward moves of every entry candle.
+
+    Every entry of a Monte Carlo iteration is drawn uniformly from the
+    candles, so the sampled moves converge to the empirical distribution
+    over all the candles. This function returns that distribution exactly,
+    in one vectorized pass and without random draws. Entries whose forward
+    window holds no candle (the last ones) give NaN, as in the sampled runs.
+
+    Parameters
+    ----------
+    df_price : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+    hp : int
+        hold period in hours
+
+    Returns
+    -------
+    tuple
+        np.ndarray of relative low differences, np.ndarray of relative high differences,
+        one value per candle in the order of the rows
+    """
+    with stage("feature"):
+        forward_low, forward_high = _get_forward_low_high(df_price, hp)
+        entry_prices = np.asarray(df_price["Close"], dtype=float)
+        return (forward_low - entry_prices) / entry_prices, (forward_high - entry_prices) / entry_prices
+
+
+def bootstrap_confidence_intervals(values,
+                                   quantiles=(0.05, 0.25, 0.5, 0.75, 0.95),
+                                   n_resamples=1000,
+                                   confidence=0.95,
+                                   seed=None,
+                                   batch_size=None):
+    """
+    Percentile bootstrap confidence intervals of the statistics of a distribution.
+
+    The resamples are drawn from the precomputed values, e.g. the output
+    of `get_exact_simulation_data`, so no forward window is computed again.
+    Missing values are dropped first.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Sample of the distribution
+    quantiles : tuple of float
+        Quantiles to estimate next to the mean and the standard deviation
+    n_resamples : int
+        amount of bootstrap resamples
+    confidence : float
+        Confidence level of the intervals
+    seed : int, np.random.SeedSequence or np.random.Generator, optional
+        Seed of the random generator, set it to reproduce a run
+    batch_size : int, optional
+        amount of resamples drawn at once, by default as many as fit in about 10M values
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per statistic (mean, std, q0.05, ...) with columns [estimate, lower, upper],
+        std being the sample standard deviation (ddof=1)
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.shape[0] == 0:
+        raise ValueError("No values to bootstrap")
+    rng = np.random.default_rng(seed)
+    quantiles = np.asarray(quantiles, dtype=float)
+    names = ["mean", "std"] + [f"q{q:g}" for q in quantiles]
+    batch_size = batch_size or max(1, 10_000_000 // values.shape[0])
+
+    def statistics(samples):
+        # Sample standard deviation (ddof=1), as pandas and DistributionAccumulator report it
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rows = [samples.mean(axis=-1), samples.std(axis=-1, ddof=1)]
+        if quantiles.shape[0]:
+            rows.extend(np.quantile(samples, quantiles, axis=-1))
+        return np.stack(rows, axis=-1)
+
+    resampled = np.empty((n_resamples, len(names)))
+    for batch_start in range(0, n_resamples, batch_size):
+        batch = min(batch_size, n_resamples - batch_start)
+        samples = values[rng.integers(0, values.shape[0], size=(batch, values.shape[0]))]
+        resampled[batch_start:batch_start + batch] = statistics(samples)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(resampled, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({"estimate": statistics(values), "lower": lower, "upper": upper}, index=names)
+
+
+def _share_arrays(*arrays):
+    """
+    Copies equally sized float64 arrays into one shared memory block as rows of a 2D array
+    """
+    stacked_shape = (len(arrays), arrays[0].shape[0])
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * stacked_shape[0] * stacked_shape[1], 1))
+    stacked = np.ndarray(stacked_shape, dtype=np.float64, buffer=shm.buf)
+    for row, values in zip(stacked, arrays):
+        row[:] = values
+    del stacked
+    return shm, stacked_shape
+
+
+def _simulation_shard(shm_name, stacked_shape, iterations, iteration_size, seed_sequence, batch_size, histogram_bins=None):
+    """
+    Process pool worker: runs a shard of iterations over candle arrays in shared memory
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        stacked = np.ndarray(stacked_shape, dtype=np.float64, buffer=shm.buf)
+        entry_prices, forward_low, forward_high = stacked
+        result = _simulate_from_forward_low_high(entry_prices=entry_prices,
+                                                 forward_low=forward_low,
+                                                 forward_high=forward_high,
+                                                 iterations=iterations,
+                                                 iteration_size=iteration_size,
+                                                 rng=np.random.default_rng(seed_sequence),
+                                                 batch_size=batch_size,
+                                                 histogram_bins=histogram_bins)
+        del stacked, entry_prices, forward_low, forward_high
+        return result
+    finally:
+        shm.close()
+
+
+def _split_iterations(iterations, shards):
+    shards = max(1, min(shards, iterations))
+    return [len(part) for part in np.array_split(np.arange(iterations), shards)]
+
+
+def run_simulations(jobs,
+                    from_date,
+                    to_date,
+                    c_size="1h",
+                    iterations=100000,
+                    iteration_size=15,
+                    seed=None,
+                    max_workers=None,
+                    shards_per_job=None,
+                    batch_size=10000,
+                    load_candles=extract_price_candles_data,
+                    histogram_bins=None):
+    """
+    Runs the batched simulation for many (symbol, hp) jobs on a process pool.
+
+    Candles are loaded once per symbol. Entry prices and forward
+    min-Low/max-High of every job are placed in shared memory, and the
+    iterations of every job are split into shards that workers run on
+    independent random streams spawned from one seed. Shards are merged
+    in order, so a run is reproducible for a given seed and shard layout.
+
+    Parameters
+    ----------
+    jobs : list of tuple
+        (symbol, hp) pairs, hp in hours. Repeated pairs are run once
+    from_date : str
+        Starting date of the data to pull in format '%Y-%m-%d %H:%M:%S'
+    to_date : str
+        End date of the data to pull in format '%Y-%m-%d %H:%M:%S'
+    c_size : str
+        Candle size, see `extract_data`
+    iterations : int
+        amount of simulated iterations per job
+    iteration_size : int
+        amount of distinct entries sampled per iteration
+    seed : int or np.random.SeedSequence, optional
+        Root seed of the random streams
+    max_workers : int, optional
+        Size of the process pool, os.cpu_count() by default
+    shards_per_job : int, optional
+        Amount of shards the iterations of a job are split into, max_workers by default
+    batch_size : int
+        amount of iterations drawn at once inside a worker
+    load_candles : callable
+        Function with the `extract_data` signature returning the candles of a symbol
+        as a dataframe or as CandleArrays
+    histogram_bins : array-like, optional
+        Histogram bin edges; when given workers reduce their batches to
+        DistributionAccumulators and only those are sent back and merged
+
+    Returns
+    -------
+    dict
+        (symbol, hp) -> (np.ndarray of low differences, np.ndarray of high differences),
+        or (low DistributionAccumulator, high DistributionAccumulator) with histogram_bins
+    """
+    # Results are keyed by job, a repeated job would overwrite the shards of the first one
+    jobs = list(dict.fromkeys(jobs))
+    max_workers = max_workers or os.cpu_count() or 1
+    shards_per_job = shards_per_job or max_workers
+    root_seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    job_seeds = root_seed.spawn(len(jobs))
+
+    candles = {}
+    for symbol, _ in jobs:
+        if symbol not in candles:
+            candles[symbol] = load_candles(symbol=symbol,
+                                           from_date=from_date,
+                                           to_date=to_date,
+                                           c_size=c_size)
+            _check_iteration_size(len(candles[symbol]), iteration_size)
+
+    shared_blocks = []
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for job, job_seed in zip(jobs, job_seeds):
+                symbol, hp = job
+                df_price = candles[symbol]
+                forward_low, forward_high = _get_forward_low_high(df_price, hp)
+                shm, stacked_shape = _share_arrays(np.asarray(df_price["Close"], dtype=float),
+                                                   forward_low,
+                                                   forward_high)
+                shared_blocks.append(shm)
+                shard_iterations = _split_iterations(iterations, shards_per_job)
+                futures[job] = [executor.submit(_simulation_shard,
+                                                shm.name,
+                                                stacked_shape,
+                                                n,
+                                                iteration_size,
+                                                shard_seed,
+                                                batch_size,
+                                                histogram_bins)
+                                for n, shard_seed in zip(shard_iterations, job_seed.spawn(len(shard_iterations)))]
+            results = {}
+            for job, shard_futures in futures.items():
+                shards = [future.result() for future in shard_futures]
+                if histogram_bins is None:
+                    results[job] = (np.concatenate([low for low, _ in shards]),
+                                    np.concatenate([high for _, high in shards]))
+                else:
+                    results[job] = (DistributionAccumulator(histogram_bins), DistributionAccumulator(histogram_bins))
+                    for low, high in shards:
+                        results[job][0].merge(low)
+                        results[job][1].merge(high)
+    finally:
+        for shm in shared_blocks:
+            shm.close()
+            shm.unlink()
+    return results
+
+
+def main(argv=None):
+    """
+    Runs the price volatility study and plots the simulated distributions
+    """
+    parser = argparse.ArgumentParser(description="Simulates forward low/high price moves of random entries")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--from-date", default="2024-05-20 00:00:00")
+    parser.add_argument("--to-date", default="2024-09-19 00:00:00")
+    parser.add_argument("--c-size", default="1h")
+    parser.add_argument("--hp", type=int, nargs="+", default=[24, 1], help="Hold periods in hours")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--iteration-size", type=int, default=15)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument("--output-dir", help="Save the plots as PNG files here instead of showing them")
+    args = parser.parse_args(argv)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    def output(name, pair, hp):
+        return os.path.join(args.output_dir, f"{pair}_{hp}h_{name}.png") if args.output_dir else None
+
+    simulations = run_simulations(jobs=[(args.symbol, hp) for hp in args.hp],
+                                  from_date=args.from_date,
+                                  to_date=args.to_date,
+                                  c_size=args.c_size,
+                                  iterations=args.iterations,
+                                  iteration_size=args.iteration_size,
+                                  seed=args.seed,
+                                  max_workers=args.max_workers)
+
+    for (pair, hp), (low_simulation_list, high_simulation_list) in simulations.items():
+        print(f"""
 ####################################################
-      Low Distribution; hp: {hp}h
+      Low Distribution; {pair} hp: {hp}h
 ####################################################""")
-plot_hist_with_normal(data=low_simulation_list, bins=100)
+        plot_hist_with_normal(data=low_simulation_list, bins=100, output=output("low", pair, hp))
 
-print(f"""
+        print(f"""
 ####################################################
-      High Distribution; hp: {hp}h
+      High Distribution; {pair} hp: {hp}h
 ####################################################""")
-plot_hist_with_normal(data=high_simulation_list, bins=100)
+        plot_hist_with_normal(data=high_simulation_list, bins=100, output=output("high", pair, hp))
 
-print(f"""
+        print(f"""
 ####################################################
-      Joined Distribution; hp: {hp}h
+      Joined Distribution; {pair} hp: {hp}h
 ####################################################""")
-plot_hist_with_normal(data=low_simulation_list + high_simulation_list, bins=100)
-
-
+        plot_distribution(DistributionAccumulator.from_values(low_simulation_list, high_simulation_list, bins=100),
+                          output=output("joined", pair, hp))
 
 
+if __name__ == "__main__":
+    main()
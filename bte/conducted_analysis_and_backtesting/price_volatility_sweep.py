@@ -0,0 +1,118 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import ForwardFeatureCube
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import RELATIVE_DIFFERENCE_COLUMNS
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _FORWARD_FEATURE_CUBE
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _fingerprint_candles
+
+
+def _count_events_for_hp(df_candles, hp, thresholds, columns_to_track):
+    """
+    Process pool worker: event counts of one hold period
+    """
+    return ForwardFeatureCube(max_bytes=0).count_events(df_candles=df_candles,
+                                                        hps=[hp],
+                                                        thresholds=thresholds,
+                                                        columns_to_track=columns_to_track)
+
+
+# Bumped whenever the layout or the computation of the sweep table changes,
+# so results memoized by older code are not reused
+SWEEP_CACHE_VERSION = 1
+
+
+def _sweep_key(fingerprint, hps, thresholds, columns_to_track):
+    digest = hashlib.sha1()
+    digest.update(f"sweep-v{SWEEP_CACHE_VERSION}".encode())
+    digest.update(fingerprint.encode())
+    digest.update(repr([pd.Timedelta(hp).value for hp in hps]).encode())
+    digest.update(np.asarray(thresholds, dtype=np.float64).tobytes())
+    digest.update(repr(list(columns_to_track)).encode())
+    return digest.hexdigest()
+
+
+def sweep(df_candles, hps, thresholds, columns_to_track=None, max_workers=1, cache_dir=None):
+    """
+    Returns event statistics for every hp x column_to_track x threshold combination.
+
+    Forward features are computed once per hold period and shared by all
+    thresholds and columns, event counts come from cumulative counts over
+    the sorted values. Hold periods run in parallel on a process pool when
+    max_workers is above 1. With a cache_dir the result is memoized on
+    disk, keyed by a hash of the candles and of the parameters.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+    hps : list of datetime.timedelta
+        hold periods
+    thresholds : list of float
+        thresholds to compare against
+    columns_to_track : list of str, optional
+        Relative-difference columns, all of RELATIVE_DIFFERENCE_COLUMNS by default
+    max_workers : int
+        Amount of hold periods computed at the same time
+    cache_dir : str, optional
+        Directory of the memoized results
+
+    Returns
+    -------
+    pd.DataFrame
+        Tidy table with columns [hp, column_to_track, threshold, direction,
+        number_of_events, population_size, probability], where direction is
+        'positive' (value >= threshold, as `_get_number_of_positive_events`)
+        or 'negative' (value < threshold, as `_get_number_of_negative_events`)
+    """
+    if columns_to_track is None:
+        columns_to_track = RELATIVE_DIFFERENCE_COLUMNS
+    thresholds = list(thresholds)
+
+    cache_path = None
+    if cache_dir is not None:
+        key = _sweep_key(_fingerprint_candles(df_candles), hps, thresholds, columns_to_track)
+        cache_path = os.path.join(cache_dir, f"sweep-{key}.pkl")
+        if os.path.exists(cache_path):
+            return pd.read_pickle(cache_path)
+
+    if max_workers > 1 and len(hps) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(hps))) as executor:
+            frames = list(executor.map(_count_events_for_hp,
+                                       [df_candles] * len(hps),
+                                       hps,
+                                       [thresholds] * len(hps),
+                                       [columns_to_track] * len(hps)))
+        events = pd.concat(frames, ignore_index=True)
+    else:
+        events = _FORWARD_FEATURE_CUBE.count_events(df_candles=df_candles,
+                                                    hps=hps,
+                                                    thresholds=thresholds,
+                                                    columns_to_track=columns_to_track)
+
+    result = events.melt(id_vars=["hp", "column_to_track", "threshold", "population_size"],
+                         value_vars=["number_of_positive_events", "number_of_negative_events"],
+                         var_name="direction",
+                         value_name="number_of_events")
+    result["direction"] = result["direction"].map({"number_of_positive_events": "positive",
+                                                   "number_of_negative_events": "negative"})
+    result["probability"] = result["number_of_events"] / result["population_size"]
+    result = result[["hp", "column_to_track", "threshold", "direction",
+                     "number_of_events", "population_size", "probability"]]
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp-", suffix=".pkl")
+        os.close(fd)
+        try:
+            result.to_pickle(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return result
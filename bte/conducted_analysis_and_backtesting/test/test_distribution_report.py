@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.conducted_analysis_and_backtesting.distribution_report import DistributionAccumulator
+
+import numpy as np
+import pandas as pd
+
+
+def test_distribution_accumulator():
+    rng = np.random.default_rng(0)
+    values = rng.standard_t(5, size=10000) * 0.01 + 0.002
+    values[::97] = np.nan
+    bins = np.linspace(-0.03, 0.03, 61)
+
+    accumulator = DistributionAccumulator(bins)
+    for batch in np.array_split(values, 13):
+        accumulator.add(batch)
+    merged = DistributionAccumulator(bins).add(values[:5000]).merge(DistributionAccumulator(bins).add(values[5000:]))
+
+    valid = values[~np.isnan(values)]
+    series = pd.Series(valid)
+    for result in [accumulator, merged]:
+        assert result.count == valid.shape[0]
+        assert result.missing == values.shape[0] - valid.shape[0]
+        np.testing.assert_array_equal(result.counts, np.histogram(valid, bins=bins)[0])
+        assert result.counts.sum() + result.underflow + result.overflow == result.count
+        np.testing.assert_allclose(result.normal_fit(), (series.mean(), series.std()))
+        np.testing.assert_allclose(result.skewness, series.skew(), rtol=1e-2)
+        np.testing.assert_allclose(result.kurtosis, series.kurt(), rtol=1e-2)
+
+    joined = DistributionAccumulator.from_values(valid[:10], valid[10:], bins=100)
+    assert joined.counts.sum() == valid.shape[0]
+    np.testing.assert_allclose(joined.density().sum() * np.diff(joined.bins)[0], 1.0)
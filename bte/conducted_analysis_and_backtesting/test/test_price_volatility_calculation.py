@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import rolling_forward_max_min
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_data_for_analysis
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_number_of_positive_events
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_number_of_negative_events
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import ForwardFeatureCube
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import iter_forward_features
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import count_events_streaming
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import IncrementalForwardFeatures
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import clear_feature_cache
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import set_feature_cache_size
+from bte.conducted_analysis_and_backtesting import price_volatility_calculation
+from bte.utils.candle_arrays import CandleArrays
+
+import numpy as np
+import pandas as pd
+import pytest
+import datetime
+
+
+def _make_candles(n, seed=0, irregular=False):
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(1, 4, size=n) if irregular else np.ones(n, dtype=int)
+    timestamps = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.cumsum(steps) * 15, unit='min')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=n)))
+    high = close * (1 + rng.uniform(0, 0.01, size=n))
+    low = close * (1 - rng.uniform(0, 0.01, size=n))
+    return pd.DataFrame({'Timestamp': timestamps,
+                         'Open': close,
+                         'High': high,
+                         'Low': low,
+                         'Close': close,
+                         'Volume': rng.uniform(1, 10, size=n)})
+
+
+def _reference_rolling_forward_max_min(df, window):
+    rows = []
+    for current_time in df.index:
+        df_window = df[(df.index > current_time) & (df.index <= current_time + window)]
+        if df_window.empty:
+            rows.append([np.nan] * 5)
+        else:
+            rows.append([df_window['High'].max(),
+                         df_window['Low'].min(),
+                         df_window['Close'].max(),
+                         df_window['Close'].min(),
+                         df_window['Close'].mean()])
+    return pd.DataFrame(rows, index=df.index, columns=['Rolling_Max_High',
+                                                       'Rolling_Min_Low',
+                                                       'Rolling_Max_Close',
+                                                       'Rolling_Min_Close',
+                                                       'Rolling_Mean_Close'])
+
+
+def test_rolling_forward_max_min():
+    for irregular in [False, True]:
+        for window in [datetime.timedelta(minutes=15),
+                       datetime.timedelta(hours=1),
+                       datetime.timedelta(minutes=100)]:
+            df = _make_candles(300, irregular=irregular).set_index('Timestamp')
+            expected = _reference_rolling_forward_max_min(df, window)
+            df = rolling_forward_max_min(df, window)
+            for column in expected.columns:
+                np.testing.assert_allclose(df[column].values, expected[column].values, rtol=1e-12)
+            assert np.isnan(df['Rolling_Max_High'].iloc[-1])
+
+
+def test_rolling_forward_max_min_unsorted_index():
+    window = datetime.timedelta(hours=1)
+    df = _make_candles(200, seed=1, irregular=True).set_index('Timestamp')
+    shuffled = df.sample(frac=1, random_state=0)
+    expected = rolling_forward_max_min(df.copy(), window)
+    result = rolling_forward_max_min(shuffled.copy(), window).loc[expected.index]
+    for column in ['Rolling_Max_High', 'Rolling_Min_Low', 'Rolling_Mean_Close']:
+        np.testing.assert_allclose(result[column].values, expected[column].values, rtol=1e-12)
+
+
+def test_forward_feature_cube():
+    df_candles = _make_candles(400, seed=2, irregular=True)
+    hps = [datetime.timedelta(minutes=30), datetime.timedelta(hours=2)]
+    thresholds = [-0.01, -0.002, 0, 0.002, 0.01]
+    columns = ['Close__to__Rolling_Max_High__Relative_Difference',
+               'Low__to__Rolling_Mean_Close__Relative_Difference']
+    # Budget of one sorted column of 400 values
+    cube = ForwardFeatureCube(max_bytes=400 * 8)
+    events = cube.count_events(df_candles, hps=hps, thresholds=thresholds, columns_to_track=columns)
+    assert events.shape[0] == len(hps) * len(thresholds) * len(columns)
+    for row in events.itertuples():
+        df = _get_data_for_analysis(df_candles=df_candles, hp=row.hp)
+        assert row.number_of_positive_events == df[df[row.column_to_track] >= row.threshold].shape[0]
+        assert row.number_of_negative_events == df[df[row.column_to_track] < row.threshold].shape[0]
+        assert row.population_size == df.shape[0]
+    assert len(cube._entries) == 1 and cube.nbytes <= cube.max_bytes
+
+    # Only the requested columns are computed and cached
+    cube = ForwardFeatureCube()
+    features, population_size = cube.sorted_features(df_candles, hps[0], columns[:1])
+    assert list(features) == columns[:1] and population_size == 400
+    assert [key[2] for key in cube._entries] == columns[:1]
+    cube.sorted_features(df_candles, hps[0], columns)
+    assert [key[2] for key in cube._entries] == columns
+    assert cube.nbytes == sum(values.nbytes for values in cube._entries.values())
+    cube.resize(0)
+    assert not cube._entries and cube.nbytes == 0
+    pd.testing.assert_frame_equal(cube.count_events(df_candles, hps=hps, thresholds=thresholds, columns_to_track=columns), events)
+    assert not cube._entries
+
+    default_size = price_volatility_calculation._FORWARD_FEATURE_CUBE.max_bytes
+    clear_feature_cache()
+    _get_number_of_positive_events(df_candles, hps[0], 0.002, columns[0])
+    assert len(price_volatility_calculation._FORWARD_FEATURE_CUBE._entries) == 1
+    set_feature_cache_size(0)
+    assert not price_volatility_calculation._FORWARD_FEATURE_CUBE._entries
+    set_feature_cache_size(default_size)
+
+    row = events[(events['hp'] == hps[0])
+                 & (events['column_to_track'] == columns[0])
+                 & (events['threshold'] == 0.002)].iloc[0]
+    assert _get_number_of_positive_events(df_candles, hps[0], 0.002, columns[0]) == (row['number_of_positive_events'],
+                                                                                   row['population_size'])
+    assert _get_number_of_negative_events(df_candles, hps[0], 0.002, columns[0]) == (row['number_of_negative_events'],
+                                                                                   row['population_size'])
+
+
+def test_iter_forward_features():
+    df_candles = _make_candles(500, seed=3, irregular=True)
+    hp = datetime.timedelta(hours=2)
+    columns = ['Close__to__Rolling_Max_High__Relative_Difference',
+               'High__to__Rolling_Min_Low__Relative_Difference']
+    expected = _get_data_for_analysis(df_candles=df_candles, hp=hp)[columns]
+    for chunk_size in [7, 64, 1000]:
+        chunks = list(iter_forward_features(df_candles, hp, columns, chunk_size=chunk_size))
+        result = pd.concat(chunks)
+        assert result.dtypes.tolist() == [np.float32] * len(columns)
+        assert result.index.equals(expected.index)
+        np.testing.assert_allclose(result.values, expected.values.astype(np.float32), rtol=1e-6)
+
+    # A stream of chunks, e.g. read partition by partition
+    stream = (df_candles.iloc[i:i + 50] for i in range(0, 500, 50))
+    events = count_events_streaming(stream, hp, thresholds=[-0.005, 0, 0.005], columns_to_track=columns)
+    expected_events = ForwardFeatureCube().count_events(df_candles, hps=[hp], thresholds=[-0.005, 0, 0.005],
+                                                        columns_to_track=columns)
+    pd.testing.assert_frame_equal(events, expected_events, check_dtype=False)
+
+
+def test_incremental_forward_features():
+    df_candles = _make_candles(500, seed=4, irregular=True)
+    hp = datetime.timedelta(hours=2)
+    thresholds = [-0.005, 0, 0.005]
+    engine = IncrementalForwardFeatures(hp, thresholds, bins=np.linspace(-0.05, 0.05, 21))
+    finalized = []
+    for start in range(0, 500, 30):
+        # The last candle of every update is read again by the next one
+        finalized.append(engine.update(df_candles.iloc[max(start - 1, 0):start + 30]))
+    result = pd.concat(finalized)
+    expected = _get_data_for_analysis(df_candles=df_candles, hp=hp)[engine.columns_to_track]
+    assert engine.population_size + engine.pending == 500
+    assert result.index.equals(expected.index[:engine.population_size])
+    np.testing.assert_allclose(result.values, expected.values[:engine.population_size])
+
+    expected_events = ForwardFeatureCube().count_events(df_candles, hps=[hp], thresholds=thresholds)
+    pd.testing.assert_frame_equal(engine.count_events(include_pending=True), expected_events, check_dtype=False)
+    counts, _ = engine.histogram(engine.columns_to_track[0])
+    assert counts.sum() <= engine.population_size
+
+
+def test_incremental_forward_features_rejects_finalized_windows():
+    df_candles = _make_candles(40, seed=5)
+    df_candles['Timestamp'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.arange(40), unit='h')
+    hp = datetime.timedelta(hours=3)
+    engine = IncrementalForwardFeatures(hp, [0])
+    engine.update(df_candles.iloc[:20])
+    assert engine.last_finalized == df_candles['Timestamp'].iloc[15]
+
+    # The pending candle right after the last finalized row is in its window
+    revised = df_candles.iloc[[16]].copy()
+    revised['High'] *= 2
+    with pytest.raises(ValueError):
+        engine.update(revised)
+    with pytest.raises(ValueError):
+        engine.update(df_candles.iloc[[18]])
+
+    # The candle still forming can be replaced
+    forming = df_candles.iloc[[19]].copy()
+    forming['Close'] *= 1.001
+    engine.update(forming)
+    df_candles.iloc[19] = forming.iloc[0]
+    result = engine.update(df_candles.iloc[20:])
+    expected = _get_data_for_analysis(df_candles=df_candles, hp=hp)[engine.columns_to_track]
+    pd.testing.assert_frame_equal(result, expected.loc[result.index], check_index_type=False, check_freq=False)
+
+def test_candle_arrays_input(tmp_path):
+    df = _make_candles(500, seed=4, irregular=True)
+    CandleArrays.from_frame(df).save(str(tmp_path / 'candles'))
+    candles = CandleArrays.open(str(tmp_path / 'candles'))
+    hp = datetime.timedelta(hours=2)
+    column = 'Close__to__Rolling_Max_High__Relative_Difference'
+
+    expected = _get_data_for_analysis(df, hp)
+    pd.testing.assert_frame_equal(_get_data_for_analysis(candles, hp), expected, check_index_type=False, check_freq=False)
+    assert _get_number_of_positive_events(candles, hp, 0.01, column) == _get_number_of_positive_events(df, hp, 0.01, column)
+    assert _get_number_of_negative_events(candles, hp, 0.01, column) == _get_number_of_negative_events(df, hp, 0.01, column)
+    pd.testing.assert_frame_equal(ForwardFeatureCube().count_events(candles, [hp], [-0.01, 0.01]),
+                                  ForwardFeatureCube().count_events(df, [hp], [-0.01, 0.01]))
+    pd.testing.assert_frame_equal(count_events_streaming(candles, hp, [-0.01, 0.01], chunk_size=100),
+                                  count_events_streaming(df, hp, [-0.01, 0.01], chunk_size=100))
+
+    from_arrays = IncrementalForwardFeatures(hp, [-0.01, 0.01])
+    from_frame = IncrementalForwardFeatures(hp, [-0.01, 0.01])
+    for start in range(0, 500, 120):
+        pd.testing.assert_frame_equal(from_arrays.update(candles[start:start + 120]), from_frame.update(df.iloc[start:start + 120]),
+                                      check_index_type=False, check_freq=False)
+    pd.testing.assert_frame_equal(from_arrays.count_events(include_pending=True), from_frame.count_events(include_pending=True))
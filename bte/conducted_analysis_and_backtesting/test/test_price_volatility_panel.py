@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import ForwardFeatureCube
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import RELATIVE_DIFFERENCE_COLUMNS
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_data_for_analysis
+from bte.conducted_analysis_and_backtesting.price_volatility_panel import count_panel_events
+from bte.conducted_analysis_and_backtesting.price_volatility_panel import panel_forward_features
+from bte.utils.candle_arrays import CandlePanel
+from bte.utils.synthetic_candle_data import generate_candles
+
+import numpy as np
+import pandas as pd
+
+
+def _candles():
+    candles = {}
+    for seed, symbol in enumerate(['BTCUSDT', 'ETHUSDT', 'AAPL']):
+        df = generate_candles(600, interval='1h', seed=seed)
+        if symbol == 'AAPL':
+            # Trading hours only, the panel has gaps for this symbol
+            df = df[(df['Timestamp'].dt.hour >= 14) & (df['Timestamp'].dt.hour < 21)].reset_index(drop=True)
+        candles[symbol] = df
+    return candles
+
+
+def test_panel_forward_features():
+    candles = _candles()
+    panel = CandlePanel.from_candles(candles)
+    assert panel.symbols == ['BTCUSDT', 'ETHUSDT', 'AAPL']
+    features = panel_forward_features(panel, datetime.timedelta(hours=5))
+    for j, (symbol, df) in enumerate(candles.items()):
+        rows = np.searchsorted(panel.timestamp, df['Timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64))
+        expected = _get_data_for_analysis(df, datetime.timedelta(hours=5))
+        for column in RELATIVE_DIFFERENCE_COLUMNS:
+            np.testing.assert_allclose(features[column][rows, j], expected[column].to_numpy())
+        missing = np.setdiff1d(np.arange(len(panel)), rows)
+        for column in RELATIVE_DIFFERENCE_COLUMNS:
+            assert np.isnan(features[column][missing, j]).all()
+
+
+def test_count_panel_events():
+    candles = _candles()
+    hps = [datetime.timedelta(hours=1), datetime.timedelta(hours=24)]
+    thresholds = [-0.01, 0, 0.01]
+    result = count_panel_events(candles, hps, thresholds)
+    expected = pd.concat([ForwardFeatureCube().count_events(df, hps, thresholds).assign(symbol=symbol)
+                          for symbol, df in candles.items()], ignore_index=True)
+    pd.testing.assert_frame_equal(result, expected[result.columns], check_dtype=False)
+
+    # Candles of many symbols in one (Symbol, Timestamp) indexed frame
+    frame = pd.concat({symbol: df.set_index('Timestamp') for symbol, df in candles.items()}, names=['Symbol', 'Timestamp'])
+    pd.testing.assert_frame_equal(count_panel_events(frame, hps, thresholds), result)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import _get_forward_low_high
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import get_simulation_data_batched
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import get_exact_simulation_data
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import bootstrap_confidence_intervals
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import run_simulations
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import _split_iterations
+from bte.conducted_analysis_and_backtesting.price_volatility_simulation import get_simulation_data
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.synthetic_candle_data import generate_candles
+
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_import_has_no_side_effects():
+    code = ("import sys\n"
+            "import bte.conducted_analysis_and_backtesting.price_volatility_simulation\n"
+            "import bte.utils.multi_symbol_candle_data\n"
+            "print(sorted(m for m in ['matplotlib', 'scipy', 'binance', 'yfinance',\n"
+            "                         'bte.utils.replay_data_source', 'bte.utils.synthetic_candle_data'] if m in sys.modules))\n")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_forward_low_high():
+    df_price = generate_candles(300, interval='1h', seed=2)
+    forward_low, forward_high = _get_forward_low_high(df_price, hp=5)
+    for i in [0, 17, 294, 299]:
+        entry_time = df_price["Timestamp"].iloc[i]
+        df = df_price[(df_price["Timestamp"] > entry_time) & (df_price["Timestamp"] - pd.Timedelta(hours=5) <= entry_time)]
+        np.testing.assert_equal(forward_low[i], df["Low"].min())
+        np.testing.assert_equal(forward_high[i], df["High"].max())
+
+
+def test_simulation_data():
+    df_price = generate_candles(300, interval='1h', seed=2)
+    low, high = get_simulation_data_batched(df_price, hp=5, iterations=1000, iteration_size=15, seed=1, batch_size=300)
+    assert low.shape == high.shape == (15000,)
+    again = get_simulation_data_batched(df_price, hp=5, iterations=1000, iteration_size=15, seed=1, batch_size=300)
+    np.testing.assert_array_equal(low, again[0])
+
+    # The sampled moves are drawn from the exact distribution
+    exact_low, exact_high = get_exact_simulation_data(df_price, hp=5)
+    assert np.isin(low[~np.isnan(low)], exact_low).all()
+    assert np.isin(high[~np.isnan(high)], exact_high).all()
+
+    intervals = bootstrap_confidence_intervals(exact_high, n_resamples=200, seed=0)
+    assert intervals.index.tolist() == ['mean', 'std', 'q0.05', 'q0.25', 'q0.5', 'q0.75', 'q0.95']
+    np.testing.assert_allclose(intervals.loc['std', 'estimate'], pd.Series(exact_high).std())
+    assert (intervals['lower'] <= intervals['estimate']).all()
+    assert (intervals['estimate'] <= intervals['upper']).all()
+
+
+def test_iteration_size_larger_than_candles():
+    df_price = generate_candles(10, interval='1h', seed=2)
+    with pytest.raises(ValueError, match='15 .* 10 candles'):
+        get_simulation_data_batched(df_price, hp=5, iterations=10, iteration_size=15)
+    with pytest.raises(ValueError, match='15 .* 10 candles'):
+        run_simulations(jobs=[('AAAUSDT', 5)],
+                        from_date=None,
+                        to_date=None,
+                        iterations=10,
+                        max_workers=1,
+                        load_candles=lambda symbol, **kwargs: df_price)
+    low, high = get_simulation_data_batched(df_price, hp=5, iterations=10, iteration_size=10, seed=0)
+    assert low.shape == high.shape == (100,)
+
+
+def test_run_simulations():
+    candles = {'AAAUSDT': generate_candles(200, interval='1h', seed=3)}
+    results = run_simulations(jobs=[('AAAUSDT', 5), ('AAAUSDT', 1)],
+                              from_date=None,
+                              to_date=None,
+                              iterations=100,
+                              seed=7,
+                              max_workers=2,
+                              load_candles=lambda symbol, **kwargs: candles[symbol])
+    again = run_simulations(jobs=[('AAAUSDT', 5), ('AAAUSDT', 1)],
+                            from_date=None,
+                            to_date=None,
+                            iterations=100,
+                            seed=7,
+                            max_workers=2,
+                            load_candles=lambda symbol, **kwargs: candles[symbol])
+    assert sorted(results) == [('AAAUSDT', 1), ('AAAUSDT', 5)]
+    for job, (low, high) in results.items():
+        assert low.shape == high.shape == (1500,)
+        np.testing.assert_array_equal(low, again[job][0])
+
+
+def test_run_simulations_matches_serial_run():
+    candles = {'AAAUSDT': generate_candles(200, interval='1h', seed=3),
+               'BBBUSDT': generate_candles(150, interval='1h', seed=4)}
+    jobs = [('AAAUSDT', 5), ('BBBUSDT', 2), ('AAAUSDT', 5)]
+    results = run_simulations(jobs=jobs,
+                              from_date=None,
+                              to_date=None,
+                              iterations=100,
+                              seed=7,
+                              max_workers=2,
+                              shards_per_job=3,
+                              batch_size=30,
+                              load_candles=lambda symbol, **kwargs: candles[symbol])
+    # The repeated job is run once
+    assert list(results) == [('AAAUSDT', 5), ('BBBUSDT', 2)]
+    for job, job_seed in zip(results, np.random.SeedSequence(7).spawn(2)):
+        shard_iterations = _split_iterations(100, 3)
+        shards = [get_simulation_data_batched(candles[job[0]], hp=job[1], iterations=n, seed=shard_seed, batch_size=30)
+                  for n, shard_seed in zip(shard_iterations, job_seed.spawn(len(shard_iterations)))]
+        np.testing.assert_array_equal(results[job][0], np.concatenate([low for low, _ in shards]))
+        np.testing.assert_array_equal(results[job][1], np.concatenate([high for _, high in shards]))
+
+
+def test_candle_arrays_input():
+    df_price = generate_candles(300, interval='1h', seed=2)
+    candles = CandleArrays.from_frame(df_price)
+    for low, high in zip(get_exact_simulation_data(candles, hp=5), get_exact_simulation_data(df_price, hp=5)):
+        np.testing.assert_array_equal(low, high)
+    for low, high in zip(get_simulation_data_batched(candles, hp=5, iterations=50, seed=3),
+                         get_simulation_data_batched(df_price, hp=5, iterations=50, seed=3)):
+        np.testing.assert_array_equal(low, high)
+    np.random.seed(4)
+    from_arrays = get_simulation_data(candles, hp=5, iterations=5, progress=lambda *args: None)
+    np.random.seed(4)
+    from_frame = get_simulation_data(df_price, hp=5, iterations=5, progress=lambda *args: None)
+    np.testing.assert_array_equal(from_arrays, from_frame)
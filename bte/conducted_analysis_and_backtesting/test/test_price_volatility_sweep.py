@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+
+from bte.conducted_analysis_and_backtesting import price_volatility_sweep
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_number_of_negative_events
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_number_of_positive_events
+from bte.conducted_analysis_and_backtesting.price_volatility_sweep import sweep
+from bte.utils.synthetic_candle_data import generate_candles
+
+import pandas as pd
+import pytest
+
+
+HPS = [datetime.timedelta(hours=3), datetime.timedelta(hours=12)]
+THRESHOLDS = [-0.01, 0, 0.02]
+COLUMNS = ['Close__to__Rolling_Max_High__Relative_Difference', 'Low__to__Rolling_Mean_Close__Relative_Difference']
+
+
+def test_sweep_matches_event_helpers():
+    df_candles = generate_candles(300, interval='1h', seed=6)
+    result = sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS)
+    assert result.shape[0] == len(HPS) * len(THRESHOLDS) * len(COLUMNS) * 2
+    for _, row in result.iterrows():
+        helper = _get_number_of_positive_events if row['direction'] == 'positive' else _get_number_of_negative_events
+        number_of_events, population_size = helper(df_candles, row['hp'], row['threshold'], row['column_to_track'])
+        assert (row['number_of_events'], row['population_size']) == (number_of_events, population_size)
+        assert row['probability'] == number_of_events / population_size
+
+
+def test_sweep_process_pool():
+    df_candles = generate_candles(300, interval='1h', seed=6)
+    serial = sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS)
+    pd.testing.assert_frame_equal(sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS, max_workers=2), serial)
+
+
+def test_sweep_cache(tmp_path, monkeypatch):
+    df_candles = generate_candles(300, interval='1h', seed=6)
+    result = sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS, cache_dir=str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    # A cache hit does not compute anything
+    def fail(*args, **kwargs):
+        raise AssertionError("the sweep was recomputed")
+    monkeypatch.setattr(price_volatility_sweep._FORWARD_FEATURE_CUBE, "count_events", fail)
+    pd.testing.assert_frame_equal(sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS, cache_dir=str(tmp_path)), result)
+
+    # Results of another cache version are not reused
+    monkeypatch.setattr(price_volatility_sweep, "SWEEP_CACHE_VERSION", price_volatility_sweep.SWEEP_CACHE_VERSION + 1)
+    with pytest.raises(AssertionError):
+        sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS, cache_dir=str(tmp_path))
+
+
+def test_sweep_cache_write_failure(tmp_path, monkeypatch):
+    df_candles = generate_candles(100, interval='1h', seed=6)
+
+    def fail(self, path, *args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(pd.DataFrame, "to_pickle", fail)
+    with pytest.raises(OSError):
+        sweep(df_candles, HPS, THRESHOLDS, columns_to_track=COLUMNS, cache_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_data_for_analysis
+from bte.conducted_analysis_and_backtesting.walk_forward_backtest import FirstHitTable
+from bte.conducted_analysis_and_backtesting.walk_forward_backtest import backtest_grid
+from bte.conducted_analysis_and_backtesting.walk_forward_backtest import feature_signals
+from bte.conducted_analysis_and_backtesting.walk_forward_backtest import simulate_trades
+from bte.conducted_analysis_and_backtesting.walk_forward_backtest import walk_forward
+from bte.utils.synthetic_candle_data import generate_candles
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_first_hit_table():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=200)
+    values[rng.random(200) < 0.1] = np.nan
+    start = np.arange(200)
+    end = np.minimum(start + rng.integers(0, 20, size=200), 200)
+    levels = rng.normal(size=200) + 1
+    first = FirstHitTable(values, 20, "above").query(levels, start, end)
+    for i in range(200):
+        hits = np.flatnonzero(values[start[i]:end[i]] >= levels[i])
+        assert first[i] == (start[i] + hits[0] if hits.shape[0] else end[i])
+
+
+def test_simulate_trades():
+    df = generate_candles(400, interval='1h', seed=4)
+    trades = simulate_trades(df, datetime.timedelta(hours=6), 0.01, -0.01)
+    timestamps = df['Timestamp'].to_numpy(dtype='datetime64[ns]')
+    for i in [0, 55, 210, 398]:
+        entry_price = df['Close'].iloc[i]
+        window = np.flatnonzero((timestamps > timestamps[i]) & (timestamps <= timestamps[i] + np.timedelta64(6, 'h')))
+        expected = (window[-1], 'time', df['Close'].iloc[window[-1]])
+        for j in window:
+            # The stop loss wins when both levels are hit by the same candle
+            if df['Low'].iloc[j] <= entry_price * 0.99:
+                expected = (j, 'stop_loss', min(entry_price * 0.99, df['Open'].iloc[j]))
+                break
+            if df['High'].iloc[j] >= entry_price * 1.01:
+                expected = (j, 'take_profit', max(entry_price * 1.01, df['Open'].iloc[j]))
+                break
+        trade = trades.iloc[i]
+        assert trade['exit_time'] == timestamps[expected[0]]
+        assert trade['exit_reason'] == expected[1]
+        np.testing.assert_allclose(trade['exit_price'], expected[2])
+    # The last candle has no forward window
+    assert trades.shape[0] == 399
+
+
+def test_gap_fills():
+    # Entry at 100, the next candles gap through the take profit and the stop loss levels
+    df = pd.DataFrame({'Timestamp': pd.date_range('2024-01-01 01:00', periods=4, freq='h'),
+                       'Open': [100.0, 104.0, 100.0, 95.0],
+                       'High': [100.0, 105.0, 100.0, 96.0],
+                       'Low': [100.0, 103.0, 100.0, 94.0],
+                       'Close': [100.0, 104.0, 100.0, 95.0],
+                       'Volume': 1.0})
+    trades = simulate_trades(df, datetime.timedelta(hours=1), 0.02, -0.02, signals=[True, False, True, False])
+    assert trades['exit_reason'].tolist() == ['take_profit', 'stop_loss']
+    # Both orders fill at the open, beyond their level
+    np.testing.assert_allclose(trades['exit_price'], [104.0, 95.0])
+
+
+def test_feature_signals():
+    df = generate_candles(300, interval='1h', seed=4)
+    hp = datetime.timedelta(hours=6)
+    column = 'Close__to__Rolling_Min_Low__Relative_Difference'
+    signals = feature_signals(df, hp, column, -0.005)
+    values = _get_data_for_analysis(df, hp)[column].to_numpy()
+    # The value of row i is known once its window has closed, at row i + 6
+    assert not signals[:6].any()
+    np.testing.assert_array_equal(signals[6:], values[:-6] < -0.005)
+    np.testing.assert_array_equal(feature_signals(df, hp, column, -0.005, direction='positive')[6:], values[:-6] >= -0.005)
+    assert backtest_grid(df, [hp], [0.01], [-0.01], signals=signals)['trades'].iloc[0] == signals[:-1].sum()
+
+
+def test_backtest_grid():
+    df = generate_candles(400, interval='1h', seed=4)
+    hps = [datetime.timedelta(hours=3), datetime.timedelta(hours=12)]
+    grid = backtest_grid(df, hps, [0.005, 0.02], [-0.005, -0.02], fee=0.001)
+    assert grid.shape[0] == 8
+    for _, row in grid.iterrows():
+        trades = simulate_trades(df, row['hp'], row['take_profit'], row['stop_loss'], fee=0.001)
+        assert row['trades'] == trades.shape[0]
+        assert row['take_profits'] == (trades['exit_reason'] == 'take_profit').sum()
+        np.testing.assert_allclose(row['total_return'], trades['return'].sum())
+        equity = trades.sort_values('exit_time', kind='stable')['return'].cumsum()
+        np.testing.assert_allclose(row['max_drawdown'], (np.maximum.accumulate(np.maximum(equity, 0)) - equity).max())
+
+    # Without stop loss, take profits are the events of the relative-difference column
+    grid = backtest_grid(df, hps[1:], [0.01], [-1.0])
+    df_features = _get_data_for_analysis(df, hps[1])
+    assert grid['take_profits'].iloc[0] == (df_features['Close__to__Rolling_Max_High__Relative_Difference'] >= 0.01).sum()
+
+
+def test_walk_forward():
+    df = generate_candles(24 * 60, interval='1h', seed=5)
+    arguments = dict(df_candles=df,
+                     hps=[datetime.timedelta(hours=4), datetime.timedelta(hours=8)],
+                     take_profits=[0.005, 0.01],
+                     stop_losses=[-0.005, -0.01],
+                     train_size=datetime.timedelta(days=20),
+                     test_size=datetime.timedelta(days=10))
+    folds = walk_forward(**arguments)
+    assert folds.shape[0] == 4
+    assert (folds['test_start'] == folds['train_end']).all()
+    assert (folds['train_start'].diff().dropna() == pd.Timedelta(days=10)).all()
+    pd.testing.assert_frame_equal(walk_forward(**arguments, max_workers=2), folds)
+
+    # The picked combination is the best one over the trades closed within the train window
+    fold = folds.iloc[1]
+    train = pd.concat([backtest_grid(df, [hp], arguments['take_profits'], arguments['stop_losses'],
+                                     signals=(df['Timestamp'] >= fold['train_start']) & (df['Timestamp'] + hp <= fold['train_end']))
+                       for hp in arguments['hps']], ignore_index=True)
+    best = train.loc[train['total_return'].idxmax()]
+    assert (fold['hp'], fold['take_profit'], fold['stop_loss']) == (best['hp'], best['take_profit'], best['stop_loss'])
+    np.testing.assert_allclose(fold['train_total_return'], best['total_return'])
+
+    # Loss-type metrics would pick the worst combination if maximized
+    for objective in ['max_drawdown', 'stop_losses', 'trades']:
+        with pytest.raises(ValueError):
+            walk_forward(**arguments, objective=objective)
+    folds = walk_forward(**arguments, objective='hit_rate')
+    assert 'train_hit_rate' in folds.columns
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+from bte.conducted_analysis_and_backtesting import window_statistics
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import rolling_forward_max_min
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _random_windows(n, seed):
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.integers(1, 5, size=n))
+    values = rng.normal(100, 5, size=n)
+    values[rng.random(n) < 0.1] = np.nan
+    start, end = window_statistics.forward_window_bounds(timestamps, 7)
+    return values, start, end
+
+
+def _reference(values, start, end, statistic):
+    result = np.full(start.shape[0], np.nan)
+    for i, (s, e) in enumerate(zip(start, end)):
+        window = values[s:e]
+        window = window[~np.isnan(window)]
+        if window.shape[0]:
+            result[i] = {"max": np.max, "min": np.min, "mean": np.mean}[statistic](window)
+    return result
+
+
+@pytest.mark.parametrize("kernels", [
+    {"max": window_statistics._pandas_window_max,
+     "min": window_statistics._pandas_window_min,
+     "mean": window_statistics._pandas_window_mean},
+    {"max": window_statistics._numpy_window_max,
+     "min": window_statistics._numpy_window_min,
+     "mean": window_statistics._numpy_window_mean},
+    # Python versions of the numba kernels
+    {"max": window_statistics._deque_window_max,
+     "min": window_statistics._deque_window_min,
+     "mean": window_statistics._loop_window_mean},
+])
+def test_kernels(kernels):
+    for seed in range(3):
+        values, start, end = _random_windows(300, seed)
+        for statistic in window_statistics.STATISTICS:
+            np.testing.assert_allclose(kernels[statistic](values, start, end),
+                                       _reference(values, start, end, statistic),
+                                       rtol=1e-12)
+
+
+def test_set_backend():
+    window_statistics.set_backend("numpy")
+    assert window_statistics.get_backend() == "numpy"
+    with pytest.raises(ValueError):
+        window_statistics.set_backend("fortran")
+    window_statistics.set_backend("auto")
+    assert window_statistics.get_backend() in ("pandas", "numba")
+
+
+@pytest.mark.parametrize("backend", ["pandas", "numpy"])
+def test_empty_input(backend):
+    window_statistics.set_backend(backend)
+    try:
+        start = end = np.empty(0, dtype=np.int64)
+        for statistic in window_statistics.STATISTICS:
+            assert window_statistics.window_statistic(np.empty(0), start, end, statistic).shape == (0,)
+            assert window_statistics.window_statistic(np.empty((0, 3)), start, end, statistic).shape == (0, 3)
+        df = pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=pd.DatetimeIndex([], name='Timestamp'), dtype=float)
+        df = rolling_forward_max_min(df, datetime.timedelta(hours=1))
+        assert df.shape == (0, 10)
+    finally:
+        window_statistics.set_backend("auto")
@@ -0,0 +1,431 @@
+"""
+Vectorized backtests of take-profit/stop-loss exits over forward windows.
+
+Every signal opens a long trade at the Close of its candle, with a
+take-profit and a stop-loss level given as thresholds of the
+relative-difference columns of `_get_data_for_analysis`: a take profit
+of 0.02 is hit when Close__to__Rolling_Max_High >= 0.02 within the hold
+period, a stop loss of -0.01 when Close__to__Rolling_Min_Low <= -0.01.
+A trade leaves at the first candle of its forward window
+(Timestamp, Timestamp + hp] where a level is hit, and at the Close of
+the last candle of the window otherwise.
+
+Signals are derived from the same columns with `feature_signals`: the
+value of a relative-difference column is only known once its forward
+window has closed, so the signal of a candle reads the value of the
+latest candle whose window ended by then.
+
+Which level is hit first is answered for all the trades at once from
+sparse tables of High and Low (`FirstHitTable`), so evaluating one more
+parameter combination costs a few vectorized passes over the candles
+instead of a scan per trade.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from bte.conducted_analysis_and_backtesting.price_volatility_calculation import _get_data_for_analysis
+from bte.conducted_analysis_and_backtesting.window_statistics import _to_nanoseconds
+from bte.conducted_analysis_and_backtesting.window_statistics import forward_window_bounds
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.instrumentation import stage
+
+
+EXIT_REASONS = np.array(["time", "take_profit", "stop_loss"], dtype=object)
+_TIME, _TAKE_PROFIT, _STOP_LOSS = range(3)
+METRIC_COLUMNS = ["trades",
+                  "take_profits",
+                  "stop_losses",
+                  "time_exits",
+                  "hit_rate",
+                  "mean_return",
+                  "total_return",
+                  "max_drawdown"]
+# Metrics where higher is better, the ones a walk forward can maximize
+OBJECTIVES = ["total_return", "mean_return", "hit_rate"]
+
+
+class FirstHitTable:
+    """
+    Finds the first row of windows where values reach a level.
+
+    Level k of the sparse table holds the max (or min) of values[i:i + 2**k].
+    A query starts at the window start and, from the largest level down,
+    jumps over every block that does not reach the level, so the first hit
+    of all the windows is found in O(log w) vectorized steps. Only the
+    levels needed for windows of up to max_length rows are kept.
+    Missing values never hit.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values of the rows, e.g. High or Low
+    max_length : int
+        Largest amount of rows of a queried window
+    direction : str
+        'above' finds values >= level, 'below' values <= level
+    """
+
+    def __init__(self, values, max_length, direction="above"):
+        if direction not in ("above", "below"):
+            raise ValueError(f"Unknown direction '{direction}', expected 'above' or 'below'")
+        self.direction = direction
+        operator = np.fmax if direction == "above" else np.fmin
+        # Jumps of 1, 2, ..., 2**(k - 1) rows cover up to 2**k - 1 rows
+        self.levels = [np.asarray(values, dtype=np.float64)]
+        for k in range(1, max(int(max_length).bit_length(), 1)):
+            half = 1 << (k - 1)
+            if self.levels[-1].shape[0] <= half:
+                break
+            self.levels.append(operator(self.levels[-1][:-half], self.levels[-1][half:]))
+
+    def query(self, levels, start, end):
+        """
+        Returns the first row in [start, end) reaching levels, end when there is none
+        """
+        position = np.array(start, dtype=np.int64)
+        levels = np.asarray(levels, dtype=np.float64)
+        for k in reversed(range(len(self.levels))):
+            step = 1 << k
+            rows = np.flatnonzero(position + step <= end)
+            block = self.levels[k][position[rows]]
+            if self.direction == "above":
+                reached = block >= levels[rows]
+            else:
+                reached = block <= levels[rows]
+            position[rows[~reached]] += step
+        return position
+
+
+def _candle_prices(df_candles):
+    """
+    Returns int64 timestamps in ns and dict column -> float64 prices
+    """
+    if isinstance(df_candles, CandleArrays):
+        timestamps = df_candles.timestamp
+    else:
+        timestamps = _to_nanoseconds(df_candles["Timestamp"])
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        raise ValueError("Candles must be sorted by Timestamp")
+    prices = {column: np.asarray(df_candles[column], dtype=np.float64) for column in ["Open", "High", "Low", "Close"]}
+    return timestamps, prices
+
+
+def _signal_mask(signals, rows):
+    if signals is None:
+        return np.ones(rows, dtype=bool)
+    signals = np.asarray(signals, dtype=bool)
+    if signals.shape != (rows,):
+        raise ValueError(f"Expected one signal per candle ({rows}), got {signals.shape}")
+    return signals
+
+
+def _entries(timestamps, prices, signals, hp, deadline=None):
+    """
+    Returns rows, window start and window end of the trades opened by the signals
+    """
+    window = pd.Timedelta(hp).value
+    start, end = forward_window_bounds(timestamps, window)
+    entries = signals & (end > start) & ~np.isnan(prices["Close"])
+    if deadline is not None:
+        entries &= timestamps + window <= deadline
+    rows = np.flatnonzero(entries)
+    return rows, start[rows], end[rows]
+
+
+def feature_signals(df_candles, hp, column_to_track, threshold, direction="negative"):
+    """
+    Returns entry signals from a relative-difference column of `_get_data_for_analysis`
+
+    The value of a row covers its forward window (Timestamp, Timestamp + hp],
+    so a candle only sees the values of the rows with Timestamp + hp not
+    later than its own Timestamp. The signal of a candle compares the
+    latest of these values to the threshold, e.g. direction 'negative' with
+    Close__to__Rolling_Min_Low__Relative_Difference and -0.02 enters after
+    a fall of 2% within the last hold period.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume], sorted by Timestamp
+    hp : datetime.timedelta
+        hold period of the relative differences
+    column_to_track : str
+        One of RELATIVE_DIFFERENCE_COLUMNS
+    threshold : float
+        threshold to compare against
+    direction : str
+        'positive' signals values greater or equal to the threshold,
+        'negative' values below it, as the event counts do
+
+    Returns
+    -------
+    np.ndarray
+        bool signal of every candle, to pass as `signals`
+    """
+    if direction not in ("positive", "negative"):
+        raise ValueError(f"Unknown direction '{direction}', expected 'positive' or 'negative'")
+    timestamps, _ = _candle_prices(df_candles)
+    values = _get_data_for_analysis(df_candles, hp)[column_to_track].to_numpy(dtype=np.float64)
+    # Row of the latest window closed at every Timestamp, -1 when there is none yet
+    known = np.searchsorted(timestamps + pd.Timedelta(hp).value, timestamps, side="right") - 1
+    latest = np.where(known >= 0, values[np.maximum(known, 0)], np.nan)
+    with np.errstate(invalid="ignore"):
+        return latest >= threshold if direction == "positive" else latest < threshold
+
+
+def _resolve_exits(prices, entry_price, end, take_profit_row, stop_loss_row, take_profit, stop_loss):
+    """
+    Returns exit rows, exit reasons and exit prices of trades given their first-hit rows
+    """
+    # A candle reaching both levels is counted as a stop loss, its path is unknown
+    stopped = (stop_loss_row < end) & (stop_loss_row <= take_profit_row)
+    taken = (take_profit_row < end) & ~stopped
+    exit_row = np.where(stopped, stop_loss_row, np.where(taken, take_profit_row, end - 1))
+    reason = np.where(stopped, _STOP_LOSS, np.where(taken, _TAKE_PROFIT, _TIME))
+    # Orders fill at the open when the candle gaps through their level
+    exit_price = np.where(stopped,
+                          np.fmin(entry_price * (1 + stop_loss), prices["Open"][exit_row]),
+                          np.where(taken,
+                                   np.fmax(entry_price * (1 + take_profit), prices["Open"][exit_row]),
+                                   prices["Close"][exit_row]))
+    return exit_row, reason, exit_price
+
+
+def _trade_metrics(returns, reason, exit_row, rows):
+    trades = returns.shape[0]
+    # Every trade is a unit stake, PnL is booked at the exit candle
+    equity = np.cumsum(np.bincount(exit_row, weights=returns, minlength=rows))
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    take_profits = int(np.count_nonzero(reason == _TAKE_PROFIT))
+    return {"trades": trades,
+            "take_profits": take_profits,
+            "stop_losses": int(np.count_nonzero(reason == _STOP_LOSS)),
+            "time_exits": int(np.count_nonzero(reason == _TIME)),
+            "hit_rate": take_profits / trades if trades else np.nan,
+            "mean_return": float(returns.mean()) if trades else np.nan,
+            "total_return": float(returns.sum()),
+            "max_drawdown": float(np.max(peak - equity)) if rows else 0.0}
+
+
+def _backtest_grid(timestamps, prices, signals, hps, take_profits, stop_losses, fee, deadline=None):
+    bounds = {hp: _entries(timestamps, prices, signals, hp, deadline) for hp in hps}
+    max_length = max([int(np.max(end - start)) for _, start, end in bounds.values() if start.shape[0]], default=1)
+    highs = FirstHitTable(prices["High"], max_length, "above")
+    lows = FirstHitTable(prices["Low"], max_length, "below")
+
+    results = []
+    for hp, (rows, start, end) in bounds.items():
+        entry_price = prices["Close"][rows]
+        take_profit_rows = [highs.query(entry_price * (1 + take_profit), start, end) for take_profit in take_profits]
+        stop_loss_rows = [lows.query(entry_price * (1 + stop_loss), start, end) for stop_loss in stop_losses]
+        for take_profit, take_profit_row in zip(take_profits, take_profit_rows):
+            for stop_loss, stop_loss_row in zip(stop_losses, stop_loss_rows):
+                exit_row, reason, exit_price = _resolve_exits(prices, entry_price, end, take_profit_row, stop_loss_row,
+                                                              take_profit, stop_loss)
+                returns = exit_price / entry_price - 1 - fee
+                results.append({"hp": hp,
+                                "take_profit": take_profit,
+                                "stop_loss": stop_loss,
+                                **_trade_metrics(returns, reason, exit_row, timestamps.shape[0])})
+    return pd.DataFrame(results, columns=["hp", "take_profit", "stop_loss"] + METRIC_COLUMNS)
+
+
+def simulate_trades(df_candles, hp, take_profit, stop_loss, signals=None, fee=0.0):
+    """
+    Returns the trades of one take-profit/stop-loss combination
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume], sorted by Timestamp
+    hp : datetime.timedelta
+        hold period
+    take_profit : float
+        Threshold of Close__to__Rolling_Max_High closing the trade, e.g. 0.02
+    stop_loss : float
+        Threshold of Close__to__Rolling_Min_Low closing the trade, e.g. -0.01
+    signals : array-like of bool, optional
+        Candles opening a trade at their Close, every candle by default,
+        e.g. from `feature_signals`. A signal must only depend on data up
+        to the Close of its candle
+    fee : float
+        Relative cost of a round trip, subtracted from every return
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per trade with columns [entry_time, exit_time, entry_price,
+        exit_price, exit_reason, return], exit_reason one of EXIT_REASONS
+    """
+    timestamps, prices = _candle_prices(df_candles)
+    signals = _signal_mask(signals, timestamps.shape[0])
+    rows, start, end = _entries(timestamps, prices, signals, hp)
+    entry_price = prices["Close"][rows]
+    max_length = int(np.max(end - start)) if rows.shape[0] else 1
+    take_profit_row = FirstHitTable(prices["High"], max_length, "above").query(entry_price * (1 + take_profit), start, end)
+    stop_loss_row = FirstHitTable(prices["Low"], max_length, "below").query(entry_price * (1 + stop_loss), start, end)
+    exit_row, reason, exit_price = _resolve_exits(prices, entry_price, end, take_profit_row, stop_loss_row,
+                                                  take_profit, stop_loss)
+    return pd.DataFrame({"entry_time": timestamps[rows].view("datetime64[ns]"),
+                         "exit_time": timestamps[exit_row].view("datetime64[ns]"),
+                         "entry_price": entry_price,
+                         "exit_price": exit_price,
+                         "exit_reason": EXIT_REASONS[reason],
+                         "return": exit_price / entry_price - 1 - fee})
+
+
+def backtest_grid(df_candles, hps, take_profits, stop_losses, signals=None, fee=0.0):
+    """
+    Returns backtest metrics for every hp x take_profit x stop_loss combination.
+
+    First-hit rows are computed once per hold period and level, and
+    combined for every pair of levels, so large grids cost little more
+    than their amount of distinct levels.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume], sorted by Timestamp
+    hps : list of datetime.timedelta
+        hold periods
+    take_profits : list of float
+        Thresholds of Close__to__Rolling_Max_High, see `simulate_trades`
+    stop_losses : list of float
+        Thresholds of Close__to__Rolling_Min_Low, see `simulate_trades`
+    signals : array-like of bool, optional
+        Candles opening a trade at their Close, every candle by default,
+        e.g. from `feature_signals`
+    fee : float
+        Relative cost of a round trip, subtracted from every return
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per combination with columns [hp, take_profit, stop_loss,
+        trades, take_profits, stop_losses, time_exits, hit_rate, mean_return,
+        total_return, max_drawdown]. Every trade is a unit stake: total_return
+        is the sum of the returns, and max_drawdown the largest fall of their
+        cumulative sum booked at the exits. hit_rate is the share of take profits.
+    """
+    timestamps, prices = _candle_prices(df_candles)
+    signals = _signal_mask(signals, timestamps.shape[0])
+    with stage("backtest"):
+        return _backtest_grid(timestamps, prices, signals, hps, list(take_profits), list(stop_losses), fee)
+
+
+def _walk_forward_fold(timestamps, prices, signals, train_start, train_end, test_end,
+                       hps, take_profits, stop_losses, objective, fee):
+    """
+    Process pool worker: picks the best combination on the train window and backtests it on the test window
+    """
+    in_train = signals & (timestamps >= train_start) & (timestamps < train_end)
+    train = _backtest_grid(timestamps, prices, in_train, hps, take_profits, stop_losses, fee, deadline=train_end)
+    best = train.loc[train[objective].fillna(-np.inf).idxmax()]
+    in_test = signals & (timestamps >= train_end) & (timestamps < test_end)
+    test = _backtest_grid(timestamps, prices, in_test, [best["hp"]], [best["take_profit"]], [best["stop_loss"]], fee)
+    return {"hp": best["hp"],
+            "take_profit": best["take_profit"],
+            "stop_loss": best["stop_loss"],
+            f"train_{objective}": best[objective],
+            **test.iloc[0][METRIC_COLUMNS].to_dict()}
+
+
+def walk_forward(df_candles,
+                 hps,
+                 take_profits,
+                 stop_losses,
+                 train_size,
+                 test_size,
+                 signals=None,
+                 objective="total_return",
+                 fee=0.0,
+                 max_workers=1):
+    """
+    Runs a rolling walk-forward backtest.
+
+    The candles are split into folds of a train window followed by a test
+    window, rolled forward by test_size. On every train window all the
+    hp x take_profit x stop_loss combinations are backtested on the trades
+    that close within the window, and the one maximizing `objective` is
+    then backtested on the trades opened in the test window. Folds run in
+    parallel on a process pool when max_workers is above 1.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume], sorted by Timestamp
+    hps : list of datetime.timedelta
+        hold periods
+    take_profits : list of float
+        Thresholds of Close__to__Rolling_Max_High, see `simulate_trades`
+    stop_losses : list of float
+        Thresholds of Close__to__Rolling_Min_Low, see `simulate_trades`
+    train_size : datetime.timedelta
+        Length of the train windows
+    test_size : datetime.timedelta
+        Length of the test windows and step between folds
+    signals : array-like of bool, optional
+        Candles opening a trade at their Close, every candle by default,
+        e.g. from `feature_signals`
+    objective : str
+        One of OBJECTIVES: 'total_return', 'mean_return' or 'hit_rate',
+        the metric of `backtest_grid` maximized on the train windows
+    fee : float
+        Relative cost of a round trip, subtracted from every return
+    max_workers : int
+        Amount of folds run at the same time
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per fold with columns [fold, train_start, train_end, test_start,
+        test_end, hp, take_profit, stop_loss, train_<objective>] and the
+        metrics of `backtest_grid` on the test window
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+    timestamps, prices = _candle_prices(df_candles)
+    signals = _signal_mask(signals, timestamps.shape[0])
+    train_size, test_size = pd.Timedelta(train_size).value, pd.Timedelta(test_size).value
+    max_hp = max(pd.Timedelta(hp).value for hp in hps)
+
+    folds = []
+    if timestamps.shape[0]:
+        train_start = timestamps[0]
+        while train_start + train_size <= timestamps[-1]:
+            folds.append((train_start, train_start + train_size, train_start + train_size + test_size))
+            train_start += test_size
+
+    # Every fold only gets the candles its trades can reach
+    arguments = []
+    for train_start, train_end, test_end in folds:
+        first, last = np.searchsorted(timestamps, [train_start, test_end + max_hp], side="left")
+        arguments.append((timestamps[first:last],
+                          {column: values[first:last] for column, values in prices.items()},
+                          signals[first:last],
+                          train_start, train_end, test_end,
+                          list(hps), list(take_profits), list(stop_losses), objective, fee))
+
+    with stage("backtest"):
+        if max_workers > 1 and len(folds) > 1:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(folds))) as executor:
+                results = list(executor.map(_walk_forward_fold, *zip(*arguments)))
+        else:
+            results = [_walk_forward_fold(*fold_arguments) for fold_arguments in arguments]
+
+    columns = ["fold", "train_start", "train_end", "test_start", "test_end",
+               "hp", "take_profit", "stop_loss", f"train_{objective}"] + METRIC_COLUMNS
+    rows = [{"fold": fold,
+             "train_start": train_start,
+             "train_end": train_end,
+             "test_start": train_end,
+             "test_end": test_end,
+             **result}
+            for fold, ((train_start, train_end, test_end), result) in enumerate(zip(folds, results))]
+    df = pd.DataFrame(rows, columns=columns)
+    for column in ["train_start", "train_end", "test_start", "test_end"]:
+        df[column] = np.asarray(df[column], dtype=np.int64).view("datetime64[ns]")
+    return df
@@ -0,0 +1,330 @@
+"""
+Window statistics over candles: max, min and mean of values[start:end] for every row.
+
+Three backends implement the kernels:
+
+- "pandas": pandas rolling over the precomputed bounds, whose max and min
+  kernels are monotonic deques and whose mean is a running sum (O(n)).
+- "numba": JIT-compiled single pass with monotonic deques (O(n)). It needs
+  the optional numba package.
+- "numpy": vectorized NumPy. Max and min are answered with a sparse table
+  built level by level (O(n log w) for windows of up to w rows, with only two
+  levels in memory), and the mean with prefix sums. It accepts any bounds.
+
+The pandas and numba kernels need windows whose start and end never
+decrease, which is always the case for forward windows over sorted timestamps.
+The backend is picked with `set_backend` or the BTE_WINDOW_STATISTICS_BACKEND
+environment variable; "auto" (the default) uses numba when it is installed
+and pandas otherwise.
+Missing values are ignored, and a window without values gives NaN.
+Values may be 2D (rows x series) to compute many aligned series at once.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+
+STATISTICS = ("max", "min", "mean")
+
+
+def forward_window_bounds(timestamps, window):
+    """
+    Returns [start, end) row bounds of the windows (timestamp, timestamp + window]
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+        int64 timestamps in ns, sorted
+    window : int
+        window size in ns
+
+    Returns
+    -------
+    tuple
+        np.ndarray start, np.ndarray end
+    """
+    start = np.searchsorted(timestamps, timestamps, side="right")
+    end = np.searchsorted(timestamps, timestamps + window, side="right")
+    return start.astype(np.int64), end.astype(np.int64)
+
+
+def _to_nanoseconds(timestamps):
+    return pd.DatetimeIndex(timestamps).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+
+def forward_window_statistics(timestamps, window, requests):
+    """
+    Computes statistics of the forward windows (timestamp, timestamp + window] of every row
+
+    Parameters
+    ----------
+    timestamps : array-like of datetime
+        Timestamps of the rows, they do not have to be sorted
+    window : datetime.timedelta
+        Size of the forward window
+    requests : dict
+        name -> (values, statistic) with statistic one of STATISTICS,
+        values of shape (rows,) or (rows, series)
+
+    Returns
+    -------
+    dict
+        name -> np.ndarray of float64 in the order of the rows, shaped as the values
+    """
+    timestamps = _to_nanoseconds(timestamps)
+    order = None
+    if timestamps.shape[0] and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+    start, end = forward_window_bounds(timestamps, pd.Timedelta(window).value)
+
+    backend = _get_kernels()
+    results = {}
+    for name, (values, statistic) in requests.items():
+        values = np.asarray(values, dtype=np.float64)
+        if order is not None:
+            values = values[order]
+        result = _apply_kernel(backend[statistic], values, start, end)
+        if order is not None:
+            unsorted = np.empty_like(result)
+            unsorted[order] = result
+            result = unsorted
+        results[name] = result
+    return results
+
+
+def _sparse_table_extreme(values, start, end, operator):
+    n = start.shape[0]
+    result = np.full((n,) + values.shape[1:], np.nan)
+    if n == 0:
+        return result
+    lengths = end - start
+    has_values = lengths > 0
+    if not np.any(has_values):
+        return result
+    # Level k of the table holds operator over values[i:i + 2**k]
+    levels = np.zeros(n, dtype=np.int64)
+    levels[has_values] = np.floor(np.log2(lengths[has_values])).astype(np.int64)
+    level = values
+    for k in range(int(levels.max()) + 1):
+        if k:
+            half = 1 << (k - 1)
+            level = operator(level[:-half], level[half:])
+        rows = np.flatnonzero(has_values & (levels == k))
+        if rows.shape[0]:
+            result[rows] = operator(level[start[rows]], level[end[rows] - (1 << k)])
+    return result
+
+
+def _numpy_window_max(values, start, end):
+    return _sparse_table_extreme(values, start, end, np.fmax)
+
+
+def _numpy_window_min(values, start, end):
+    return _sparse_table_extreme(values, start, end, np.fmin)
+
+
+def _numpy_window_mean(values, start, end):
+    if values.shape[0] == 0:
+        return np.full((start.shape[0],) + values.shape[1:], np.nan)
+    valid = ~np.isnan(values)
+    # Prices are centred on the first value of every series before the
+    # prefix sums to keep their magnitude low
+    first = np.expand_dims(np.argmax(valid, axis=0), 0)
+    offset = np.where(np.any(valid, axis=0), np.take_along_axis(values, first, axis=0)[0], 0.0)
+    zeros = np.zeros((1,) + values.shape[1:])
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values - offset, 0.0), axis=0)])
+    counts = np.concatenate([zeros.astype(np.int64), np.cumsum(valid, axis=0)])
+    count = counts[end] - counts[start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, (sums[end] - sums[start]) / count + offset, np.nan)
+
+
+class _BoundsIndexer(BaseIndexer):
+    """
+    Hands precomputed [start, end) row bounds to pandas rolling
+    """
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+def _pandas_window_statistic(values, start, end, statistic):
+    if start.shape[0] == 0:
+        return np.full((0,) + values.shape[1:], np.nan)
+    if start.shape[0] != values.shape[0]:
+        # pandas rolling gives one window per row
+        return {"max": _numpy_window_max, "min": _numpy_window_min, "mean": _numpy_window_mean}[statistic](values, start, end)
+    rolling = pd.DataFrame(values.reshape(values.shape[0], int(np.prod(values.shape[1:])))).rolling(_BoundsIndexer(start=start, end=end), min_periods=1)
+    return getattr(rolling, statistic)().to_numpy().reshape((start.shape[0],) + values.shape[1:])
+
+
+def _pandas_window_max(values, start, end):
+    return _pandas_window_statistic(values, start, end, "max")
+
+
+def _pandas_window_min(values, start, end):
+    return _pandas_window_statistic(values, start, end, "min")
+
+
+def _pandas_window_mean(values, start, end):
+    return _pandas_window_statistic(values, start, end, "mean")
+
+
+def _deque_window_max(values, start, end):
+    n = start.shape[0]
+    result = np.full(n, np.nan)
+    deque = np.empty(values.shape[0], dtype=np.int64)
+    head = 0
+    tail = 0
+    pushed = 0
+    for i in range(n):
+        while pushed < end[i]:
+            value = values[pushed]
+            if not np.isnan(value):
+                while tail > head and values[deque[tail - 1]] <= value:
+                    tail -= 1
+                deque[tail] = pushed
+                tail += 1
+            pushed += 1
+        while tail > head and deque[head] < start[i]:
+            head += 1
+        if tail > head:
+            result[i] = values[deque[head]]
+    return result
+
+
+def _deque_window_min(values, start, end):
+    n = start.shape[0]
+    result = np.full(n, np.nan)
+    deque = np.empty(values.shape[0], dtype=np.int64)
+    head = 0
+    tail = 0
+    pushed = 0
+    for i in range(n):
+        while pushed < end[i]:
+            value = values[pushed]
+            if not np.isnan(value):
+                while tail > head and values[deque[tail - 1]] >= value:
+                    tail -= 1
+                deque[tail] = pushed
+                tail += 1
+            pushed += 1
+        while tail > head and deque[head] < start[i]:
+            head += 1
+        if tail > head:
+            result[i] = values[deque[head]]
+    return result
+
+
+def _loop_window_mean(values, start, end):
+    n = start.shape[0]
+    result = np.full(n, np.nan)
+    sums = np.zeros(values.shape[0] + 1)
+    counts = np.zeros(values.shape[0] + 1, dtype=np.int64)
+    offset = 0.0
+    for j in range(values.shape[0]):
+        if not np.isnan(values[j]):
+            offset = values[j]
+            break
+    for j in range(values.shape[0]):
+        valid = not np.isnan(values[j])
+        sums[j + 1] = sums[j] + (values[j] - offset if valid else 0.0)
+        counts[j + 1] = counts[j] + (1 if valid else 0)
+    for i in range(n):
+        count = counts[end[i]] - counts[start[i]]
+        if count > 0:
+            result[i] = (sums[end[i]] - sums[start[i]]) / count + offset
+    return result
+
+
+def _load_numpy_backend():
+    return {"max": _numpy_window_max,
+            "min": _numpy_window_min,
+            "mean": _numpy_window_mean}
+
+
+def _load_pandas_backend():
+    return {"max": _pandas_window_max,
+            "min": _pandas_window_min,
+            "mean": _pandas_window_mean}
+
+
+def _load_numba_backend():
+    import numba
+    return {"max": numba.njit(cache=True)(_deque_window_max),
+            "min": numba.njit(cache=True)(_deque_window_min),
+            "mean": numba.njit(cache=True)(_loop_window_mean)}
+
+
+_BACKEND_LOADERS = {"pandas": _load_pandas_backend,
+                    "numpy": _load_numpy_backend,
+                    "numba": _load_numba_backend}
+_backend_name = None
+_kernels = None
+
+
+def set_backend(name):
+    """
+    Selects the backend of the window statistics: 'pandas', 'numpy', 'numba' or 'auto'
+
+    'auto' uses numba when it can be imported and pandas otherwise;
+    asking for 'numba' explicitly raises ImportError when it is not installed.
+    """
+    global _backend_name, _kernels
+    if name == "auto":
+        try:
+            kernels = _load_numba_backend()
+            name = "numba"
+        except ImportError:
+            kernels = _load_pandas_backend()
+            name = "pandas"
+    elif name in _BACKEND_LOADERS:
+        kernels = _BACKEND_LOADERS[name]()
+    else:
+        raise ValueError(f"Unknown window statistics backend '{name}', "
+                         f"expected one of {sorted(_BACKEND_LOADERS)} or 'auto'")
+    _backend_name, _kernels = name, kernels
+
+
+def get_backend():
+    """
+    Returns the name of the backend in use
+    """
+    _get_kernels()
+    return _backend_name
+
+
+def _get_kernels():
+    if _kernels is None:
+        set_backend(os.environ.get("BTE_WINDOW_STATISTICS_BACKEND", "auto"))
+    return _kernels
+
+
+def _apply_kernel(kernel, values, start, end):
+    if values.ndim == 1 or _backend_name != "numba":
+        return kernel(values, start, end)
+    # The compiled kernels take one series at a time
+    result = np.empty((start.shape[0],) + values.shape[1:])
+    for j in range(values.shape[1]):
+        result[:, j] = kernel(np.ascontiguousarray(values[:, j]), start, end)
+    return result
+
+
+def window_statistic(values, start, end, statistic):
+    """
+    Returns the statistic of values[start[i]:end[i]] for every i with the selected backend
+
+    Parameters
+    ----------
+    values : np.ndarray
+        float64 values of shape (rows,) or (rows, series)
+    start, end : np.ndarray
+        int64 row bounds, see `forward_window_bounds`
+    statistic : str
+        One of STATISTICS
+    """
+    kernels = _get_kernels()
+    return _apply_kernel(kernels[statistic], np.asarray(values, dtype=np.float64), start, end)
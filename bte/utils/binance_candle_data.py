@@ -1,18 +1,51 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
+import numpy as np
 import pandas as pd
 import datetime
 from datetime import timedelta
-from time import sleep
-from binance.spot import Spot
 
+from bte.utils.instrumentation import stage
+from bte.utils.page_fetcher import ClientPool, TokenBucket, fetch_pages
 
-client = Spot()
+
+# Binance allows 1200 request weight per minute and IP, a klines page weighs 2
+REQUEST_WEIGHT_PER_MINUTE = 1200
+KLINES_REQUEST_WEIGHT = 2
+
+# Created on first use, importing the module opens no connection
+client = None
+
+
+def _new_client():
+    # Offline runs replay the klines of a fixture, see bte.utils.replay_data_source
+    if os.environ.get("BTE_REPLAY_FIXTURE"):
+        from bte.utils.replay_data_source import ReplaySpotClient, replay_fixture_from_environment
+        return ReplaySpotClient(replay_fixture_from_environment())
+    from binance.spot import Spot
+    return Spot()
+
+
+def _get_client():
+    """
+    Returns the module client, created on first use
+    """
+    global client
+    if client is None:
+        client = _new_client()
+    return client
+
+
+client_pool = ClientPool(_new_client)
+request_weight_limiter = TokenBucket(rate=REQUEST_WEIGHT_PER_MINUTE / 60,
+                                     capacity=REQUEST_WEIGHT_PER_MINUTE / 10)
 
 TIMEDELTA_MAP = {
     "1m": timedelta(minutes=1),
     "3m": timedelta(minutes=3),
+    "5m": timedelta(minutes=5),
     "15m": timedelta(minutes=15),
     "30m": timedelta(minutes=30),
     "1h": timedelta(hours=1),
@@ -22,7 +55,10 @@ TIMEDELTA_MAP = {
     "8h": timedelta(hours=8),
     "12h": timedelta(hours=12),
     "1d": timedelta(days=1),
+    "3d": timedelta(days=3),
     "1w": timedelta(days=7),
+    # Shortest month, so pages overlap instead of skipping candles
+    "1M": timedelta(days=28),
 }
 
 
@@ -34,7 +70,9 @@ def _pull_data(from_date,
                to_date,
                n_candles,
                c_size, 
-               symbol):
+               symbol,
+               spot_client=None,
+               timestamp_format=None):
     """
     Function that extracts candles data from the exchange API.
     It has technical limitation of max 1000 rows due to the API specifics.
@@ -42,10 +80,12 @@ def _pull_data(from_date,
 
     Parameters
     ----------
-    from_date : str
+    from_date : str or int
         Starting date of the data to pull in format '%Y-%m-%d %H:%M:%S'
-    to_date : str
+        or in milliseconds since epoch
+    to_date : str or int
         End date of the data to pull in format '%Y-%m-%d %H:%M:%S'
+        or in milliseconds since epoch
     n_candles : int
         amount of canled to pull
     c_size : str
@@ -68,55 +108,72 @@ def _pull_data(from_date,
             1 month (1M)
     symbol : str
         Pair to get prices on. For example 'BTCUSDT', 'ETHBTC', etc.
+    spot_client : binance.spot.Spot, optional
+        Client to send the request with, the module client by default
+    timestamp_format : str, optional
+        When given, Timestamp is returned as strings in this format,
+        e.g. '%Y-%m-%d %H:%M:%S', instead of datetime64
 
     Returns
     -------
     pandas.DataFrame
         DaraFrame with candles data
     """
-    fd = datetime.datetime.strptime(from_date, '%Y-%m-%d %H:%M:%S')
-    fd = (fd - datetime.datetime(1970, 1, 1)).total_seconds()*1000
-    fd = int(fd)
-    
-    df = client.klines(symbol=symbol, 
-                       interval=c_size, 
-                       startTime=fd, 
-                       #endTime, 
-                       limit=n_candles)
-    df = pd.DataFrame(data=df, 
-                      columns=["open_time", 
-                               "open",
-                               "high",
-                               "low",
-                               "close",
-                               "volume",
-                               "close_time",
-                               "Quote_asset_volume",
-                               "Number_of_trades",
-                               "Taker_buy_base_asset_volume",
-                               "Taker_buy_quote_asset_volume",
-                               "Unused_field_ignore"])
-    df = df.sort_values(by="close_time", ascending=True)
-    df = df[["close_time", "open", "high", "low", "close", "volume"]]
-    for i in ["open", "high", "low", "close", "volume"]:
-        df[i] = df[i].astype(float)
-    df = df.rename(columns={"close_time": "Timestamp",
-                            "open": "Open",
-                            "high": "High",
-                            "low": "Low",
-                            "close": "Close",
-                            "volume": "Volume"})
-    df['Timestamp'] = df['Timestamp']+1
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'],unit='ms',origin='unix') # convert timestamp to datetime
-    df = df[df["Timestamp"] < datetime.datetime.strptime(to_date, '%Y-%m-%d %H:%M:%S')]
-    df['Timestamp'] = df['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    if spot_client is None:
+        spot_client = _get_client()
+    fd = _to_milliseconds(from_date)
+    td = _to_milliseconds(to_date)
+
+    with stage("fetch"):
+        klines = spot_client.klines(symbol=symbol, 
+                                    interval=c_size, 
+                                    startTime=fd, 
+                                    #endTime, 
+                                    limit=n_candles)
+    with stage("parse"):
+        # open_time, open, high, low, close, volume, close_time parsed in one pass
+        data = np.array([kline[:7] for kline in klines], dtype=np.float64).reshape(-1, 7)
+        data = data[np.argsort(data[:, 6], kind="stable")]
+        timestamps = data[:, 6].astype(np.int64) + 1
+        in_range = timestamps < td
+        df = pd.DataFrame(data[in_range, 1:6], columns=["Open", "High", "Low", "Close", "Volume"])
+        df.insert(0, "Timestamp", timestamps[in_range].astype("datetime64[ms]").astype("datetime64[ns]"))
+        if timestamp_format is not None:
+            df['Timestamp'] = df['Timestamp'].dt.strftime(timestamp_format)
     return df
 
 
+def _to_milliseconds(date):
+    """
+    Returns milliseconds since epoch of a '%Y-%m-%d %H:%M:%S' string, a datetime or an int in ms
+    """
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date, '%Y-%m-%d %H:%M:%S')
+    return int(np.datetime64(date, 'ms').astype(np.int64))
+
+
+def _first_close_ms(start_ms, c_size):
+    """
+    Returns the Timestamp (close time) in ms of the first candle opening at or after start_ms
+    """
+    if c_size == "1M":
+        # Month candles open on the first day of the month
+        opening = pd.Timestamp(start_ms - 1, unit="ms").normalize() + pd.offsets.MonthBegin(1)
+        return int((opening + pd.offsets.MonthBegin(1)).value // 10**6)
+    return start_ms + _get_timedelta_for_candle(c_size) // timedelta(milliseconds=1)
+
+
 def extract_data(symbol,
                  from_date,
                  to_date,
                  c_size,
+                 store=None,
+                 max_workers=4,
+                 client_pool=None,
+                 timestamp_format=None,
+                 progress=None,
                  ):
     """
     Function that extracts candles data from the exchange API.
@@ -147,41 +204,110 @@ def extract_data(symbol,
             1 month (1M)
     symbol : str
         Pair to get prices on. For example 'BTCUSDT', 'ETHBTC', etc.
+    store : bte.utils.candle_store.CandleStore, optional
+        Local candle cache. When given, candles already stored are read
+        from disk and only the missing time gaps are downloaded and
+        appended to the store.
+    max_workers : int
+        Amount of pages downloaded at the same time
+    client_pool : bte.utils.page_fetcher.ClientPool, optional
+        Pool of clients to download with, the module pool of Spot clients by default
+    timestamp_format : str, optional
+        When given, Timestamp is returned as strings in this format instead of datetime64
+    progress : callable, optional
+        Reporter of the downloaded pages, see `bte.utils.instrumentation`
 
     Returns
     -------
     pandas.DataFrame
         DaraFrame with candles data
     """
-    end_date = datetime.datetime.strptime(to_date, '%Y-%m-%d %H:%M:%S')
-    start_date = datetime.datetime.strptime(from_date, '%Y-%m-%d %H:%M:%S')
-    time_window = end_date - start_date
-    t_int = _get_timedelta_for_candle(c_size)
-    n = int(time_window/t_int)
+    start_ms = _to_milliseconds(from_date)
+    end_ms = _to_milliseconds(to_date)
+    if store is None:
+        df = _download_data(symbol=symbol,
+                            start_ms=start_ms,
+                            end_ms=end_ms,
+                            c_size=c_size,
+                            max_workers=max_workers,
+                            pool=client_pool,
+                            progress=progress)
+    else:
+        # Only closed candles are stored, their Timestamp (close time) is in the past
+        t_int_ms = _get_timedelta_for_candle(c_size) // timedelta(milliseconds=1)
+        if c_size == "1M":
+            # A month candle opens up to 31 days before its Timestamp
+            t_int_ms = timedelta(days=31) // timedelta(milliseconds=1)
+        now_ms = _to_milliseconds(datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None))
+        for gap_start, gap_end in store.missing_ranges(symbol, c_size, start_ms, min(end_ms, now_ms)):
+            # A candle is requested by its open time, one interval before its Timestamp
+            df = _download_data(symbol=symbol,
+                                start_ms=gap_start - t_int_ms,
+                                end_ms=gap_end,
+                                c_size=c_size,
+                                max_workers=max_workers,
+                                pool=client_pool,
+                                progress=progress)
+            store.write(symbol, c_size, df[df["Timestamp"] >= np.datetime64(gap_start, 'ms')], gap_start, gap_end)
+        # Same candles as downloaded without a store: opened at or after from_date
+        df = store.read(symbol, c_size, _first_close_ms(start_ms, c_size), end_ms)
+    if timestamp_format is not None:
+        df['Timestamp'] = df['Timestamp'].dt.strftime(timestamp_format)
+    return df
+
+
+def _download_data(symbol, start_ms, end_ms, c_size, max_workers=4, pool=None, progress=None):
+    """
+    Downloads candles with Timestamp in [start_ms, end_ms] page by page.
+
+    Pages are requested concurrently within the request weight budget of
+    `request_weight_limiter`; a failed page is retried on its own.
+
+    Parameters
+    ----------
+    symbol : str
+        Pair to get prices on. For example 'BTCUSDT', 'ETHBTC', etc.
+    start_ms : int
+        Starting date of the data to pull in milliseconds since epoch
+    end_ms : int
+        End date of the data to pull in milliseconds since epoch
+    c_size : str
+        Candle size, see `extract_data`
+    max_workers : int
+        Amount of pages downloaded at the same time
+    pool : bte.utils.page_fetcher.ClientPool, optional
+        Pool of clients to download with, the module client_pool by default
+    progress : callable, optional
+        Reporter of the downloaded pages, see `bte.utils.instrumentation`
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame with candles data
+    """
+    t_int_ms = _get_timedelta_for_candle(c_size) // timedelta(milliseconds=1)
+    n = (end_ms - start_ms) // t_int_ms
     n_candles = 1000
     steps = int(n/n_candles)+1
-    start = 0
-    dataframe_list = []
-    for i in range(start, steps):
-        fd = datetime.datetime.strptime(from_date, '%Y-%m-%d %H:%M:%S')
-        fd = fd + i * t_int * n_candles
-        fd = fd.strftime('%Y-%m-%d %H:%M:%S')
-        for a in range(72):
-            try:
-                print(f"{datetime.datetime.now()}: {i}/{steps}, {fd}")
-                df = _pull_data(from_date=fd, 
-                                to_date=end_date.strftime('%Y-%m-%d %H:%M:%S'),
-                                n_candles=n_candles, 
-                                c_size=c_size, 
-                                symbol=symbol)  
-                dataframe_list.append(df)  
-                break
-            except:
-                print(f"download attempt # {a} failed")
-                sleep(5*60)
+    pages = [start_ms + i * t_int_ms * n_candles for i in range(steps)]
+
+    def _fetch_page(page_client, fd):
+        return _pull_data(from_date=fd,
+                          to_date=end_ms,
+                          n_candles=n_candles,
+                          c_size=c_size,
+                          symbol=symbol,
+                          spot_client=page_client)
+
+    dataframe_list = fetch_pages(fetch_page=_fetch_page,
+                                 pages=pages,
+                                 client_pool=pool or client_pool,
+                                 limiter=request_weight_limiter,
+                                 weight=KLINES_REQUEST_WEIGHT,
+                                 max_workers=max_workers,
+                                 progress=progress)
     df = pd.concat(dataframe_list)
-    df["Timestamp"] = pd.to_datetime(df["Timestamp"], format='%Y-%m-%d %H:%M:%S')
-    df = df[(df["Timestamp"] >= start_date) & (df["Timestamp"] <= end_date)]
+    df = df[(df["Timestamp"] >= np.datetime64(start_ms, 'ms')) & (df["Timestamp"] <= np.datetime64(end_ms, 'ms'))]
     df = df.drop_duplicates()
     df = df.reset_index(drop=True)
     return df
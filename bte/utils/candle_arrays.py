@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class CandleArrays:
+    """
+    Candles held as contiguous NumPy arrays.
+
+    Timestamp is int64 nanoseconds since epoch (UTC), the prices and the
+    volume are float32 or float64 arrays. A container saved with `save`
+    is a directory of one .npy file per column that `open` maps read-only,
+    so many processes can use the same candles from the page cache
+    without copying them. Slicing returns views, and columns can be read
+    by name like the ones of a dataframe, e.g. candles["Close"].
+
+    Parameters
+    ----------
+    timestamp : np.ndarray
+        int64 nanoseconds since epoch, sorted
+    open, high, low, close, volume : np.ndarray
+        Columns of the candles, all of the same length as timestamp
+    """
+
+    def __init__(self, timestamp, open, high, low, close, volume):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        # (directory, start, stop) of candles mapped from disk, see `open`
+        self._source = None
+
+    @property
+    def columns(self):
+        return {"Timestamp": self.timestamp,
+                "Open": self.open,
+                "High": self.high,
+                "Low": self.low,
+                "Close": self.close,
+                "Volume": self.volume}
+
+    def __len__(self):
+        return self.timestamp.shape[0]
+
+    def __getitem__(self, rows):
+        if isinstance(rows, str):
+            # Column access like a dataframe, Timestamp as a datetime64[ns] view
+            if rows == "Timestamp":
+                return self.timestamp.view("datetime64[ns]")
+            return self.columns[rows]
+        if not isinstance(rows, slice) or rows.step not in (None, 1):
+            raise TypeError("CandleArrays can only be sliced with a step of 1, e.g. candles[1000:2000]")
+        candles = CandleArrays(*(values[rows] for values in self.columns.values()))
+        if self._source is not None:
+            path, start, stop = self._source
+            rows_start, rows_stop, _ = rows.indices(stop - start)
+            candles._source = (path, start + rows_start, start + max(rows_start, rows_stop))
+        return candles
+
+    def __getstate__(self):
+        # Mapped candles are pickled as their location, so process pool
+        # workers map the same files instead of receiving a copy
+        if self._source is not None:
+            return {"source": self._source}
+        return {"columns": self.columns}
+
+    def __setstate__(self, state):
+        if "source" in state:
+            path, start, stop = state["source"]
+            candles = CandleArrays.open(path)[start:stop]
+        else:
+            candles = CandleArrays(*state["columns"].values())
+        self.__dict__.update(candles.__dict__)
+
+    @classmethod
+    def from_frame(cls, df, dtype=np.float64):
+        """
+        Creates the container from `extract_data` or `download_data` output
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Candles with columns [Timestamp, Open, High, Low, Close, Volume]
+        dtype : numpy dtype
+            dtype of the prices and of the volume, np.float32 halves the memory
+        """
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.droplevel(1, axis=1)
+        timestamps = pd.to_datetime(df["Timestamp"])
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+        timestamp = np.ascontiguousarray(timestamps.to_numpy(dtype="datetime64[ns]").astype(np.int64))
+        return cls(timestamp, *(np.ascontiguousarray(df[column].to_numpy(dtype=dtype)) for column in PRICE_COLUMNS))
+
+    def to_frame(self):
+        """
+        Returns the candles as a dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+        """
+        df = pd.DataFrame({"Timestamp": self.timestamp.view("datetime64[ns]")})
+        for column in PRICE_COLUMNS:
+            df[column] = self.columns[column]
+        return df
+
+    def fingerprint(self):
+        """
+        Returns a content hash of the candles
+        """
+        digest = hashlib.sha1()
+        for name, values in self.columns.items():
+            digest.update(name.encode())
+            digest.update(str(values.dtype).encode())
+            digest.update(np.ascontiguousarray(values).data)
+        return digest.hexdigest()
+
+    def save(self, path):
+        """
+        Saves the candles as a directory of memory-mappable .npy files, replacing it atomically
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        try:
+            for name, values in self.columns.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(values))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({"length": len(self), "columns": list(self.columns)}, f)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        """
+        Opens candles saved with `save`, memory-mapped read-only by default
+
+        Parameters
+        ----------
+        path : str
+            Directory written by `save`
+        mmap_mode : str or None
+            Passed to np.load, None loads the arrays into memory
+        """
+        candles = cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                        for name in ["Timestamp"] + PRICE_COLUMNS))
+        if mmap_mode is not None:
+            candles._source = (os.path.abspath(path), 0, len(candles))
+        return candles
+
+
+class CandlePanel:
+    """
+    Candles of many symbols aligned on a shared timestamp grid.
+
+    Timestamp is the sorted union of the Timestamps of all symbols, int64
+    nanoseconds, and every price or volume column is a (time x symbol)
+    float array holding NaN where a symbol has no candle.
+
+    Parameters
+    ----------
+    timestamp : np.ndarray
+        int64 nanoseconds since epoch, sorted and unique
+    symbols : list of str
+        Symbols of the columns of the arrays
+    open, high, low, close, volume : np.ndarray
+        Arrays of shape (len(timestamp), len(symbols))
+    """
+
+    def __init__(self, timestamp, symbols, open, high, low, close, volume):
+        self.timestamp = timestamp
+        self.symbols = list(symbols)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @property
+    def columns(self):
+        return {"Open": self.open,
+                "High": self.high,
+                "Low": self.low,
+                "Close": self.close,
+                "Volume": self.volume}
+
+    def __len__(self):
+        return self.timestamp.shape[0]
+
+    @classmethod
+    def from_candles(cls, candles, dtype=np.float64):
+        """
+        Aligns the candles of many symbols
+
+        Parameters
+        ----------
+        candles : dict or pd.DataFrame
+            symbol -> candles dataframe or CandleArrays, e.g. the output of
+            `download_many`, or a frame indexed by (Symbol, Timestamp)
+        dtype : numpy dtype
+            dtype of the price and volume arrays
+        """
+        if isinstance(candles, pd.DataFrame):
+            candles = {symbol: df.reset_index("Symbol", drop=True).reset_index()
+                       for symbol, df in candles.groupby(level="Symbol", sort=False)}
+        series = {symbol: c if isinstance(c, CandleArrays) else CandleArrays.from_frame(c, dtype=dtype)
+                  for symbol, c in candles.items()}
+        timestamp = np.unique(np.concatenate([c.timestamp for c in series.values()])) if series else np.empty(0, dtype=np.int64)
+        arrays = {column: np.full((timestamp.shape[0], len(series)), np.nan, dtype=dtype) for column in PRICE_COLUMNS}
+        for j, c in enumerate(series.values()):
+            rows = np.searchsorted(timestamp, c.timestamp)
+            for column in PRICE_COLUMNS:
+                arrays[column][rows, j] = c.columns[column]
+        return cls(timestamp, list(series), *(arrays[column] for column in PRICE_COLUMNS))
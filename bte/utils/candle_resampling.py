@@ -0,0 +1,193 @@
+import re
+import numpy as np
+import pandas as pd
+
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.candle_store import CANDLE_COLUMNS, _to_epoch_ms
+
+
+_UNIT_MS = {"s": 1000, "m": 60 * 1000, "h": 60 * 60 * 1000, "d": 24 * 60 * 60 * 1000, "w": 7 * 24 * 60 * 60 * 1000}
+# Weekly candles open on Mondays, the first one after the epoch is 1970-01-05
+_WEEK_ORIGIN_MS = 4 * _UNIT_MS["d"]
+
+
+def _parse_interval(interval):
+    """
+    Returns ('ms', width in ms) for fixed intervals such as '5m', '4h', '3d', '1w'
+    or ('M', amount of months) for calendar months such as '1M'
+    """
+    match = re.fullmatch(r"(\d+)([smhdwM])", interval)
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"Unsupported interval '{interval}', expected e.g. '5m', '4h', '3d', '1w' or '1M'")
+    amount, unit = int(match.group(1)), match.group(2)
+    if unit == "M":
+        return "M", amount
+    return "ms", amount * _UNIT_MS[unit]
+
+
+def _default_origin(interval):
+    kind, _ = _parse_interval(interval)
+    return _WEEK_ORIGIN_MS if kind == "ms" and interval.endswith("w") else 0
+
+
+def _bucket_ids(open_ms, interval, origin):
+    kind, width = _parse_interval(interval)
+    if kind == "M":
+        return open_ms.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64) // width
+    return (open_ms - origin) // width
+
+
+def _bucket_starts(ids, interval, origin):
+    """
+    Returns the open time in ms of buckets, ids + 1 gives their end
+    """
+    kind, width = _parse_interval(interval)
+    if kind == "M":
+        return (ids * width).astype("datetime64[M]").astype("datetime64[ms]").astype(np.int64)
+    return origin + ids * width
+
+
+def _resample_records(timestamps, columns, source_interval, interval, origin):
+    """
+    Aggregates sorted candles into the buckets of `interval`
+
+    Returns
+    -------
+    tuple
+        np.ndarray of bucket ids, dict column -> np.ndarray of aggregated values
+    """
+    source_kind, source_width = _parse_interval(source_interval)
+    if source_kind != "ms":
+        raise ValueError(f"Candles can only be resampled from fixed intervals, not '{source_interval}'")
+    if timestamps.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), {c: np.empty(0) for c in CANDLE_COLUMNS}
+    # Timestamp is the end of a candle, the bucket is picked by its open time
+    ids = _bucket_ids(timestamps - source_width, interval, origin)
+    starts = np.concatenate([[0], np.flatnonzero(ids[1:] != ids[:-1]) + 1])
+    ends = np.concatenate([starts[1:], [ids.shape[0]]])
+    aggregated = {"Open": columns["Open"][starts],
+                  "High": np.maximum.reduceat(columns["High"], starts),
+                  "Low": np.minimum.reduceat(columns["Low"], starts),
+                  "Close": columns["Close"][ends - 1],
+                  "Volume": np.add.reduceat(columns["Volume"], starts)}
+    return ids[starts], aggregated
+
+
+def resample_candles(df_candles, interval, source_interval="1m", origin=None, drop_partial=True):
+    """
+    Builds candles of a coarser interval from finer ones.
+
+    Open is the first Open of a bucket, High the max High, Low the min Low,
+    Close the last Close and Volume the sum of the Volumes, computed with
+    one reduceat per column over the bucket boundaries. The Timestamp of
+    a resampled candle is the end of its bucket, as for downloaded candles.
+
+    Parameters
+    ----------
+    df_candles : pd.DataFrame or CandleArrays
+        OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume], sorted by Timestamp
+    interval : str
+        Target candle size, any amount of s, m, h, d, w or M (calendar months),
+        e.g. '5m', '4h', '3d', '1M' or '90m'
+    source_interval : str
+        Candle size of df_candles
+    origin : str, datetime or int, optional
+        Start of the first bucket in ms since epoch, the epoch by default
+        and Monday 1970-01-05 for weeks. Ignored for months
+    drop_partial : bool
+        Drop the first and the last bucket when df_candles does not cover them entirely
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame with columns [Timestamp, Open, High, Low, Close, Volume]
+    """
+    origin = _default_origin(interval) if origin is None else (
+        origin if isinstance(origin, (int, np.integer)) else _to_epoch_ms(origin))
+    if isinstance(df_candles, CandleArrays):
+        timestamps = df_candles.timestamp // 10**6
+    else:
+        timestamps = _to_epoch_ms(df_candles["Timestamp"]) if df_candles.shape[0] else np.empty(0, dtype=np.int64)
+    columns = {column: np.asarray(df_candles[column], dtype=np.float64) for column in CANDLE_COLUMNS}
+    ids, aggregated = _resample_records(timestamps, columns, source_interval, interval, origin)
+
+    keep = np.ones(ids.shape[0], dtype=bool)
+    if drop_partial and ids.shape[0]:
+        source_width = _parse_interval(source_interval)[1]
+        keep[0] &= timestamps[0] - source_width <= _bucket_starts(ids[:1], interval, origin)[0]
+        keep[-1] &= timestamps[-1] >= _bucket_starts(ids[-1:] + 1, interval, origin)[0]
+
+    df = pd.DataFrame({"Timestamp": _bucket_starts(ids[keep] + 1, interval, origin).astype("datetime64[ms]").astype("datetime64[ns]")})
+    for column in CANDLE_COLUMNS:
+        df[column] = aggregated[column][keep]
+    return df
+
+
+def _derived_interval(interval, source_interval):
+    return f"{interval}_from_{source_interval}"
+
+
+def resample_from_store(store, symbol, interval, start, end, source_interval="1m", origin=None):
+    """
+    Returns candles of `interval` derived from the candles of `source_interval` held in a store.
+
+    Derived candles are cached in the store under '<interval>_from_<source_interval>'.
+    Only the buckets that are not cached yet and that the stored source
+    candles cover entirely are computed, so repeated studies read the
+    derived series from disk and nothing is downloaded.
+
+    Parameters
+    ----------
+    store : bte.utils.candle_store.CandleStore
+        Store holding the source candles, e.g. filled by `extract_data(..., c_size='1m', store=store)`
+    symbol : str
+        Pair or ticker, for example 'BTCUSDT'
+    interval : str
+        Target candle size, see `resample_candles`
+    start, end : str, datetime or int
+        Range of the Timestamps to return [start, end), int values are taken as ms since epoch
+    source_interval : str
+        Candle size of the source candles in the store
+    origin : str, datetime or int, optional
+        See `resample_candles`
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame with columns [Timestamp, Open, High, Low, Close, Volume]
+    """
+    origin = _default_origin(interval) if origin is None else (
+        origin if isinstance(origin, (int, np.integer)) else _to_epoch_ms(origin))
+    start = start if isinstance(start, (int, np.integer)) else _to_epoch_ms(start)
+    end = end if isinstance(end, (int, np.integer)) else _to_epoch_ms(end)
+    derived = _derived_interval(interval, source_interval)
+    if origin != _default_origin(interval):
+        derived += f"_at_{origin}"
+    source_width = _parse_interval(source_interval)[1]
+
+    for gap_start, gap_end in store.missing_ranges(symbol, derived, start, end):
+        # Buckets ending in the gap open after gap_start - one bucket
+        first_id = _bucket_ids(np.array([gap_start - 1]), interval, origin)[0] - 1
+        read_start = _bucket_starts(np.array([first_id]), interval, origin)[0]
+        for covered_start, covered_end in store.coverage(symbol, source_interval):
+            # Source Timestamps in [covered_start, covered_end) are all stored
+            lo, hi = max(covered_start, int(read_start) + 1), min(covered_end, gap_end + 1)
+            if lo >= hi:
+                continue
+            records = store.read_records(symbol, source_interval, lo, hi)
+            ids, aggregated = _resample_records(records["Timestamp"], records, source_interval, interval, origin)
+            bucket_start = _bucket_starts(ids, interval, origin)
+            bucket_end = _bucket_starts(ids + 1, interval, origin)
+            # A bucket is complete when the store covers all its source Timestamps (open, end]
+            keep = (bucket_start + source_width >= lo) & (bucket_end + 1 <= hi) & (bucket_end >= gap_start) & (bucket_end < gap_end)
+            if not np.any(keep):
+                continue
+            df = pd.DataFrame({"Timestamp": bucket_end[keep].astype("datetime64[ms]")})
+            for column in CANDLE_COLUMNS:
+                df[column] = aggregated[column][keep]
+            # No other bucket ends between the kept ones and their neighbours
+            next_end = _bucket_starts(ids[keep][-1:] + 2, interval, origin)[0]
+            store.write(symbol, derived, df,
+                        max(gap_start, int(bucket_start[keep][0]) + 1),
+                        min(gap_end, int(next_end)))
+    return store.read(symbol, derived, start, end)
@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+CANDLE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+CANDLE_DTYPE = np.dtype([("Timestamp", np.int64)] + [(c, np.float64) for c in CANDLE_COLUMNS])
+
+
+def _to_epoch_ms(values):
+    """
+    Converts dates (strings, datetimes or a Timestamp series) to int64 milliseconds since epoch, UTC
+    """
+    if isinstance(values, pd.Series):
+        timestamps = pd.to_datetime(values)
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+        return timestamps.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    timestamp = pd.Timestamp(values)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return int(timestamp.to_datetime64().astype("datetime64[ms]").astype(np.int64))
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _atomic_write(path, write):
+    """
+    Writes a file through a temporary file in the same directory and renames it into place
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CandleStore:
+    """
+    On-disk candle cache partitioned by symbol, interval and month.
+
+    Every partition is a .npy file of CANDLE_DTYPE records sorted by
+    Timestamp (int64 ms), read back through a read-only numpy memmap.
+    Next to the partitions a coverage.json file keeps the Timestamp
+    ranges [start, end) that were fully downloaded, so only the missing
+    gaps have to be requested from the data source. Partitions and the
+    coverage file are replaced atomically, partitions first, so an
+    interrupted write at worst causes a gap to be downloaded again.
+
+    Parameters
+    ----------
+    root : str
+        Directory of the store, created if it does not exist
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _directory(self, symbol, interval):
+        return os.path.join(self.root, symbol, interval)
+
+    def _partition_path(self, symbol, interval, month):
+        return os.path.join(self._directory(symbol, interval), f"{month}.npy")
+
+    def _coverage_path(self, symbol, interval):
+        return os.path.join(self._directory(symbol, interval), "coverage.json")
+
+    def coverage(self, symbol, interval):
+        """
+        Returns the merged [start, end) Timestamp ranges in ms stored for a symbol and interval
+        """
+        path = self._coverage_path(symbol, interval)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [tuple(r) for r in json.load(f)]
+
+    def missing_ranges(self, symbol, interval, start, end):
+        """
+        Returns the [start, end) Timestamp ranges in ms not covered by the store
+
+        Parameters
+        ----------
+        symbol : str
+            Pair or ticker, for example 'BTCUSDT'
+        interval : str
+            Candle size, for example '1h'
+        start, end : str, datetime or int
+            Requested range, int values are taken as ms since epoch
+        """
+        start = start if isinstance(start, (int, np.integer)) else _to_epoch_ms(start)
+        end = end if isinstance(end, (int, np.integer)) else _to_epoch_ms(end)
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in self.coverage(symbol, interval):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def write(self, symbol, interval, df, start, end):
+        """
+        Merges candles into the store and marks [start, end) as covered
+
+        Rows of df override stored rows with the same Timestamp.
+
+        Parameters
+        ----------
+        symbol : str
+            Pair or ticker, for example 'BTCUSDT'
+        interval : str
+            Candle size, for example '1h'
+        df : pd.DataFrame
+            OHLC dataframe with columns [Timestamp, Open, High, Low, Close, Volume]
+            holding every candle with Timestamp in [start, end)
+        start, end : str, datetime or int
+            Range downloaded into df, int values are taken as ms since epoch
+        """
+        start = start if isinstance(start, (int, np.integer)) else _to_epoch_ms(start)
+        end = end if isinstance(end, (int, np.integer)) else _to_epoch_ms(end)
+        os.makedirs(self._directory(symbol, interval), exist_ok=True)
+
+        records = np.empty(df.shape[0], dtype=CANDLE_DTYPE)
+        records["Timestamp"] = _to_epoch_ms(df["Timestamp"]) if df.shape[0] else []
+        for column in CANDLE_COLUMNS:
+            records[column] = df[column].to_numpy(dtype=np.float64)
+
+        months = records["Timestamp"].astype("datetime64[ms]").astype("datetime64[M]")
+        for month in np.unique(months):
+            path = self._partition_path(symbol, interval, str(month))
+            new = records[months == month]
+            if os.path.exists(path):
+                new = np.concatenate([new, np.load(path)])
+            # np.unique keeps the first occurrence, i.e. the new rows
+            _, first = np.unique(new["Timestamp"], return_index=True)
+            merged = new[first]
+            _atomic_write(path, lambda f: np.save(f, merged))
+
+        coverage = _merge_ranges(list(self.coverage(symbol, interval)) + [(start, end)])
+        _atomic_write(self._coverage_path(symbol, interval),
+                      lambda f: f.write(json.dumps(coverage).encode()))
+
+    def read_records(self, symbol, interval, start, end):
+        """
+        Returns stored CANDLE_DTYPE records with Timestamp in [start, end)
+        """
+        start = start if isinstance(start, (int, np.integer)) else _to_epoch_ms(start)
+        end = end if isinstance(end, (int, np.integer)) else _to_epoch_ms(end)
+        first_month = np.datetime64(start, "ms").astype("datetime64[M]")
+        last_month = np.datetime64(end, "ms").astype("datetime64[M]")
+        chunks = []
+        for month in np.arange(first_month, last_month + 1):
+            path = self._partition_path(symbol, interval, str(month))
+            if not os.path.exists(path):
+                continue
+            records = np.load(path, mmap_mode="r")
+            lo, hi = np.searchsorted(records["Timestamp"], [start, end], side="left")
+            chunks.append(records[lo:hi])
+        if not chunks:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.concatenate(chunks)
+
+    def read(self, symbol, interval, start, end):
+        """
+        Returns stored candles with Timestamp in [start, end)
+
+        Returns
+        -------
+        pandas.DataFrame
+            DataFrame with columns [Timestamp, Open, High, Low, Close, Volume]
+        """
+        records = self.read_records(symbol, interval, start, end)
+        df = pd.DataFrame({"Timestamp": records["Timestamp"].astype("datetime64[ms]").astype("datetime64[ns]")})
+        for column in CANDLE_COLUMNS:
+            df[column] = records[column]
+        return df
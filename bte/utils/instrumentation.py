@@ -0,0 +1,191 @@
+import cProfile
+import datetime
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class NullProgress:
+    """
+    Progress reporter that reports nothing
+    """
+
+    def __call__(self, done, total, message=""):
+        pass
+
+
+class PrintProgress:
+    """
+    Progress reporter printing at most one line every `min_interval` seconds.
+
+    The first and the last (done == total) updates are always printed.
+    Reporters are called as reporter(done, total, message) and can be
+    shared by threads.
+
+    Parameters
+    ----------
+    min_interval : float
+        Minimum amount of seconds between two printed lines
+    stream : file-like, optional
+        Stream to print to, sys.stdout by default
+    clock : callable
+        Monotonic clock in seconds
+    """
+
+    def __init__(self, min_interval=10.0, stream=None, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.stream = stream
+        self._clock = clock
+        self._last_report = None
+        self._lock = threading.Lock()
+
+    def _should_report(self, done, total):
+        now = self._clock()
+        with self._lock:
+            if done < total and self._last_report is not None and now - self._last_report < self.min_interval:
+                return False
+            self._last_report = now
+            return True
+
+    def _format(self, done, total, message):
+        percent = done / total * 100 if total else 100
+        return f"{datetime.datetime.now()}: {done}/{total} = {percent:.1f}%" + (f", {message}" if message else "")
+
+    def __call__(self, done, total, message=""):
+        if self._should_report(done, total):
+            print(self._format(done, total, message), file=self.stream or sys.stdout)
+
+
+class LoggingProgress(PrintProgress):
+    """
+    Rate-limited progress reporter writing to a logger at INFO level
+    """
+
+    def __init__(self, logger=None, min_interval=10.0, clock=time.monotonic):
+        super().__init__(min_interval=min_interval, clock=clock)
+        self.logger = logger or logging.getLogger("bte")
+
+    def __call__(self, done, total, message=""):
+        if self._should_report(done, total):
+            self.logger.info(self._format(done, total, message))
+
+
+class _StageTimings:
+    """
+    Thread-safe counters of calls, total and max seconds (and traced allocations) per stage
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, name, seconds, allocated):
+        with self._lock:
+            stage = self._stages.setdefault(name, {"calls": 0, "total_s": 0.0, "max_s": 0.0, "allocated_mb": 0.0})
+            stage["calls"] += 1
+            stage["total_s"] += seconds
+            stage["max_s"] = max(stage["max_s"], seconds)
+            if allocated is not None:
+                stage["allocated_mb"] += allocated / 2**20
+
+    def summary(self):
+        with self._lock:
+            return {name: dict(stage, mean_s=stage["total_s"] / stage["calls"])
+                    for name, stage in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+STAGE_TIMINGS = _StageTimings()
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block of code as one call of the stage `name`, e.g. 'fetch', 'parse', 'feature', 'simulate'
+
+    While tracemalloc is tracing, the net traced allocation of the block is recorded too.
+    """
+    tracing = tracemalloc.is_tracing()
+    allocated_before = tracemalloc.get_traced_memory()[0] if tracing else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        allocated = tracemalloc.get_traced_memory()[0] - allocated_before if tracing and tracemalloc.is_tracing() else None
+        STAGE_TIMINGS.add(name, seconds, allocated)
+
+
+def get_stage_timings():
+    """
+    Returns stage name -> {calls, total_s, mean_s, max_s, allocated_mb}
+    """
+    return STAGE_TIMINGS.summary()
+
+
+def reset_stage_timings():
+    STAGE_TIMINGS.reset()
+
+
+@contextmanager
+def profile_run(path, profile=True, trace_memory=True, top=25):
+    """
+    Profiles a run and writes a JSON report of it to `path`.
+
+    The report holds the per-stage latency counters of the run, the peak
+    traced memory and the top allocation sites when `trace_memory` is
+    set, and the functions with the highest cumulative time when
+    `profile` is set. The cProfile statistics are also dumped next to
+    the report as `path` + '.prof'.
+
+    Parameters
+    ----------
+    path : str
+        JSON file to write the report to
+    profile : bool
+        Run cProfile during the block
+    trace_memory : bool
+        Run tracemalloc during the block
+    top : int
+        Amount of functions and allocation sites in the report
+    """
+    reset_stage_timings()
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_time = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+        report = {"created": datetime.datetime.now().isoformat(),
+                  "wall_time_s": wall_time,
+                  "stages": get_stage_timings()}
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            report["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            report["allocations"] = [{"site": str(statistic.traceback),
+                                      "size_mb": statistic.size / 2**20,
+                                      "count": statistic.count}
+                                     for statistic in snapshot.statistics("lineno")[:top]]
+        if profiler is not None:
+            profiler.dump_stats(path + ".prof")
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+            report["profile"] = output.getvalue().splitlines()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
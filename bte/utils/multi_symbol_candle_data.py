@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from bte.utils import binance_candle_data
+from bte.utils import yahoo_finance_candle_data
+from bte.utils.candle_store import CandleStore
+
+
+# Quote assets of the Binance pairs we trade, used to tell pairs from stock tickers
+BINANCE_QUOTE_ASSETS = ("USDT", "USDC", "FDUSD", "BUSD", "TUSD", "BTC", "ETH", "BNB")
+
+CANDLE_COLUMNS = ["Timestamp", "Open", "High", "Low", "Close", "Volume"]
+
+
+def _split_provider(symbol):
+    """
+    Returns (provider, symbol) of 'binance:BTCUSDT' / 'yahoo:AAPL' style symbols.
+
+    Symbols without a provider prefix go to Binance when they look like a
+    pair, i.e. an upper-case alphanumeric name ending with a known quote
+    asset, and to Yahoo Finance otherwise.
+    """
+    if ":" in symbol:
+        provider, symbol = symbol.split(":", 1)
+        return provider.lower(), symbol
+    if symbol.isalnum() and symbol.isupper() and symbol.endswith(BINANCE_QUOTE_ASSETS):
+        return "binance", symbol
+    return "yahoo", symbol
+
+
+def _normalize_yahoo_frame(df):
+    """
+    Returns Yahoo Finance candles with the Binance columns and UTC-naive Timestamp
+    """
+    if df.empty:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.droplevel(1, axis=1)
+    timestamps = pd.to_datetime(df["Timestamp"])
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    df = df[CANDLE_COLUMNS[1:]].copy()
+    df.insert(0, "Timestamp", timestamps)
+    return df
+
+
+def _compact(df):
+    """
+    Returns candles with float32 prices and volume and a datetime64[ns] (int64) Timestamp
+    """
+    df = df[CANDLE_COLUMNS].copy()
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"]).astype("datetime64[ns]")
+    for column in CANDLE_COLUMNS[1:]:
+        df[column] = df[column].astype(np.float32)
+    return df.reset_index(drop=True)
+
+
+def _provider_store(store, provider):
+    """
+    Returns the part of a candle store holding the candles of one provider
+
+    Binance and Yahoo Finance may list the same ticker, and their Timestamps
+    differ (close time vs open time), so each provider gets its own
+    sub-directory of the store.
+    """
+    if store is None:
+        return None
+    return CandleStore(os.path.join(store.root, provider))
+
+
+def _download_symbol(symbol, interval, date_range, store=None):
+    provider, ticker = _split_provider(symbol)
+    from_date, to_date = date_range
+    if provider in ("binance", "yahoo"):
+        store = _provider_store(store, provider)
+    if provider == "binance":
+        df = binance_candle_data.extract_data(symbol=ticker,
+                                              from_date=from_date,
+                                              to_date=to_date,
+                                              c_size=interval,
+                                              store=store)
+    elif provider == "yahoo":
+        # Yahoo Finance is downloaded by whole days, the range is cut to the exact dates afterwards
+        df = _normalize_yahoo_frame(yahoo_finance_candle_data.download_data(symbol=ticker,
+                                                                            interval=interval,
+                                                                            start_date=from_date,
+                                                                            end_date=pd.Timestamp(to_date) + pd.Timedelta(days=1),
+                                                                            store=store))
+        df = df[(df["Timestamp"] >= pd.Timestamp(from_date)) & (df["Timestamp"] < pd.Timestamp(to_date))]
+    else:
+        raise ValueError(f"Unknown data provider '{provider}' of symbol '{symbol}'")
+    return symbol, _compact(df)
+
+
+def iter_download_many(symbols, interval, date_range, store=None, max_workers=4):
+    """
+    Downloads candles of many symbols concurrently and yields them one by one.
+
+    At most `max_workers` symbols are downloaded or waiting to be consumed
+    at any time, so memory stays bounded by a few symbols whatever the size
+    of the universe.
+
+    Parameters
+    ----------
+    symbols : list of str
+        Binance pairs and Yahoo Finance tickers, e.g. ['BTCUSDT', 'AAPL'].
+        Prefix a symbol with 'binance:' or 'yahoo:' to force the provider.
+    interval : str
+        Candle size, e.g. '1m', '1h'
+    date_range : tuple
+        (from_date, to_date) in format '%Y-%m-%d %H:%M:%S'
+    store : bte.utils.candle_store.CandleStore, optional
+        Local candle cache shared by all symbols, with one sub-directory per provider
+    max_workers : int
+        Amount of symbols downloaded at the same time
+
+    Yields
+    ------
+    tuple
+        symbol as given (with its provider prefix, if any), pandas.DataFrame
+        with float32 [Open, High, Low, Close, Volume] in the order the
+        downloads complete. Repeated symbols are downloaded once
+    """
+    pending_symbols = list(dict.fromkeys(symbols))[::-1]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = set()
+        while pending_symbols or running:
+            while pending_symbols and len(running) < max_workers:
+                running.add(executor.submit(_download_symbol,
+                                            pending_symbols.pop(),
+                                            interval,
+                                            date_range,
+                                            store))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def download_many(symbols, interval, date_range, store=None, max_workers=4, as_multiindex=False):
+    """
+    Downloads candles of many symbols from Binance and Yahoo Finance concurrently.
+
+    Parameters
+    ----------
+    symbols : list of str
+        Binance pairs and Yahoo Finance tickers, see `iter_download_many`
+    interval : str
+        Candle size, e.g. '1m', '1h'
+    date_range : tuple
+        (from_date, to_date) in format '%Y-%m-%d %H:%M:%S'
+    store : bte.utils.candle_store.CandleStore, optional
+        Local candle cache shared by all symbols
+    max_workers : int
+        Amount of symbols downloaded at the same time
+    as_multiindex : bool
+        Return a single frame indexed by (Symbol, Timestamp) instead of a dict
+
+    Returns
+    -------
+    dict or pandas.DataFrame
+        symbol -> candles dataframe in the order of `symbols`, or a single
+        frame with a (Symbol, Timestamp) MultiIndex. Symbols are kept as
+        given, so 'binance:X' and 'yahoo:X' stay apart
+    """
+    frames = dict(iter_download_many(symbols=symbols,
+                                     interval=interval,
+                                     date_range=date_range,
+                                     store=store,
+                                     max_workers=max_workers))
+    frames = {symbol: frames[symbol] for symbol in dict.fromkeys(symbols)}
+    if not as_multiindex:
+        return frames
+    return pd.concat({symbol: df.set_index("Timestamp") for symbol, df in frames.items()},
+                     names=["Symbol", "Timestamp"])
@@ -0,0 +1,207 @@
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from bte.utils.instrumentation import PrintProgress
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the request weight sent to an API.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second
+    capacity : float
+        Maximum amount of tokens, i.e. the allowed burst
+    clock : callable
+        Monotonic clock in seconds
+    sleep : callable
+        Function used to wait for tokens
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until `tokens` tokens are available and takes them
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def drain(self):
+        """
+        Takes all available tokens, e.g. after the API reported that the limit was hit
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = 0
+
+
+class ClientPool:
+    """
+    Pool of API clients shared by the fetching threads.
+
+    Clients are created by `factory` on demand, at most `size` of them,
+    and are reused across calls so their HTTP connections stay open.
+    """
+
+    def __init__(self, factory, size=8):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self):
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    client = self.factory()
+                except BaseException:
+                    # Release the slot, otherwise waiters block on clients that never come
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+
+def _retry_after(error):
+    """
+    Returns the wait in seconds requested by an HTTP 418/429 error, if any
+    """
+    if getattr(error, "status_code", None) not in (418, 429):
+        return None
+    header = getattr(error, "header", None) or {}
+    try:
+        return float(header.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_pages(fetch_page,
+                pages,
+                client_pool=None,
+                limiter=None,
+                weight=1,
+                max_workers=4,
+                max_attempts=72,
+                base_delay=1.0,
+                max_delay=5*60,
+                sleep=time.sleep,
+                progress=None):
+    """
+    Fetches pages concurrently and returns them in the order of `pages`.
+
+    A failed page is retried on its own with exponential backoff and full
+    jitter, or after the Retry-After delay when the API reports that the
+    rate limit was hit; the other pages keep being fetched meanwhile.
+
+    Parameters
+    ----------
+    fetch_page : callable
+        Called as fetch_page(client, page) and returns the page data
+    pages : list
+        Page descriptions passed to fetch_page, e.g. start times
+    client_pool : ClientPool, optional
+        Pool the clients passed to fetch_page are taken from,
+        fetch_page gets None as client when omitted
+    limiter : TokenBucket, optional
+        Limiter charged `weight` tokens before every request
+    weight : float
+        Request weight of one page
+    max_workers : int
+        Amount of pages fetched at the same time
+    max_attempts : int
+        Amount of attempts per page before its last error is raised
+    base_delay : float
+        Backoff delay in seconds after the first failed attempt
+    max_delay : float
+        Maximum backoff delay in seconds
+    sleep : callable
+        Function used to wait between attempts
+    progress : callable, optional
+        Reporter called as progress(done_pages, total_pages, page) after
+        every fetched page, a rate-limited PrintProgress by default
+
+    Returns
+    -------
+    list
+        Results of fetch_page in the order of `pages`
+    """
+    if progress is None:
+        progress = PrintProgress()
+    done = [0]
+    done_lock = threading.Lock()
+
+    def _fetch_once(page):
+        if client_pool is None:
+            return fetch_page(None, page)
+        with client_pool.client() as client:
+            return fetch_page(client, page)
+
+    def _fetch(page):
+        for attempt in range(max_attempts):
+            if limiter is not None:
+                limiter.acquire(weight)
+            try:
+                result = _fetch_once(page)
+                break
+            except Exception as error:
+                if attempt == max_attempts - 1:
+                    raise
+                logger.warning("download attempt # %s of page %s failed: %r", attempt, page, error)
+                delay = _retry_after(error)
+                if delay is not None and limiter is not None:
+                    limiter.drain()
+                if delay is None:
+                    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+                sleep(delay)
+        # Errors of the reporter are not download failures, the page is not fetched again
+        with done_lock:
+            done[0] += 1
+            done_pages = done[0]
+        progress(done_pages, len(pages), str(page))
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_fetch, page) for page in pages]
+        return [future.result() for future in futures]
@@ -0,0 +1,281 @@
+"""
+Record/replay data sources for the Binance and Yahoo Finance downloaders.
+
+A fixture is a gzip-compressed JSON file holding Binance klines rows per
+'<symbol> <interval>' and Yahoo Finance rows per '<ticker> <interval>'.
+Recording wraps the live clients and keeps every row they return:
+
+    recorder = RecordingSpotClient(Spot())
+    extract_data('BTCUSDT', from_date, to_date, '15m', client_pool=ClientPool(lambda: recorder))
+    recorder.save('binance.json.gz')
+
+Replaying serves the recorded rows the way the APIs do, including the
+page size limit and, on request, rate-limit (HTTP 429) errors:
+
+    replay = ReplaySpotClient('binance.json.gz', rate_limit_every=5)
+    extract_data('BTCUSDT', from_date, to_date, '15m', client_pool=ClientPool(lambda: replay))
+    download_data('AAPL', '1h', start, end, downloader=ReplayYahooDownloader('yahoo.json.gz'))
+
+When the BTE_REPLAY_FIXTURE environment variable names a fixture, the
+default clients of `binance_candle_data` and `yahoo_finance_candle_data`
+replay it instead of connecting, e.g. to run the tests on offline hosts.
+"""
+
+import functools
+import gzip
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from bte.utils.candle_resampling import _parse_interval
+
+# Largest page the klines endpoint returns
+KLINES_LIMIT = 1000
+REPLAY_FIXTURE_ENV = "BTE_REPLAY_FIXTURE"
+
+
+def load_fixture(path):
+    """
+    Returns the fixture dict {'binance': {...}, 'yahoo': {...}} stored in a .json.gz file
+    """
+    with gzip.open(path, "rt") as f:
+        fixture = json.load(f)
+    fixture.setdefault("binance", {})
+    fixture.setdefault("yahoo", {})
+    return fixture
+
+
+def save_fixture(fixture, path):
+    """
+    Writes a fixture dict, merging it into the fixture already stored at path
+    """
+    stored = load_fixture(path) if os.path.exists(path) else {"binance": {}, "yahoo": {}}
+    for key, rows in fixture.get("binance", {}).items():
+        stored["binance"][key] = _merge_klines(stored["binance"].get(key, []), rows)
+    for key, frame in fixture.get("yahoo", {}).items():
+        if key in stored["yahoo"]:
+            frame = _frame_to_json(pd.concat([_frame_from_json(stored["yahoo"][key]), _frame_from_json(frame)]))
+        stored["yahoo"][key] = frame
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", compresslevel=6) as f:
+        json.dump(stored, f)
+    os.replace(tmp_path, path)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_replayed_fixture(path):
+    # Clients of a pool replay the same file, it is parsed once
+    return load_fixture(path)
+
+
+def _as_fixture(fixture):
+    return _load_replayed_fixture(os.fspath(fixture)) if isinstance(fixture, (str, os.PathLike)) else fixture
+
+
+def _merge_klines(rows, new_rows):
+    by_open_time = {row[0]: row for row in rows}
+    by_open_time.update((row[0], row) for row in new_rows)
+    return [by_open_time[open_time] for open_time in sorted(by_open_time)]
+
+
+def _frame_to_json(df):
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return {"index": index.to_numpy(dtype="datetime64[ms]").astype(np.int64).tolist(),
+            "columns": [str(column) for column in df.columns],
+            "data": df.to_numpy(dtype=float).tolist()}
+
+
+def _frame_from_json(frame):
+    index = pd.DatetimeIndex(np.asarray(frame["index"], dtype="datetime64[ms]"), name="Datetime").tz_localize("UTC")
+    return pd.DataFrame(np.asarray(frame["data"], dtype=float).reshape(len(frame["index"]), len(frame["columns"])),
+                        index=index,
+                        columns=frame["columns"])
+
+
+def klines_from_candles(candles, interval):
+    """
+    Returns klines rows in the exchange layout for candles in the `extract_data` layout
+    """
+    kind, step_ms = _parse_interval(interval)
+    if kind != "ms":
+        raise ValueError(f"Klines of '{interval}' candles cannot be built, their length varies")
+    # Timestamp is the end of a candle, one ms after its close time
+    end_ms = pd.to_datetime(candles["Timestamp"]).to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    values = candles[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype=float).astype(str)
+    return [[int(end - step_ms), *row, int(end - 1), "0", 0, "0", "0", "0"]
+            for end, row in zip(end_ms, values.tolist())]
+
+
+class RateLimitError(Exception):
+    """
+    Replayed HTTP 429 error, with the attributes of binance.error.ClientError read by `fetch_pages`
+    """
+
+    def __init__(self, retry_after=0):
+        super().__init__(f"429 Too Many Requests, retry after {retry_after}s")
+        self.status_code = 429
+        self.header = {"Retry-After": str(retry_after)}
+
+
+class ReplaySpotClient:
+    """
+    Stand-in for binance.spot.Spot serving klines from a fixture.
+
+    Rows are selected like the exchange does: open time in
+    [startTime, endTime], at most min(limit, KLINES_LIMIT) of them.
+
+    Parameters
+    ----------
+    fixture : str or dict
+        Path of a .json.gz fixture, or a loaded fixture
+    rate_limit_every : int, optional
+        Every rate_limit_every-th request fails with a RateLimitError
+    retry_after : float
+        Retry-After seconds of the replayed rate-limit errors
+    """
+
+    def __init__(self, fixture, rate_limit_every=None, retry_after=0):
+        fixture = _as_fixture(fixture)
+        self.klines_by_key = {key: np.asarray([row[0] for row in rows], dtype=np.int64)
+                              for key, rows in fixture["binance"].items()}
+        self.rows_by_key = fixture["binance"]
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_candles(cls, candles, **kwargs):
+        """
+        Creates a client serving candles given as {(symbol, interval): pd.DataFrame}
+        """
+        return cls({"binance": {f"{symbol} {interval}": klines_from_candles(df, interval)
+                                for (symbol, interval), df in candles.items()}}, **kwargs)
+
+    def klines(self, symbol, interval, startTime=None, endTime=None, limit=500):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise RateLimitError(self.retry_after)
+        key = f"{symbol} {interval}"
+        if key not in self.rows_by_key:
+            raise ValueError(f"No klines of {symbol} {interval} in the replay fixture")
+        open_time = self.klines_by_key[key]
+        start = 0 if startTime is None else int(np.searchsorted(open_time, startTime, side="left"))
+        end = open_time.shape[0] if endTime is None else int(np.searchsorted(open_time, endTime, side="right"))
+        return self.rows_by_key[key][start:min(end, start + min(limit, KLINES_LIMIT))]
+
+
+class RecordingSpotClient:
+    """
+    Wraps a binance.spot.Spot client and records the klines it returns
+
+    Parameters
+    ----------
+    client : binance.spot.Spot
+        Client sending the requests
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.fixture = {"binance": {}, "yahoo": {}}
+        self._lock = threading.Lock()
+
+    def klines(self, symbol, interval, **kwargs):
+        rows = self.client.klines(symbol=symbol, interval=interval, **kwargs)
+        with self._lock:
+            key = f"{symbol} {interval}"
+            self.fixture["binance"][key] = _merge_klines(self.fixture["binance"].get(key, []), rows)
+        return rows
+
+    def save(self, path):
+        save_fixture(self.fixture, path)
+
+
+class ReplayYahooDownloader:
+    """
+    Stand-in for yfinance.download serving chunks from a fixture.
+
+    Rows with Datetime in [start, end) are returned, indexed by a UTC Datetime index.
+
+    Parameters
+    ----------
+    fixture : str or dict
+        Path of a .json.gz fixture, or a loaded fixture
+    rate_limit_every : int, optional
+        Every rate_limit_every-th request fails with a RateLimitError
+    """
+
+    def __init__(self, fixture, rate_limit_every=None):
+        fixture = _as_fixture(fixture)
+        self.frames = {key: _frame_from_json(frame) for key, frame in fixture["yahoo"].items()}
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frames(cls, frames, **kwargs):
+        """
+        Creates a downloader serving {(ticker, interval): pd.DataFrame indexed by Datetime}
+        """
+        return cls({"yahoo": {f"{ticker} {interval}": _frame_to_json(df)
+                              for (ticker, interval), df in frames.items()}}, **kwargs)
+
+    def __call__(self, tickers, start, end, interval, **kwargs):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.rate_limit_every and calls % self.rate_limit_every == 0:
+            raise RateLimitError()
+        key = f"{tickers} {interval}"
+        if key not in self.frames:
+            return pd.DataFrame()
+        df = self.frames[key]
+        return df[(df.index >= pd.Timestamp(start, tz="UTC")) & (df.index < pd.Timestamp(end, tz="UTC"))].copy()
+
+
+class RecordingYahooDownloader:
+    """
+    Wraps yfinance.download and records the chunks it returns
+
+    Parameters
+    ----------
+    download : callable, optional
+        Function with the yfinance.download signature, yfinance.download by default
+    """
+
+    def __init__(self, download=None):
+        if download is None:
+            import yfinance
+            download = yfinance.download
+        self.download = download
+        self.fixture = {"binance": {}, "yahoo": {}}
+        self._lock = threading.Lock()
+
+    def __call__(self, tickers, start, end, interval, **kwargs):
+        df = self.download(tickers=tickers, start=start, end=end, interval=interval, **kwargs)
+        if not df.empty:
+            recorded = df.droplevel(1, axis=1) if isinstance(df.columns, pd.MultiIndex) else df
+            recorded = recorded.tz_convert("UTC") if recorded.index.tz is not None else recorded.tz_localize("UTC")
+            with self._lock:
+                key = f"{tickers} {interval}"
+                if key in self.fixture["yahoo"]:
+                    recorded = pd.concat([_frame_from_json(self.fixture["yahoo"][key]), recorded])
+                self.fixture["yahoo"][key] = _frame_to_json(recorded)
+        return df
+
+    def save(self, path):
+        save_fixture(self.fixture, path)
+
+
+def replay_fixture_from_environment():
+    """
+    Returns the fixture path of the BTE_REPLAY_FIXTURE environment variable, if set
+    """
+    return os.environ.get(REPLAY_FIXTURE_ENV) or None
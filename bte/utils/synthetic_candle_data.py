@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from bte.utils.candle_resampling import _parse_interval
+
+
+def generate_candles(n_rows, interval="1m", start="2024-01-01 00:00:00", seed=0, volatility=None):
+    """
+    Generates random-walk OHLCV candles in the `extract_data` layout.
+
+    Parameters
+    ----------
+    n_rows : int
+        Amount of candles
+    interval : str
+        Candle size, e.g. '1m', '15m', '1h'
+    start : str
+        Timestamp of the first candle
+    seed : int
+        Seed of the random generator
+    volatility : float, optional
+        Standard deviation of the log return per candle,
+        scaled from 0.1% per minute by default
+
+    Returns
+    -------
+    pandas.DataFrame
+        DataFrame with columns [Timestamp, Open, High, Low, Close, Volume]
+    """
+    rng = np.random.default_rng(seed)
+    kind, step_ms = _parse_interval(interval)
+    if kind != "ms":
+        raise ValueError(f"Candles of '{interval}' cannot be generated, their length varies")
+    step = pd.Timedelta(milliseconds=step_ms)
+    if volatility is None:
+        volatility = 0.001 * np.sqrt(step / pd.Timedelta(minutes=1))
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, volatility, size=n_rows)))
+    open_ = np.concatenate([[30000.0], close[:-1]])
+    wick = np.abs(rng.normal(0, volatility / 2, size=(2, n_rows)))
+    return pd.DataFrame({"Timestamp": pd.Timestamp(start) + np.arange(1, n_rows + 1) * step,
+                         "Open": open_,
+                         "High": np.maximum(open_, close) * (1 + wick[0]),
+                         "Low": np.minimum(open_, close) * (1 - wick[1]),
+                         "Close": close,
+                         "Volume": rng.gamma(2.0, 50.0, size=n_rows)})
+
@@ -1,11 +1,43 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from utils.binance_candle_data import _pull_data
-from utils.binance_candle_data import extract_data
+from bte.utils import binance_candle_data
+from bte.utils.binance_candle_data import _pull_data
+from bte.utils.binance_candle_data import extract_data
+from bte.utils.candle_store import CandleStore
+from bte.utils.page_fetcher import ClientPool
+from bte.utils.replay_data_source import REPLAY_FIXTURE_ENV, klines_from_candles, save_fixture
+from bte.utils.synthetic_candle_data import generate_candles
 
+import os
 import pandas as pd
 import datetime
+import pytest
+
+
+@pytest.fixture(scope="module", autouse=True)
+def replay_exchange(tmp_path_factory):
+    """
+    Replays recorded klines instead of calling the exchange, unless BTE_REPLAY_FIXTURE
+    already names a fixture. The default one is generated from synthetic candles.
+    """
+    path = os.environ.get(REPLAY_FIXTURE_ENV)
+    if not path:
+        path = str(tmp_path_factory.mktemp("replay") / "binance.json.gz")
+        klines = {}
+        for seed, s in enumerate(["BTCUSDT", "ETHUSDT", "ETHBTC"]):
+            klines[f"{s} 15m"] = []
+            # The days read by the tests only
+            for start, end in [('2022-12-31', '2023-01-02'), ('2023-12-31', '2024-06-21')]:
+                n_rows = (pd.Timestamp(end) - pd.Timestamp(start)) // pd.Timedelta(minutes=15)
+                candles = generate_candles(n_rows, interval='15m', start=start, seed=seed)
+                klines[f"{s} 15m"] += klines_from_candles(candles, '15m')
+        save_fixture({"binance": klines}, path)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(REPLAY_FIXTURE_ENV, path)
+        monkeypatch.setattr(binance_candle_data, "client", None)
+        monkeypatch.setattr(binance_candle_data, "client_pool", ClientPool(binance_candle_data._new_client))
+        yield path
 
 
 def test__pull_data():
@@ -20,7 +52,8 @@ def test__pull_data():
                         to_date=to_date,
                         n_candles=n_candles, 
                         c_size=c_size, 
-                        symbol=s)
+                        symbol=s,
+                        timestamp_format='%Y-%m-%d %H:%M:%S')
         assert isinstance(df, pd.DataFrame)
         assert df.shape[0] == n_candles
         assert df.columns.tolist() == ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
@@ -77,3 +110,13 @@ def test_extract_data():
         print(df.describe().to_string())    
     for i in range(len(dataframes)-1):
         assert not dataframes[i].equals(dataframes[i+1])
+
+
+def test_extract_data_with_store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    # The first range starts and ends off the 15m grid
+    for from_date, to_date in [('2024-01-03 00:07:00', '2024-01-25 12:05:00'),
+                               ('2024-01-01 00:00:00', '2024-02-01 00:00:00')]:
+        without_store = extract_data(symbol='BTCUSDT', from_date=from_date, to_date=to_date, c_size='15m')
+        with_store = extract_data(symbol='BTCUSDT', from_date=from_date, to_date=to_date, c_size='15m', store=store)
+        pd.testing.assert_frame_equal(with_store, without_store)
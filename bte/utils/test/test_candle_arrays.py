@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pickle
+
+from bte.utils.candle_arrays import CandleArrays
+from bte.utils.synthetic_candle_data import generate_candles
+
+import numpy as np
+import pandas as pd
+
+
+def test_candle_arrays(tmp_path):
+    df = generate_candles(500, interval='1h', seed=1)
+    candles = CandleArrays.from_frame(df)
+    assert len(candles) == 500
+    assert candles.timestamp.dtype == np.int64
+    expected = df[['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']].copy()
+    expected['Timestamp'] = expected['Timestamp'].astype('datetime64[ns]')
+    pd.testing.assert_frame_equal(candles.to_frame(), expected)
+
+    path = str(tmp_path / 'BTCUSDT-1h')
+    candles.save(path)
+    mapped = CandleArrays.open(path)
+    assert isinstance(mapped.close, np.memmap)
+    assert not mapped.close.flags.writeable
+    assert mapped.fingerprint() == candles.fingerprint()
+
+    # Slices of mapped candles are pickled as their location
+    window = mapped[100:200]
+    assert len(pickle.dumps(window)) < 1000
+    restored = pickle.loads(pickle.dumps(window))
+    np.testing.assert_array_equal(restored['Timestamp'], df['Timestamp'].to_numpy()[100:200])
+    np.testing.assert_array_equal(restored['Close'], df['Close'].to_numpy()[100:200])
+
+    compact = CandleArrays.from_frame(df, dtype=np.float32)
+    assert compact.close.dtype == np.float32
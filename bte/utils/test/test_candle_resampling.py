@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.utils.candle_resampling import resample_candles, resample_from_store
+from bte.utils.candle_store import CandleStore
+from bte.utils.synthetic_candle_data import generate_candles
+
+import numpy as np
+import pandas as pd
+
+
+def _pandas_resample(df, rule, offset):
+    df = df.set_index(df['Timestamp'] - pd.Timedelta(minutes=1))
+    result = df.resample(rule).agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    result.index = result.index + offset
+    return result.dropna()
+
+
+def test_resample_candles():
+    df = generate_candles(100000, interval='1m', seed=5, start='2024-01-01 00:07:00')
+    for interval, rule, offset in [('4h', '4h', pd.Timedelta(hours=4)),
+                                   ('90m', '90min', pd.Timedelta(minutes=90)),
+                                   ('1M', 'MS', pd.offsets.MonthBegin(1))]:
+        result = resample_candles(df, interval, drop_partial=False)
+        expected = _pandas_resample(df, rule, offset)
+        np.testing.assert_array_equal(result['Timestamp'].to_numpy(), expected.index.to_numpy(dtype='datetime64[ns]'))
+        np.testing.assert_allclose(result[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(), expected.to_numpy())
+        # The first bucket misses 7 minutes, the last one is still open
+        pd.testing.assert_frame_equal(resample_candles(df, interval), result.iloc[1:-1].reset_index(drop=True))
+
+    weeks = resample_candles(df, '1w', drop_partial=False)
+    assert (weeks['Timestamp'].dt.dayofweek == 0).all()
+
+
+def test_resample_from_store(tmp_path):
+    df = generate_candles(20000, interval='1m', seed=6)
+    store = CandleStore(str(tmp_path))
+    store.write('BTCUSDT', '1m', df, '2024-01-01', df['Timestamp'].iloc[-1] + pd.Timedelta(milliseconds=1))
+    expected = resample_candles(df, '4h')
+
+    first = resample_from_store(store, 'BTCUSDT', '4h', '2024-01-03', '2024-01-08')
+    pd.testing.assert_frame_equal(first, expected[(expected['Timestamp'] >= '2024-01-03') &
+                                                  (expected['Timestamp'] < '2024-01-08')].reset_index(drop=True))
+    result = resample_from_store(store, 'BTCUSDT', '4h', '2024-01-01', '2024-02-01')
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(store.coverage('BTCUSDT', '4h_from_1m')) == 1
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.utils.candle_store import CandleStore
+
+import numpy as np
+import pandas as pd
+
+
+def _make_candles(from_date, to_date, freq='1h'):
+    timestamps = pd.date_range(from_date, to_date, freq=freq, inclusive='left')
+    close = np.arange(timestamps.shape[0], dtype=float) + 100
+    return pd.DataFrame({'Timestamp': timestamps,
+                         'Open': close,
+                         'High': close + 1,
+                         'Low': close - 1,
+                         'Close': close,
+                         'Volume': np.ones(timestamps.shape[0])})
+
+
+def test_candle_store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    assert store.missing_ranges('BTCUSDT', '1h', '2024-01-20', '2024-02-10') == [
+        (pd.Timestamp('2024-01-20').value // 10**6, pd.Timestamp('2024-02-10').value // 10**6)]
+
+    store.write('BTCUSDT', '1h', _make_candles('2024-01-20', '2024-02-05'), '2024-01-20', '2024-02-05')
+    gaps = store.missing_ranges('BTCUSDT', '1h', '2024-01-15', '2024-02-10')
+    assert [(pd.Timestamp(s, unit='ms'), pd.Timestamp(e, unit='ms')) for s, e in gaps] == [
+        (pd.Timestamp('2024-01-15'), pd.Timestamp('2024-01-20')),
+        (pd.Timestamp('2024-02-05'), pd.Timestamp('2024-02-10'))]
+
+    # Overlapping write, the newer rows win
+    df = _make_candles('2024-02-01', '2024-02-10')
+    df['Close'] = -1.0
+    store.write('BTCUSDT', '1h', df, '2024-02-01', '2024-02-10')
+    assert store.coverage('BTCUSDT', '1h') == [(pd.Timestamp('2024-01-20').value // 10**6,
+                                                pd.Timestamp('2024-02-10').value // 10**6)]
+
+    result = store.read('BTCUSDT', '1h', '2024-01-25', '2024-02-08')
+    assert result.columns.tolist() == ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+    assert result['Timestamp'].is_monotonic_increasing
+    assert result['Timestamp'].is_unique
+    assert result['Timestamp'].min() == pd.Timestamp('2024-01-25')
+    assert result['Timestamp'].max() == pd.Timestamp('2024-02-07 23:00:00')
+    assert (result.loc[result['Timestamp'] >= pd.Timestamp('2024-02-01'), 'Close'] == -1).all()
+    assert (result.loc[result['Timestamp'] < pd.Timestamp('2024-02-01'), 'Close'] > 0).all()
+    assert store.read('ETHUSDT', '1h', '2024-01-25', '2024-02-08').shape[0] == 0
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import logging
+import os
+
+from bte.utils.instrumentation import LoggingProgress
+from bte.utils.instrumentation import PrintProgress
+from bte.utils.instrumentation import get_stage_timings
+from bte.utils.instrumentation import profile_run
+from bte.utils.instrumentation import reset_stage_timings
+from bte.utils.instrumentation import stage
+
+
+def test_print_progress_is_rate_limited():
+    now = [0.0]
+    stream = io.StringIO()
+    progress = PrintProgress(min_interval=10, stream=stream, clock=lambda: now[0])
+    for done in range(1, 6):
+        progress(done, 5, f"page {done}")
+        now[0] += 4
+    lines = stream.getvalue().splitlines()
+    # First update, the ones 10 seconds apart and the last one
+    assert len(lines) == 3
+    assert lines[0].endswith("1/5 = 20.0%, page 1")
+    assert lines[1].endswith("4/5 = 80.0%, page 4")
+    assert lines[2].endswith("5/5 = 100.0%, page 5")
+
+
+def test_logging_progress(caplog):
+    now = [0.0]
+    progress = LoggingProgress(logger=logging.getLogger("bte.test"), min_interval=10, clock=lambda: now[0])
+    with caplog.at_level(logging.INFO, logger="bte.test"):
+        progress(1, 3)
+        progress(2, 3)
+        progress(3, 3)
+    assert [record.getMessage().split(": ")[1] for record in caplog.records] == ["1/3 = 33.3%", "3/3 = 100.0%"]
+
+
+def test_stage():
+    reset_stage_timings()
+    for _ in range(3):
+        with stage("parse"):
+            pass
+    try:
+        with stage("fetch"):
+            raise ValueError()
+    except ValueError:
+        pass
+    timings = get_stage_timings()
+    assert sorted(timings) == ["fetch", "parse"]
+    assert timings["parse"]["calls"] == 3
+    assert timings["fetch"]["calls"] == 1
+    assert timings["parse"]["max_s"] <= timings["parse"]["total_s"]
+    reset_stage_timings()
+    assert get_stage_timings() == {}
+
+
+def test_profile_run(tmp_path):
+    path = str(tmp_path / "report.json")
+    with profile_run(path, top=5):
+        with stage("feature"):
+            data = [list(range(1000)) for _ in range(100)]
+    del data
+    with open(path) as f:
+        report = json.load(f)
+    assert report["stages"]["feature"]["calls"] == 1
+    assert report["stages"]["feature"]["allocated_mb"] > 0
+    assert report["peak_memory_mb"] > 0
+    assert 0 < len(report["allocations"]) <= 5
+    assert report["profile"]
+    assert os.path.exists(path + ".prof")
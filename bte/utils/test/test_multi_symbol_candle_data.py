@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.utils import binance_candle_data
+from bte.utils import yahoo_finance_candle_data
+from bte.utils.candle_store import CandleStore
+from bte.utils.multi_symbol_candle_data import _split_provider
+from bte.utils.multi_symbol_candle_data import download_many
+from bte.utils.page_fetcher import ClientPool
+from bte.utils.replay_data_source import ReplaySpotClient
+from bte.utils.replay_data_source import ReplayYahooDownloader
+from bte.utils.synthetic_candle_data import generate_candles
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+DATE_RANGE = ('2024-01-01 00:00:00', '2024-01-15 00:00:00')
+
+
+@pytest.fixture()
+def providers(monkeypatch):
+    """
+    Serves 'XUSDT' from a replayed exchange and 'XUSDT' and 'AAPL' from a replayed Yahoo Finance
+    """
+    binance = generate_candles(24 * 20, interval='1h', start='2023-12-31', seed=1)
+    monkeypatch.setattr(binance_candle_data, "client_pool", ClientPool(lambda: ReplaySpotClient.from_candles({('XUSDT', '1h'): binance})))
+    frames = {}
+    for seed, ticker in enumerate(['XUSDT', 'AAPL'], start=2):
+        candles = generate_candles(24 * 20, interval='1h', start='2023-12-31', seed=seed)
+        frames[(ticker, '1h')] = candles.set_index(candles['Timestamp'].dt.tz_localize('UTC') - pd.Timedelta(hours=1)).drop(columns='Timestamp')
+    monkeypatch.setattr(yahoo_finance_candle_data, "_default_downloader", lambda: ReplayYahooDownloader.from_frames(frames))
+    return binance, frames
+
+
+def test_split_provider():
+    assert _split_provider('BTCUSDT') == ('binance', 'BTCUSDT')
+    assert _split_provider('AAPL') == ('yahoo', 'AAPL')
+    assert _split_provider('yahoo:BTCUSDT') == ('yahoo', 'BTCUSDT')
+    assert _split_provider('Binance:AAPL') == ('binance', 'AAPL')
+
+
+def test_download_many(providers):
+    binance, frames = providers
+    result = download_many(['binance:XUSDT', 'yahoo:XUSDT', 'AAPL', 'AAPL'], '1h', DATE_RANGE, max_workers=2)
+    assert list(result) == ['binance:XUSDT', 'yahoo:XUSDT', 'AAPL']
+    for symbol, df in result.items():
+        assert list(df.columns) == ['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+        assert df['Close'].dtype == np.float32
+        assert df['Timestamp'].min() >= pd.Timestamp(DATE_RANGE[0])
+        assert df['Timestamp'].max() < pd.Timestamp(DATE_RANGE[1])
+
+    # Provider routing: the same ticker comes from the two providers
+    expected = binance.set_index('Timestamp')['Close'].astype(np.float32)
+    np.testing.assert_array_equal(result['binance:XUSDT']['Close'].to_numpy(),
+                                  expected.loc[result['binance:XUSDT']['Timestamp']].to_numpy())
+    yahoo = frames[('XUSDT', '1h')]
+    expected = pd.Series(yahoo['Close'].to_numpy(dtype=np.float32), index=yahoo.index.tz_localize(None))
+    np.testing.assert_array_equal(result['yahoo:XUSDT']['Close'].to_numpy(),
+                                  expected.loc[result['yahoo:XUSDT']['Timestamp']].to_numpy())
+    assert not np.array_equal(result['binance:XUSDT']['Close'].to_numpy()[:10], result['yahoo:XUSDT']['Close'].to_numpy()[:10])
+
+
+def test_download_many_as_multiindex(providers):
+    symbols = ['binance:XUSDT', 'yahoo:XUSDT', 'AAPL']
+    frames = download_many(symbols, '1h', DATE_RANGE)
+    result = download_many(symbols, '1h', DATE_RANGE, as_multiindex=True)
+    assert result.index.names == ['Symbol', 'Timestamp']
+    assert list(result.index.get_level_values('Symbol').unique()) == symbols
+    assert list(result.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert result.shape[0] == sum(df.shape[0] for df in frames.values())
+    pd.testing.assert_frame_equal(result.loc['yahoo:XUSDT'], frames['yahoo:XUSDT'].set_index('Timestamp'))
+
+
+def test_download_many_with_store(providers, tmp_path):
+    symbols = ['binance:XUSDT', 'yahoo:XUSDT']
+    expected = download_many(symbols, '1h', DATE_RANGE)
+    store = CandleStore(str(tmp_path))
+    # Second run reads back from the store, each provider from its own partitions
+    for _ in range(2):
+        result = download_many(symbols, '1h', DATE_RANGE, store=store, max_workers=1)
+        for symbol in symbols:
+            pd.testing.assert_frame_equal(result[symbol], expected[symbol])
+    assert store.coverage('XUSDT', '1h') == []
+    assert CandleStore(str(tmp_path / 'binance')).coverage('XUSDT', '1h')
+    assert CandleStore(str(tmp_path / 'yahoo')).coverage('XUSDT', '1h')
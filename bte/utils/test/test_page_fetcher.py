@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.utils.page_fetcher import ClientPool
+from bte.utils.page_fetcher import TokenBucket
+from bte.utils.page_fetcher import fetch_pages
+from bte.utils.replay_data_source import ReplaySpotClient
+from bte.utils.synthetic_candle_data import generate_candles
+
+import threading
+import pandas as pd
+import pytest
+
+
+# Pages of three 1m candles, starting every 100 candles
+CANDLES = generate_candles(1000, interval='1m', start='2024-01-01', seed=0)
+FIRST_OPEN_MS = pd.Timestamp('2024-01-01').value // 10**6
+PAGES = [FIRST_OPEN_MS + i * 100 * 60 * 1000 for i in range(10)]
+
+
+def _spot():
+    return ReplaySpotClient.from_candles({("BTCUSDT", "1m"): CANDLES})
+
+
+def _failing_fetch_page(failures):
+    """
+    Returns a fetch_page failing failures[start] times on the page starting at start
+    """
+    failures = dict(failures)
+    lock = threading.Lock()
+
+    def fetch_page(client, start):
+        with lock:
+            if failures.get(start, 0) > 0:
+                failures[start] -= 1
+                raise ConnectionError(f"page {start} failed")
+        return client.klines(symbol="BTCUSDT", interval="1m", startTime=start, limit=3)
+
+    return fetch_page
+
+
+def test_fetch_pages_in_order_with_retries():
+    spot = _spot()
+    delays = []
+    result = fetch_pages(fetch_page=_failing_fetch_page({PAGES[3]: 2, PAGES[7]: 1}),
+                         pages=PAGES,
+                         client_pool=ClientPool(lambda: spot, size=4),
+                         max_workers=4,
+                         sleep=delays.append)
+    assert [page[0][0] for page in result] == PAGES
+    assert all(len(page) == 3 for page in result)
+    assert len(delays) == 3
+    assert all(0 <= d <= 4 for d in delays)
+
+
+def test_fetch_pages_retries_rate_limits():
+    spot = ReplaySpotClient.from_candles({("BTCUSDT", "1m"): CANDLES}, rate_limit_every=4, retry_after=2)
+    delays = []
+    result = fetch_pages(fetch_page=_failing_fetch_page({}),
+                         pages=PAGES,
+                         client_pool=ClientPool(lambda: spot, size=4),
+                         max_workers=4,
+                         sleep=delays.append)
+    assert [page[0][0] for page in result] == PAGES
+    # Every fourth of the 13 requests is answered with a 429 error and waits for Retry-After
+    assert spot.calls == 13
+    assert delays == [2, 2, 2]
+
+
+def test_fetch_pages_raises_after_max_attempts():
+    spot = _spot()
+    with pytest.raises(ConnectionError):
+        fetch_pages(fetch_page=_failing_fetch_page({PAGES[0]: 5}),
+                    pages=PAGES[:1],
+                    client_pool=ClientPool(lambda: spot),
+                    max_attempts=3,
+                    sleep=lambda d: None)
+
+
+def test_token_bucket():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=10, capacity=20, clock=lambda: now[0], sleep=sleep)
+    for _ in range(10):
+        bucket.acquire(2)
+    assert now[0] == 0
+    for _ in range(5):
+        bucket.acquire(2)
+    assert now[0] == pytest.approx(1.0)
+
+
+def test_client_pool_reuses_clients():
+    created = []
+    pool = ClientPool(lambda: created.append(object()) or created[-1], size=2)
+    with pool.client() as first:
+        with pool.client() as second:
+            assert first is not second
+    with pool.client() as third:
+        assert third in (first, second)
+    assert len(created) == 2
+
+
+def test_client_pool_factory_failure_releases_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(None)
+        if len(attempts) <= 3:
+            raise ConnectionError("cannot connect")
+        return object()
+
+    pool = ClientPool(factory, size=1)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            with pool.client():
+                pass
+    with pool.client() as client:
+        assert client is not None
+    assert len(attempts) == 4
+
+
+def test_fetch_pages_progress_errors_are_not_retried():
+    calls = []
+
+    def fetch_page(client, page):
+        calls.append(page)
+        return page
+
+    def progress(done, total, message=""):
+        raise RuntimeError("reporter failed")
+
+    with pytest.raises(RuntimeError):
+        fetch_pages(fetch_page=fetch_page, pages=[0], sleep=lambda d: None, progress=progress)
+    assert calls == [0]
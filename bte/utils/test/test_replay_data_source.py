@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from bte.utils.binance_candle_data import extract_data
+from bte.utils.candle_store import CandleStore
+from bte.utils.page_fetcher import ClientPool
+from bte.utils.replay_data_source import RecordingSpotClient
+from bte.utils.replay_data_source import RecordingYahooDownloader
+from bte.utils.replay_data_source import ReplaySpotClient
+from bte.utils.replay_data_source import ReplayYahooDownloader
+from bte.utils.replay_data_source import klines_from_candles
+from bte.utils.synthetic_candle_data import generate_candles
+
+from bte.utils.yahoo_finance_candle_data import download_data
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def test_record_and_replay_klines(tmp_path):
+    candles = generate_candles(3000, interval='1h', seed=1)
+    path = str(tmp_path / 'binance.json.gz')
+    recorder = RecordingSpotClient(ReplaySpotClient.from_candles({('BTCUSDT', '1h'): candles}))
+    recorded = extract_data('BTCUSDT', '2024-01-01 00:00:00', '2024-04-01 00:00:00', '1h',
+                            client_pool=ClientPool(lambda: recorder))
+    recorder.save(path)
+
+    replay = ReplaySpotClient(path, rate_limit_every=3)
+    replayed = extract_data('BTCUSDT', '2024-01-01 00:00:00', '2024-04-01 00:00:00', '1h',
+                            client_pool=ClientPool(lambda: replay))
+    pd.testing.assert_frame_equal(replayed, recorded)
+    # Pages of 1000 candles, every third request answered with a 429 error
+    assert replay.calls > 3
+    assert len(replay.klines('BTCUSDT', '1h', startTime=0, limit=5000)) == 1000
+
+
+def test_replay_yahoo(tmp_path):
+    candles = generate_candles(24 * 7 * 6, interval='1h', start='2024-01-01', seed=2)
+    frame = candles.set_index(candles['Timestamp'].dt.tz_localize('UTC') - pd.Timedelta(hours=1)).drop(columns='Timestamp')
+    path = str(tmp_path / 'yahoo.json.gz')
+    recorder = RecordingYahooDownloader(ReplayYahooDownloader.from_frames({('AAPL', '1h'): frame}))
+    download_data('AAPL', '1h', '2024-01-01', '2024-02-12', downloader=recorder)
+    recorder.save(path)
+
+    replay = ReplayYahooDownloader(path, rate_limit_every=4)
+    result = download_data('AAPL', '1h', '2024-01-01', '2024-02-12', downloader=replay, store=CandleStore(str(tmp_path / 'store')))
+    np.testing.assert_allclose(result['Close'].to_numpy(), frame['Close'].to_numpy())
+    assert (result['Datetime'] == frame.index).all()
+
+
+def test_klines_from_candles():
+    candles = generate_candles(50, interval='15m', start='2024-01-01', seed=3)
+    klines = klines_from_candles(candles, '15m')
+    end_ms = pd.Timestamp('2024-01-01').value // 10**6 + np.arange(1, 51) * 15 * 60 * 1000
+    # Open time, close time one ms before the Timestamp, prices as strings
+    assert [row[0] for row in klines] == (end_ms - 15 * 60 * 1000).tolist()
+    assert [row[6] for row in klines] == (end_ms - 1).tolist()
+    values = np.array([row[1:6] for row in klines], dtype=float)
+    np.testing.assert_array_equal(values, candles[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy())
+    with pytest.raises(ValueError):
+        klines_from_candles(candles, '1M')
+
+    replay = ReplaySpotClient.from_candles({('BTCUSDT', '15m'): candles})
+    assert replay.klines('BTCUSDT', '15m', startTime=int(end_ms[9]) - 15 * 60 * 1000, limit=5) == klines[9:14]
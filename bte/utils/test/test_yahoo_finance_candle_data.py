@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import date, datetime, timezone
+
+from bte.utils.candle_store import CandleStore
+from bte.utils.replay_data_source import ReplayYahooDownloader
+from bte.utils.synthetic_candle_data import generate_candles
+from bte.utils.yahoo_finance_candle_data import _weekly_chunks
+from bte.utils.yahoo_finance_candle_data import download_data
+
+import pandas as pd
+
+
+def _yahoo_frames():
+    candles = generate_candles(24 * 7 * 6, interval='1h', start='2024-01-01', seed=2)
+    # Yahoo Finance indexes candles by their open time
+    frame = candles.set_index(candles['Timestamp'].dt.tz_localize('UTC') - pd.Timedelta(hours=1)).drop(columns='Timestamp')
+    return {('AAPL', '1h'): frame}
+
+
+class CountingDownloader(ReplayYahooDownloader):
+    def __init__(self, fixture, rate_limit_every=None):
+        super().__init__(fixture, rate_limit_every)
+        self.requests = []
+
+    def __call__(self, tickers, start, end, interval, **kwargs):
+        self.requests.append((start, end))
+        return super().__call__(tickers, start, end, interval, **kwargs)
+
+
+def test_weekly_chunks():
+    chunks = _weekly_chunks(date(2024, 1, 3), date(2024, 1, 25))
+    assert chunks == [(date(2024, 1, 3), date(2024, 1, 8)),
+                      (date(2024, 1, 8), date(2024, 1, 15)),
+                      (date(2024, 1, 15), date(2024, 1, 22)),
+                      (date(2024, 1, 22), date(2024, 1, 25))]
+
+
+def test_download_data_with_retries():
+    frame = _yahoo_frames()[('AAPL', '1h')]
+    downloader = CountingDownloader({'yahoo': {}}, rate_limit_every=3)
+    downloader.frames = {'AAPL 1h': frame}
+    result = download_data('AAPL', '1h', '2024-01-01', '2024-02-12', downloader=downloader)
+    assert list(result.columns) == ['Datetime', 'Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+    assert (result['Datetime'] == frame.index).all()
+    assert (result['Timestamp'] == frame.index.tz_localize(None)).all()
+    pd.testing.assert_series_equal(result['Close'], frame['Close'].reset_index(drop=True))
+    # Six weeks, every third request fails with a 429 error and is retried
+    assert len(set(downloader.requests)) == 6
+    assert len(downloader.requests) == 8
+
+
+def test_download_data_reuses_store(tmp_path):
+    store = CandleStore(str(tmp_path / 'store'))
+    downloader = ReplayYahooDownloader.from_frames(_yahoo_frames())
+    without_store = download_data('AAPL', '1h', '2024-01-01', '2024-02-12', downloader=downloader)
+    with_store = download_data('AAPL', '1h', '2024-01-01', '2024-02-12', downloader=downloader, store=store)
+    pd.testing.assert_frame_equal(with_store, without_store)
+
+    # The weeks are complete, they are read back from the store
+    downloader = CountingDownloader({'yahoo': {}})
+    again = download_data('AAPL', '1h', '2024-01-08', '2024-02-12', downloader=downloader, store=store)
+    assert downloader.requests == []
+    pd.testing.assert_frame_equal(again, without_store[without_store['Datetime'] >= '2024-01-08'].reset_index(drop=True))
+
+
+def test_download_data_without_data():
+    downloader = CountingDownloader({'yahoo': {}})
+    result = download_data('AAPL', '1h', start_date='2024-01-01', downloader=downloader)
+    assert result.empty
+    assert list(result.columns) == ['Datetime', 'Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume']
+    # Up to today in UTC
+    assert max(end for _, end in downloader.requests) == str(datetime.now(timezone.utc).date())
@@ -1,48 +1,143 @@
-import yfinance as yf
+import os
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
+from bte.utils.instrumentation import stage
+from bte.utils.page_fetcher import fetch_pages
 
-def download_data(symbol, interval: str):
+
+def _weekly_chunks(start_date, end_date):
+    """
+    Splits [start_date, end_date) into [start, end) date windows aligned on Mondays.
+
+    Aligned windows stay the same from one run to the next, so the weeks
+    already stored in a candle cache can be recognised and skipped.
+    """
+    chunks = []
+    week_start = start_date - timedelta(days=start_date.weekday())
+    while week_start < end_date:
+        chunks.append((max(week_start, start_date), min(week_start + timedelta(days=7), end_date)))
+        week_start += timedelta(days=7)
+    return chunks
+
+
+def _default_downloader():
+    # Offline runs replay the chunks of a fixture, see bte.utils.replay_data_source
+    if os.environ.get("BTE_REPLAY_FIXTURE"):
+        from bte.utils.replay_data_source import ReplayYahooDownloader, replay_fixture_from_environment
+        return ReplayYahooDownloader(replay_fixture_from_environment())
+    import yfinance as yf
+    return yf.download
+
+
+def _download_chunk(symbol, interval, chunk, downloader=None):
+    if downloader is None:
+        downloader = _default_downloader()
+    chunk_start, chunk_end = chunk
+    with stage("fetch"):
+        data_chunk = downloader(tickers=symbol,
+                                 start=chunk_start.strftime('%Y-%m-%d'),
+                                 end=chunk_end.strftime('%Y-%m-%d'),
+                                 interval=interval,
+                                 progress=False,
+                                 threads=False)
+    if isinstance(data_chunk.columns, pd.MultiIndex):
+        data_chunk = data_chunk.droplevel(1, axis=1)
+    data_chunk.index.name = "Datetime"
+    return data_chunk
+
+
+def _chunk_to_candles(data_chunk):
+    """
+    Returns a downloaded chunk as [Timestamp, Open, High, Low, Close, Volume] with UTC-naive Timestamp
     """
-    Download one year of 1-minute interval data from Yahoo Finance by iterating weekly.
+    timestamps = pd.DatetimeIndex(data_chunk.index)
+    if timestamps.tz is not None:
+        timestamps = timestamps.tz_convert("UTC").tz_localize(None)
+    df = pd.DataFrame({"Timestamp": timestamps.astype("datetime64[ns]")})
+    for column in ["Open", "High", "Low", "Close", "Volume"]:
+        # Yahoo Finance returns a frame without columns for weeks without data
+        df[column] = data_chunk[column].to_numpy(dtype=float) if column in data_chunk else float("nan")
+    return df
+
+
+def _to_full_data(candles):
+    """
+    Returns candles sorted by Timestamp with a UTC Datetime column inserted first
+    """
+    full_data = pd.concat(candles, ignore_index=True) if candles else _chunk_to_candles(pd.DataFrame())
+    full_data = full_data.drop_duplicates(subset="Timestamp").sort_values("Timestamp", ignore_index=True)
+    full_data.insert(0, "Datetime", full_data["Timestamp"].dt.tz_localize("UTC"))
+    return full_data
+
+
+def _to_date(date):
+    return pd.Timestamp(date).date()
+
+
+def download_data(symbol,
+                  interval: str,
+                  start_date=None,
+                  end_date=None,
+                  store=None,
+                  max_workers=4,
+                  max_attempts=5,
+                  downloader=None):
+    """
+    Download interval data from Yahoo Finance by iterating weekly.
+
+    Weekly chunks are downloaded concurrently and retried on errors.
+    With a candle store, weeks that are complete (ending before today,
+    UTC) are downloaded once and read back from the store afterwards,
+    so a daily run only downloads the current week again.
 
     Args:
     - symbol (str): The stock symbol to download the data for.
+    - interval (str): Candle size, e.g. '1m', '1h'.
+    - start_date (str or datetime, optional): First day to download, one year before end_date by default.
+    - end_date (str or datetime, optional): Day to download up to, excluded, today by default.
+    - store (bte.utils.candle_store.CandleStore, optional): Local candle cache.
+    - max_workers (int): Amount of weeks downloaded at the same time.
+    - max_attempts (int): Amount of attempts per week before the error is raised.
+    - downloader (callable, optional): Function with the yfinance.download signature,
+      e.g. a `bte.utils.replay_data_source.ReplayYahooDownloader`. yfinance.download by default.
 
     Returns:
-    - pd.DataFrame: A DataFrame containing the 1-minute interval data for one year.
-    """
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=365)
-
-    # List to store the data chunks
-    data_list = []
-
-    # Download the data in weekly chunks
-    current_end = end_date
-    current_start = current_end - timedelta(days=7)
-
-    while current_start > start_date:
-        # Download data for the current week
-        data_chunk = yf.download(tickers=symbol,
-                                 start=current_start.strftime('%Y-%m-%d'),
-                                 end=current_end.strftime('%Y-%m-%d'),
-                                 interval=interval)
-        if not data_chunk.empty:
-            data_list.append(data_chunk)
-
-        # Move the window back by one week
-        current_end = current_start
-        current_start = current_end - timedelta(days=7)
-
-    # Concatenate all the data chunks
-    if data_list:
-        full_data = pd.concat(data_list)
+    - pd.DataFrame: A DataFrame with columns [Datetime, Timestamp, Open, High, Low, Close, Volume]
+      sorted by Datetime, with Datetime in UTC and Timestamp the same time UTC-naive.
+      It is empty when no data is found.
+    """
+    today = datetime.now(timezone.utc).date()
+    end_date = _to_date(end_date) if end_date is not None else today
+    start_date = _to_date(start_date) if start_date is not None else end_date - timedelta(days=365)
+    chunks = _weekly_chunks(start_date, end_date)
+
+    complete_chunks = [chunk for chunk in chunks if chunk[1] <= today]
+    if store is None:
+        chunks_to_download = chunks
     else:
-        full_data = pd.DataFrame()
+        chunks_to_download = [chunk for chunk in complete_chunks
+                              if store.missing_ranges(symbol, interval, str(chunk[0]), str(chunk[1]))]
+        chunks_to_download += [chunk for chunk in chunks if chunk[1] > today]
 
-    # Reset the index for consistency
-    full_data.reset_index(inplace=True)
-    full_data["Timestamp"] = full_data["Datetime"]
-    return full_data
+    if downloader is None:
+        downloader = _default_downloader()
+    data_chunks = fetch_pages(fetch_page=lambda _, chunk: _download_chunk(symbol, interval, chunk, downloader),
+                              pages=chunks_to_download,
+                              max_workers=max_workers,
+                              max_attempts=max_attempts,
+                              base_delay=1.0,
+                              max_delay=60)
+
+    if store is None:
+        return _to_full_data([_chunk_to_candles(data_chunk) for data_chunk in data_chunks if not data_chunk.empty])
+
+    candles = []
+    for chunk, data_chunk in zip(chunks_to_download, data_chunks):
+        if chunk[1] <= today:
+            store.write(symbol, interval, _chunk_to_candles(data_chunk), str(chunk[0]), str(chunk[1]))
+        else:
+            candles.append(_chunk_to_candles(data_chunk))
+    complete_end = complete_chunks[-1][1] if complete_chunks else start_date
+    candles.insert(0, store.read(symbol, interval, str(start_date), str(complete_end)))
+    return _to_full_data(candles)